@@ -29,8 +29,11 @@ import lsst.ctrl.orca as orca
 import lsst.log as log
 import lsst.utils
 from lsst.ctrl.orca.ProductionRunManager import ProductionRunManager
+from lsst.ctrl.orca.ProductionDaemon import ProductionDaemon
 
-usage = """usage: %prog [-gndvqsc] [-r dir] [-e script] [-V int][-L lev] pipelineConfigFile runId"""
+usage = """usage: %prog [-gndvqsc] [-r dir] [-e script] [-V int][-L lev] pipelineConfigFile runId
+       %prog [-dvqs] [-V int] [-L lev] --reattach runId
+       %prog [-dvqs] [-V int] [-L lev] --daemon [--port port]"""
 
 parser = optparse.OptionParser(usage)
 # TODO: handle "--dryrun"
@@ -63,18 +66,24 @@ parser.add_option("-L", "--logconfig", type="string", action="store",
                   dest="logconfig", default=None,
                   help="lsst.log configuration file")
 
+parser.add_option("--reattach", action="store", dest="reattach", default=None, metavar="runId",
+                  help="monitor the workflows of a run whose orca process exited, without "
+                       "staging or submitting anything")
+
+parser.add_option("--daemon", action="store_true", dest="daemon", default=False,
+                  help="run the productions submitted to the service endpoint, until interrupted")
+parser.add_option("--port", type="int", action="store", dest="port", default=0, metavar="port",
+                  help="port the daemon's service endpoint listens at; any free port if 0")
+
 parser.opts = {}
 parser.args = []
 
 # parse and check command line arguments
 (parser.opts, parser.args) = parser.parse_args()
-if len(parser.args) < 2:
+if parser.opts.reattach is None and not parser.opts.daemon and len(parser.args) < 2:
     print(usage)
     raise RuntimeError("Missing args: pipelineConfigFile runId")
 
-pipelineConfigFile = parser.args[0]
-runId = parser.args[1]
-
 orca.skipglidein = parser.opts.skipglidein
 orca.dryrun = parser.opts.dryrun
 orca.envscript = parser.opts.envscript
@@ -97,14 +106,28 @@ orca.verbosity = parser.opts.verbosity
 # we reference this in other classes
 orca.dryrun = parser.opts.dryrun
 
+if parser.opts.daemon:
+    # productions are submitted with POST /api/v1/productions
+    productionDaemon = ProductionDaemon(parser.opts.port)
+    try:
+        productionDaemon.serveForever()
+    except KeyboardInterrupt:
+        print("Daemon interrupted; the workflows it launched keep running.")
+elif parser.opts.reattach is not None:
+    # the config file and workflows are the ones recorded when the run was launched
+    log.debug("reattaching to runId = "+parser.opts.reattach)
+    productionRunManager = ProductionRunManager.reattach(parser.opts.reattach)
+    productionRunManager.joinShutdownThread()
+else:
+    pipelineConfigFile = parser.args[0]
+    runId = parser.args[1]
 
-log.debug("pipelineConfigFile = "+pipelineConfigFile)
-log.debug("runId = "+runId)
-
-# create the ProductionRunManager, configure it, and launch it
-productionRunManager = ProductionRunManager(runId, pipelineConfigFile)
+    log.debug("pipelineConfigFile = "+pipelineConfigFile)
+    log.debug("runId = "+runId)
 
+    # create the ProductionRunManager, configure it, and launch it
+    productionRunManager = ProductionRunManager(runId, pipelineConfigFile)
 
-productionRunManager.runProduction(skipConfigCheck=parser.opts.skipconfigcheck,
-                                   workflowVerbosity=parser.opts.pipeverb)
-productionRunManager.joinShutdownThread()
+    productionRunManager.runProduction(skipConfigCheck=parser.opts.skipconfigcheck,
+                                       workflowVerbosity=parser.opts.pipeverb)
+    productionRunManager.joinShutdownThread()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsstcorp.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+"""Benchmark DAG submission and workflow monitoring against the fakecondor simulator.
+
+A DAG is generated with DagBuilder, submitted to a FakeJobBackend, and
+followed to the end by a workflow monitor, without a real HTCondor pool.
+The time to submit, the time the DAG ran, and the lag between DAGMan
+exiting and the monitor seeing it are reported for each workflow.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+
+class MonitorConfig:
+    """The monitor settings the benchmark runs with
+    """
+    statusCheckInterval = 5
+    jobBackend = "fake"
+
+
+def writeInput(fileName, count):
+    """Write an id list of "count" extended ids, in the 9429-CCDs.input style.
+    """
+    with open(fileName, "w", buffering=1 << 20) as fp:
+        for i in range(count):
+            fp.write("visit=%d raft=%d,%d sensor=%d,%d\n" %
+                     (885335881 + i//81, (i//9) % 3, (i//27) % 3, i % 3, (i//3) % 3))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark monitoring with the fakecondor simulator")
+    parser.add_argument("-n", "--nodes", dest="nodes", type=int, default=100000,
+                        help="worker nodes in each DAG")
+    parser.add_argument("-w", "--workflows", dest="workflows", type=int, default=1,
+                        help="DAGs submitted and monitored at once")
+    parser.add_argument("--latency", dest="latency", type=float, default=0.0,
+                        help="mean seconds a node runs for")
+    parser.add_argument("--jitter", dest="jitter", type=float, default=0.0,
+                        help="spread of the node run times around the latency")
+    parser.add_argument("--failure-rate", dest="failureRate", type=float, default=0.0,
+                        help="fraction of the nodes that fail")
+    parser.add_argument("--max-jobs", dest="maxJobs", type=int, default=0,
+                        help="most nodes of a DAG running at once; 0 for no limit")
+    parser.add_argument("--nodes-per-splice", dest="nodesPerSplice", type=int, default=0,
+                        help="split the worker nodes into splices of this many nodes")
+    parser.add_argument("--monitor", dest="monitor", choices=["eventlog", "condor_q"], default="eventlog",
+                        help="how the DAGs are monitored")
+    parser.add_argument("-d", "--dir", dest="dir", default=None,
+                        help="scratch directory (defaults to a temporary directory)")
+    ns = parser.parse_args()
+
+    from lsst.ctrl.orca.CondorJobs import CondorJobs
+    from lsst.ctrl.orca.CondorWorkflowMonitor import CondorWorkflowMonitor
+    from lsst.ctrl.orca.EventLogWorkflowMonitor import EventLogWorkflowMonitor
+    from lsst.ctrl.orca.QueuePoller import QueuePoller
+    from lsst.ctrl.orca.dag import DagBuilder
+    from lsst.ctrl.orca.fakecondor import FakeJobBackend
+
+    backend = FakeJobBackend(latency=ns.latency, jitter=ns.jitter, failureRate=ns.failureRate,
+                             maxJobs=ns.maxJobs, statusUpdate=1.0)
+    config = MonitorConfig()
+    if ns.monitor == "condor_q":
+        config.statusCheckInterval = 1
+        QueuePoller.getInstance(config.jobBackend, CondorJobs(backend))
+
+    with tempfile.TemporaryDirectory(dir=ns.dir) as scratch:
+        inputFile = os.path.join(scratch, "ids.input")
+        writeInput(inputFile, ns.nodes)
+        subDagType = "SPLICE" if ns.nodesPerSplice > 0 else None
+        builder = DagBuilder("S2012Pipe", "workers", "S2012Pipeline-template.condor", "benchmark",
+                             subDagType=subDagType, nodesPerSubDag=max(ns.nodesPerSplice, 1),
+                             nodeStatusUpdate=1)
+        dagFiles = []
+        for i in range(ns.workflows):
+            workDir = os.path.join(scratch, "wf%d" % i)
+            os.mkdir(workDir)
+            builder.build(inputFile, workDir)
+            dagFiles.append(os.path.join(workDir, builder.getDagFileName()))
+
+        monitors = []
+        for dagFile in dagFiles:
+            start = time.perf_counter()
+            dagId = backend.submitDag(dagFile)
+            submitTime = time.perf_counter() - start
+            statusFile = os.path.join(os.path.dirname(dagFile), builder.getNodeStatusFileName())
+            if ns.monitor == "eventlog":
+                monitor = EventLogWorkflowMonitor(dagId, config, dagFile, statusFile)
+            else:
+                monitor = CondorWorkflowMonitor(dagId, config, statusFile)
+            monitor.startMonitorThread()
+            monitors.append((dagId, submitTime, time.time(), monitor))
+
+        # note when each monitor sees its DAG end
+        endTimes = {}
+        while len(endTimes) < len(monitors):
+            for dagId, submitTime, startTime, monitor in monitors:
+                if dagId not in endTimes and not monitor.isRunning():
+                    endTimes[dagId] = time.time()
+            time.sleep(0.01)
+
+        print("%8s %10s %12s %10s %12s %10s" % ("dag", "nodes", "submit s", "run s", "nodes/s", "lag s"))
+        for dagId, submitTime, startTime, monitor in monitors:
+            backend.wait(dagId)
+            dagman = backend.dagmans[dagId]
+            exitTime = os.stat(dagman.dagFileName + ".dagman.out").st_mtime
+            runTime = exitTime - startTime
+            nodes = len(dagman.nodeStatus)
+            print("%8s %10d %12.2f %10.2f %12.0f %10.2f" %
+                  (dagId, nodes, submitTime, runTime, nodes / max(runTime, 1e-6), endTimes[dagId] - exitTime))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsstcorp.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+"""Benchmark DagBuilder, used by generateDag.py, for time and memory against input size.
+
+Each input size is run in a fresh interpreter so that the peak resident set
+size reported for it is not polluted by the previous runs.  The run fails if
+the time per id or the peak memory grows by more than the allowed factor
+between the smallest and the largest input.
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def writeInput(fileName, count):
+    """Write an id list of "count" extended ids, in the 9429-CCDs.input style.
+    """
+    with open(fileName, "w", buffering=1 << 20) as fp:
+        lines = []
+        for i in range(count):
+            lines.append("visit=%d raft=%d,%d sensor=%d,%d\n" %
+                         (885335881 + i//81, (i//9) % 3, (i//27) % 3, i % 3, (i//3) % 3))
+            if len(lines) == 10000:
+                fp.write("".join(lines))
+                lines.clear()
+        fp.write("".join(lines))
+
+
+def runOne(inputFile, workDir):
+    """Build one DAG in this process, and print its time and peak memory.
+    """
+    from lsst.ctrl.orca.dag import DagBuilder
+
+    builder = DagBuilder("S2012Pipe", "workers", "S2012Pipeline-template.condor", "benchmark")
+    start = time.perf_counter()
+    result = builder.build(inputFile, workDir)
+    elapsed = time.perf_counter() - start
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print("%d %f %d" % (result.nodes, elapsed, maxrss))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark DagBuilder")
+    parser.add_argument("-n", "--sizes", dest="sizes", type=int, nargs="+",
+                        default=[1000000, 10000000], help="input id list sizes to run")
+    parser.add_argument("-d", "--dir", dest="dir", default=None,
+                        help="scratch directory (defaults to a temporary directory)")
+    parser.add_argument("--time-factor", dest="timeFactor", type=float, default=1.5,
+                        help="allowed growth of the time per id between smallest and largest size")
+    parser.add_argument("--memory-factor", dest="memoryFactor", type=float, default=1.5,
+                        help="allowed growth of the peak memory between smallest and largest size")
+    parser.add_argument("--run-one", dest="runOne", nargs=2, metavar=("INPUT", "WORKDIR"),
+                        help=argparse.SUPPRESS)
+    ns = parser.parse_args()
+
+    if ns.runOne is not None:
+        runOne(*ns.runOne)
+        return 0
+
+    results = []
+    with tempfile.TemporaryDirectory(dir=ns.dir) as scratch:
+        for size in sorted(ns.sizes):
+            inputFile = os.path.join(scratch, "ids.%d.input" % size)
+            writeInput(inputFile, size)
+            output = subprocess.check_output([sys.executable, os.path.abspath(__file__),
+                                              "--run-one", inputFile, scratch])
+            count, elapsed, maxrss = output.split()
+            results.append((int(count), float(elapsed), int(maxrss)))
+            os.remove(inputFile)
+            os.remove(os.path.join(scratch, "S2012Pipe.diamond.dag"))
+
+    print("%12s %10s %14s %12s" % ("ids", "seconds", "usec per id", "peak KiB"))
+    for count, elapsed, maxrss in results:
+        print("%12d %10.2f %14.3f %12d" % (count, elapsed, 1e6*elapsed/count, maxrss))
+
+    first, last = results[0], results[-1]
+    timeGrowth = (last[1]/last[0]) / (first[1]/first[0])
+    memoryGrowth = last[2] / first[2]
+    print("time per id grew by %.2fx, peak memory grew by %.2fx" % (timeGrowth, memoryGrowth))
+    if timeGrowth > ns.timeFactor or memoryGrowth > ns.memoryFactor:
+        print("FAIL: DagBuilder is not linear in time and bounded in memory")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -23,8 +23,11 @@
 #
 
 import argparse
-import sys
+import os
 import shlex
+import sys
+
+from lsst.ctrl.orca.dag import DagBuilder, SUBDAG_TYPES
 
 
 def _line_to_args(self, line):
@@ -44,6 +47,11 @@ def makeArgumentParser(description, inRootsRequired=True, addRegistryOption=True
                "ly.")
     parser.convert_arg_line_to_args = _line_to_args
 
+    parser.add_argument(
+        "-n", "--dagName", dest="dagName", default="S2012Pipe",
+        help="name of the DAG to write, as <dagName>.diamond.dag; orca passes the configured "
+             "dagGenerator.dagName to this script")
+
     parser.add_argument(
         "-s", "--source", dest="source",
         help="Source site for file transfer.")
@@ -65,93 +73,47 @@ def makeArgumentParser(description, inRootsRequired=True, addRegistryOption=True
         help="runid of this job")
 
     parser.add_argument(
-        "-i", "--idsPerJob", dest="idsPerJob",
+        "-i", "--idsPerJob", dest="idsPerJob", type=int, default=1,
         help="number of ids to run per job")
 
+    parser.add_argument(
+        "--subDagType", dest="subDagType", choices=sorted(SUBDAG_TYPES), default=None,
+        help="split the worker nodes into SPLICE or SUBDAG EXTERNAL files")
+
+    parser.add_argument(
+        "--nodesPerSubDag", dest="nodesPerSubDag", type=int, default=1000,
+        help="maximum number of worker nodes per sub-DAG; 0 for no limit")
+
+    parser.add_argument(
+        "--subDagByVisit", dest="subDagByVisit", action="store_true", default=False,
+        help="start a new sub-DAG whenever the visit changes")
+
+    parser.add_argument(
+        "--maxJobsPerSubDag", dest="maxJobsPerSubDag", type=int, default=0,
+        help="maximum number of worker jobs submitted at once by each sub-DAG; 0 for no limit")
+
     return parser
 
 
-def writeDagFile(pipeline, templateFile, infile, workerdir, prescriptFile, runid, idsPerJob):
+def writeDagFile(pipeline, templateFile, infile, workerdir, prescriptFile, runid, idsPerJob,
+                 subDagType=None, nodesPerSubDag=1000, subDagByVisit=False, maxJobsPerSubDag=0):
     """
-    Write Condor Dag Submission files.
+    Write Condor Dag Submission files into the current directory.
+
+    This is a wrapper around lsst.ctrl.orca.dag.DagBuilder, which
+    CondorWorkflowConfigurator also uses in-process.
+
+    Returns the number of worker nodes written.
     """
 
     print("Writing DAG file ")
 
-    outname = pipeline + ".diamond.dag"
-
-    print(outname)
-
-    outObj = open(outname, "w")
-
-    outObj.write("JOB A "+workerdir+"/" + pipeline + ".pre\n")
-    outObj.write("JOB B "+workerdir+"/" + pipeline + ".post\n")
-    outObj.write(" \n")
-
-    print("prescriptFile = ", prescriptFile)
-    if prescriptFile is not None:
-        outObj.write("SCRIPT PRE A "+prescriptFile+"\n")
-
-    print("First Input File loop ")
-
-    # Loop over input entries
-    fileObj = open(infile, "r")
-    count = 0
-    for aline in fileObj:
-        count += 1
-        outObj.write("JOB A" + str(count) + " "+workerdir+"/" + templateFile + "\n")
-
-    outObj.write(" \n")
-
-    print("Second Input File loop ")
-
-    # Loop over input entries
-    fileObj = open(infile, "r")
-    count = 0
-    for aline in fileObj:
-        count += 1
-        myData = aline.rstrip()
-
-        # Searching for a space detects
-        # extended input like :  visit=887136081 raft=2,2 sensor=0,1
-        # No space is something simple like a skytile id
-        if " " in myData:
-            # Change space to :
-            myList = myData.split(' ')
-            new1Data = '%s:%s:%s' % tuple(myList)
-            # Change = to -
-            myList2 = new1Data.split('=')
-            new2Data = '%s-%s-%s-%s' % tuple(myList2)
-            # Change , to _
-            myList3 = new2Data.split(',')
-            new3Data = '%s_%s_%s' % tuple(myList3)
-
-            newData = new3Data
-            visit = myList[0].split('=')[1]
-        else:
-            newData = myData
-            visit = myData
-
-        #  VARS A1 var1="visit=887136081 raft=2,2 sensor=0,1"
-        #  VARS A1 var2="visit-887136081:raft-2_2:sensor-0_1"
-        outObj.write("VARS A" + str(count) + " var1=\"" + myData + "\" \n")
-        outObj.write("VARS A" + str(count) + " var2=\"" + newData + "\" \n")
-        outObj.write("VARS A" + str(count) + " visit=\"" + visit + "\" \n")
-        outObj.write("VARS A" + str(count) + " runid=\"" + runid + "\" \n")
-        outObj.write("VARS A" + str(count) + " workerid=\"" + str(count) + "\" \n")
-
-    print("Third Input File loop ")
-
-    fileObj = open(infile, "r")
-    count = 0
-    for aline in fileObj:
-        count += 1
-        # PARENT A CHILD A1
-        # PARENT A1 CHILD B
-        outObj.write("PARENT A CHILD A" + str(count) + " \n")
-        outObj.write("PARENT A" + str(count) + " CHILD B \n")
-
-    outObj.close()
+    builder = DagBuilder(pipeline, workerdir, templateFile, runid, prescriptFile, idsPerJob,
+                         subDagType, nodesPerSubDag, subDagByVisit, maxJobsPerSubDag)
+    result = builder.build(infile, os.getcwd())
+
+    print(result)
+    return result.nodes
 
 
 def main():
@@ -174,9 +136,10 @@ def main():
     # infile   = "visits-449"
 
     #   processCcdLsstSim
-    pipeline = "S2012Pipe"
+    pipeline = ns.dagName
 
-    writeDagFile(pipeline, ns.template, ns.source, ns.workerdir, ns.prescript, ns.runid, ns.idsPerJob)
+    writeDagFile(pipeline, ns.template, ns.source, ns.workerdir, ns.prescript, ns.runid, ns.idsPerJob,
+                 ns.subDagType, ns.nodesPerSubDag, ns.subDagByVisit, ns.maxJobsPerSubDag)
 
     sys.exit(0)
 
@@ -33,17 +33,13 @@ shost=`/bin/hostname`
 # $@ all the parameters will be listed
 
 
-echo hello >> logs/debuglog
-echo $1 >> logs/debuglog
-echo hello2 >> logs/debuglog
-echo $2 >> logs/debuglog
-echo hello3 >> logs/debuglog
-echo $3 >> logs/debuglog
-
-visit_raft_sensor=$1" "$2" "$3 
+# The arguments are one or more ids separated by ";", for example
+#   visit=887136081 raft=2,2 sensor=0,1;visit=887136081 raft=2,2 sensor=0,2
+# Rejoin them here; they are split up again in the processing loop below.
+ids="$*"
 
 echo full >> logs/debuglog
-echo $visit_raft_sensor >> logs/debuglog
+echo $ids >> logs/debuglog
 
 
 echo _CONDOR_SLOT
@@ -189,6 +185,12 @@ date
 # --output /scratch/00342/ux453102/datarel-runs/w2012prod_im0138/output
 # --id visit=888382340 raft=2,1 sensor=0,2 > logs/W2012Pipe-${visit}.log 2>&1
 
+oldIFS=$IFS
+IFS=';'
+for visit_raft_sensor in $ids
+do
+IFS=$oldIFS
+
 modstring=`echo ${visit_raft_sensor} | sed -e 's/ /:/g' -e 's/=/-/g' -e 's/,/_/g'`
 
 echo visit_raft_sensor
@@ -198,6 +200,9 @@ echo $modstring
 
 $PIPE_TASKS_DIR/bin/processCcdLsstSim.py lsstSim ${rundir}/output --output ${rundir}/output --id ${visit_raft_sensor}  > logs/W2012Pipe-${modstring}.log 2>&1
 
+done
+IFS=$oldIFS
+
 echo "===================== After W2012Pipe "
 date
 
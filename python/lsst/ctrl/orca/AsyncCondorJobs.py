@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+import asyncio
+import re
+import threading
+import time
+import weakref
+import lsst.log as log
+
+from lsst.ctrl.orca.CondorJobs import JOB_STATES, MIN_POLL_INTERVAL, MAX_POLL_INTERVAL, POLL_BACKOFF
+from lsst.ctrl.orca.Metrics import Metrics, CONDOR_QUERY
+
+# most condor commands run at the same time by one AsyncCondorJobs on one event loop
+MAX_CONCURRENT = 8
+
+# seconds a condor command may take before it is killed
+COMMAND_TIMEOUT = 300.0
+
+# output of condor_submit_dag naming the new cluster
+_SUBMITTED = re.compile(r"1 job\(s\) submitted to cluster (\d+).")
+
+
+class AsyncCondorJobs:
+    """Submits, waits for and removes HTCondor jobs from asyncio code.
+
+    Parameters
+    ----------
+    maxConcurrent : `int`, optional
+        most condor commands run at the same time on one event loop
+    timeout : `float`, optional
+        seconds a condor command may take before it is killed
+
+    Notes
+    -----
+    The condor command line tools are run with asyncio subprocesses, so
+    many workflows can be submitted, or waited for, at once from one
+    thread.  At most maxConcurrent of them run at a time on each event
+    loop, so the schedd isn't flooded, and a command that hangs is killed
+    after timeout seconds, raising asyncio.TimeoutError.  The launchers
+    share the instance getInstance() returns, so the limit holds across
+    all the workflows a scheduler submits.
+    """
+
+    # the instance shared by the launchers of this process
+    _instance = None
+    _instanceLock = threading.Lock()
+
+    def __init__(self, maxConcurrent=MAX_CONCURRENT, timeout=COMMAND_TIMEOUT):
+        # most condor commands run at the same time
+        self.maxConcurrent = maxConcurrent
+
+        # seconds a condor command may take before it is killed
+        self.timeout = timeout
+
+        # event loop -> the semaphore bounding the commands run from it
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._semaphoresLock = threading.Lock()
+
+    @staticmethod
+    def getInstance():
+        """Return the AsyncCondorJobs shared by the launchers of this process
+
+        Returns
+        -------
+        jobs : `AsyncCondorJobs`
+        """
+        with AsyncCondorJobs._instanceLock:
+            if AsyncCondorJobs._instance is None:
+                AsyncCondorJobs._instance = AsyncCondorJobs()
+            return AsyncCondorJobs._instance
+
+    def _getSemaphore(self):
+        loop = asyncio.get_running_loop()
+        with self._semaphoresLock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.maxConcurrent)
+                self._semaphores[loop] = semaphore
+            return semaphore
+
+    async def _run(self, cmd, cwd=None):
+        """Run a command, returning its exit status and output
+
+        Parameters
+        ----------
+        cmd : `list` of `str`
+            the command and its arguments
+        cwd : `str`, optional
+            directory to run the command in
+
+        Returns
+        -------
+        returncode : `int`
+            the command's exit status
+        stdout : `str`
+            what the command wrote to its standard output
+        """
+        log.debug("AsyncCondorJobs: %s", " ".join(cmd))
+        async with self._getSemaphore():
+            process = await asyncio.create_subprocess_exec(*cmd, cwd=cwd, stdin=asyncio.subprocess.DEVNULL,
+                                                           stdout=asyncio.subprocess.PIPE,
+                                                           stderr=asyncio.subprocess.PIPE)
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), self.timeout)
+            except asyncio.TimeoutError:
+                log.warn("AsyncCondorJobs: %s didn't finish in %s seconds; killing it", cmd[0], self.timeout)
+                process.kill()
+                await process.wait()
+                raise
+        if process.returncode != 0:
+            log.debug("AsyncCondorJobs: %s failed: %s", cmd[0], stderr.decode(errors="replace").strip())
+        return process.returncode, stdout.decode(errors="replace")
+
+    async def submit_dag(self, filename, cwd=None):
+        """Submit a condor dag and return its cluster number
+
+        Parameters
+        ----------
+        filename : `str`
+            name of condor DAG file
+        cwd : `str`, optional
+            directory to submit the dag from
+
+        Returns
+        -------
+        clusterId : `str`
+            cluster id of the DAGMan job, or -1 if it wasn't submitted
+        """
+        log.debug("AsyncCondorJobs:submit_dag %s", filename)
+        returncode, output = await self._run(["condor_submit_dag", filename], cwd)
+        for line in output.splitlines():
+            num = _SUBMITTED.findall(line)
+            if len(num) != 0:
+                return num[0]
+        return -1
+
+    async def query(self, clusterIds):
+        """Query the queue for the state of the jobs in a set of clusters
+
+        Parameters
+        ----------
+        clusterIds : iterable of `str`
+            condor cluster ids
+
+        Returns
+        -------
+        states : { '1016.0' : 'I', '1017.0' : 'R' }
+            state letter of each job of the clusters that is still in the
+            queue, keyed by job id; None if the queue couldn't be queried
+        """
+        clusters = sorted(set(int(cid) for cid in clusterIds))
+        if not clusters:
+            return {}
+        constraint = " || ".join("ClusterId == %d" % cid for cid in clusters)
+        start = time.time()
+        try:
+            returncode, output = await self._run(["condor_q", "-af", "ClusterId", "ProcId", "JobStatus",
+                                                  "-constraint", constraint])
+        except (OSError, asyncio.TimeoutError) as error:
+            log.warn("AsyncCondorJobs:query: couldn't run condor_q: %s", error)
+            return None
+        finally:
+            Metrics.getInstance().histogram(CONDOR_QUERY).observe(time.time() - start, "AsyncCondorJobs")
+        if returncode != 0:
+            return None
+
+        states = {}
+        for line in output.splitlines():
+            values = line.split()
+            if len(values) != 3:
+                continue
+            cluster, proc, status = values
+            states[cluster + "." + proc] = JOB_STATES.get(int(status), status)
+        return states
+
+    async def wait_for_state(self, ids, states, timeout=None):
+        """Wait for the jobs of some clusters to reach one of a set of states
+
+        Parameters
+        ----------
+        ids : iterable of `str`
+            condor cluster ids
+        states : iterable of `str`
+            state letters, as shown by condor_q, e.g. ['R', 'H']
+        timeout : `float`, optional
+            most seconds to wait; forever if None
+
+        Returns
+        -------
+        states : { '1016.0' : 'R', '1017.0' : None }
+            the state each job was seen in last; None for a job that left
+            the queue
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            if the jobs didn't reach the states in time
+
+        Notes
+        -----
+        Each poll is one condor_q constrained to the clusters still waited
+        for.  A job that leaves the queue is no longer waited for.  The time
+        between polls backs off while none of the jobs change state, as in
+        CondorJobs.waitForAllJobsToRun.
+        """
+        return await asyncio.wait_for(self._waitForState(ids, set(states)), timeout)
+
+    async def _waitForState(self, ids, states):
+        pending = set(str(cid) for cid in ids)
+        seen = {}
+        interval = MIN_POLL_INTERVAL
+        while pending:
+            queue = await self.query(pending)
+            if queue is not None:
+                changed = False
+                for cluster in list(pending):
+                    jobs = dict((jobId, state) for jobId, state in queue.items()
+                                if jobId.split(".")[0] == cluster)
+                    for jobId, state in jobs.items():
+                        if seen.get(jobId) != state:
+                            seen[jobId] = state
+                            changed = True
+                    if jobs:
+                        if all(state in states for state in jobs.values()):
+                            pending.discard(cluster)
+                        continue
+                    # a cluster missing from the queue after being seen has left it
+                    gone = [jobId for jobId in seen if jobId.split(".")[0] == cluster]
+                    if gone:
+                        for jobId in gone:
+                            seen[jobId] = None
+                        pending.discard(cluster)
+                        changed = True
+                if not pending:
+                    break
+                if changed:
+                    interval = MIN_POLL_INTERVAL
+            await asyncio.sleep(interval)
+            interval = min(interval * POLL_BACKOFF, MAX_POLL_INTERVAL)
+        return seen
+
+    async def remove(self, cid):
+        """Remove the HTCondor job with this id
+
+        Parameters
+        ----------
+        cid : `str`
+            condor job or cluster id
+
+        Returns
+        -------
+        removed : `bool`
+            True if condor_rm succeeded
+        """
+        log.debug("AsyncCondorJobs:remove %s", cid)
+        returncode, output = await self._run(["condor_rm", str(cid)])
+        return returncode == 0
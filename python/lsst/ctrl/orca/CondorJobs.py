@@ -22,22 +22,35 @@
 # see <http://www.lsstcorp.org/LegalNotices/>.
 #
 
-import os
-import subprocess
-import re
 import time
 import lsst.log as log
+from lsst.ctrl.orca.JobBackend import getJobBackend
+from lsst.ctrl.orca.Metrics import Metrics, CONDOR_QUERY
+
+# HTCondor JobStatus codes, and the letters condor_q shows for them
+JOB_STATES = {1: 'I', 2: 'R', 3: 'X', 4: 'C', 5: 'H', 6: '>', 7: 'S'}
+
+# shortest and longest time to wait between two queue queries, in seconds
+MIN_POLL_INTERVAL = 1.0
+MAX_POLL_INTERVAL = 30.0
+
+# factor the time between queue queries grows by while nothing changes
+POLL_BACKOFF = 1.5
 
 
 class CondorJobs:
     """Handles interaction with HTCondor
-    This class is highly dependent on the output of the condor commands
-    condor_submit and condor_q
+
+    Parameters
+    ----------
+    backend : `JobBackend`, optional
+        talks to the schedd; defaults to the process' command line backend
     """
 
-    def __init__(self):
+    def __init__(self, backend=None):
         log.debug("CondorJobs:__init__")
-        return
+        # submits, queries and removes jobs
+        self.backend = backend if backend is not None else getJobBackend()
 
     def submitJob(self, condorFile):
         """Submit a condor file, and return the job number associated with it.
@@ -47,28 +60,50 @@ class CondorJobs:
         condorFile: `str`
             condor submit file.
 
-        Notes
-        -----
-        expected output:
-        Submitting job(s).
-        Logging submit event(s).
-        1 job(s) submitted to cluster 1317.
+        Returns
+        -------
+        clusterId : `str`
+            cluster id of the job, or None if it wasn't submitted
         """
         log.debug("CondorJobs:submitJob")
-        clusterexp = re.compile(r"1 job\(s\) submitted to cluster (\d+).")
+        num = self.backend.submit(condorFile)
+        if num is None:
+            return None
+        print("submitted job # %s as file %s" % (num, condorFile))
+        return num
 
-        submitRequest = "condor_submit %s" % condorFile
+    def queryJobs(self, clusterIds):
+        """Query the queue for the state of the jobs in a set of clusters
 
-        pop = os.popen(submitRequest, "r")
+        Parameters
+        ----------
+        clusterIds : iterable of `str`
+            condor cluster ids
 
-        line = pop.readline()
-        line = pop.readline()
-        line = line.decode()
-        num = clusterexp.findall(line)
-        if len(num) == 0:
+        Returns
+        -------
+        states : { '1016.0' : 'I', '1017.0' : 'R' }
+            state letter, as shown by condor_q, of each job of the clusters that
+            is still in the queue, keyed by job id; None if the queue couldn't
+            be queried
+
+        Notes
+        -----
+        Only the given clusters are asked for, in a single query.
+        """
+        clusters = sorted(set(int(cid) for cid in clusterIds))
+        if not clusters:
+            return {}
+        start = time.time()
+        jobs = self.backend.query(clusters)
+        Metrics.getInstance().histogram(CONDOR_QUERY).observe(time.time() - start,
+                                                              type(self.backend).__name__)
+        if jobs is None:
             return None
-        print("submitted job # %s as file %s" % (num[0], condorFile))
-        return num[0]
+        states = {}
+        for cluster, proc, status in jobs:
+            states[cluster + "." + proc] = JOB_STATES.get(status, str(status))
+        return states
 
     def waitForJobToRun(self, num, extramsg=None):
         """Wait for a condor job to reach it's run state.
@@ -80,71 +115,67 @@ class CondorJobs:
         extramsg : `str`, optional
             addition message to print to stdout
 
+        Returns
+        -------
+        runstate : `str`
+            the state the job was last seen in: 'R' once it runs, or 'H', 'X'
+            or 'C' if it was held, removed or completed first; None if the
+            job left the queue
+
         Notes
         -----
-        expected output:
-        -- Submitter: srp@lsst6.ncsa.uiuc.edu : <141.142.15.103:40900> : lsst6.ncsa.uiuc.edu
-         ID      OWNER            SUBMITTED     RUN_TIME ST PRI SIZE CMD
-        1016.0   srp             5/24 09:17   0+00:00:00 I  0   0.0  launch_joboffices_
-        1017.0   srp             5/24 09:18   0+00:00:00 R  0   0.0  launch_joboffices_
+        The queue is queried for this job alone.  The time between queries
+        starts at MIN_POLL_INTERVAL, and grows up to MAX_POLL_INTERVAL as long
+        as the job's state stays the same.
         """
         log.debug("CondorJobs:waitForJobToRun")
         jobNum = "%s.0" % num
-        queueExp = re.compile(r"\S+")
         cJobSeen = 0
         print("waiting for job %s to run." % num)
         if extramsg is not None:
             print(extramsg)
-        secondsWaited = 0
+        startTime = time.time()
+        minutesReported = 0
+        interval = MIN_POLL_INTERVAL
+        lastState = None
         while 1:
-            pop = os.popen("condor_q", "r")
-            bJobSeenNow = False
-            if (secondsWaited > 0) and ((secondsWaited % 60) == 0):
-                minutes = secondsWaited/60
+            minutes = int((time.time() - startTime) / 60)
+            if minutes > minutesReported:
+                minutesReported = minutes
                 msg = "waited %d minute%s so far. still waiting for job %s to run."
-                print(msg % ((secondsWaited / 60), ("" if (minutes == 1) else "s"), num))
-            while 1:
-                line = pop.readline()
-                line = line.decode()
-                if not line:
-                    break
-                values = queueExp.findall(line)
-                if len(values) == 0:
-                    continue
-                runstate = values[5]
-                if (values[0] == jobNum):
+                print(msg % (minutes, ("" if (minutes == 1) else "s"), num))
+
+            states = self.queryJobs([num])
+            if states is not None:
+                runstate = states.get(jobNum)
+                if runstate is not None:
                     cJobSeen = cJobSeen + 1
-                    bJobSeenNow = True
-                if (values[0] == jobNum) and (runstate == 'R'):
-                    pop.close()
+                if runstate == 'R':
                     print("Job %s is now being run." % num)
                     return runstate
-                if (values[0] == jobNum) and (runstate == 'H'):
-                    pop.close()
+                if runstate == 'H':
                     # throw exception here
                     print("Job %s is being held.  Please review the logs." % num)
                     return runstate
-                if (values[0] == jobNum) and (runstate == 'X'):
-                    print(values)
-                    pop.close()
+                if runstate == 'X':
                     # throw exception here
                     print("Saw job %s, but it was being aborted" % num)
                     return runstate
-                if (values[0] == jobNum) and (runstate == 'C'):
-                    pop.close()
+                if runstate == 'C':
                     # throw exception here
                     print("Job %s is being cancelled." % num)
                     return runstate
-            # check to see if we've seen the job before, but that
-            # it disappeared
-            if (cJobSeen > 0) and not bJobSeenNow:
-                pop.close()
-                print("Was monitoring job %s, but it exitted." % num)
-                # throw exception
-                return None
-            pop.close()
-            time.sleep(1)
-            secondsWaited = secondsWaited + 1
+                # check to see if we've seen the job before, but that
+                # it disappeared
+                if (cJobSeen > 0) and runstate is None:
+                    print("Was monitoring job %s, but it exitted." % num)
+                    # throw exception
+                    return None
+                if runstate != lastState:
+                    interval = MIN_POLL_INTERVAL
+                    lastState = runstate
+            time.sleep(interval)
+            interval = min(interval * POLL_BACKOFF, MAX_POLL_INTERVAL)
 
     def waitForAllJobsToRun(self, numList):
         """Waits for all jobs to enter the run state
@@ -153,79 +184,65 @@ class CondorJobs:
         ----------
         numList : `list`
             list of condor job ids
+
+        Notes
+        -----
+        Each poll is one queue query, constrained to the jobs still waited
+        for, and each of those is looked up in its result.  The wait ends
+        early if a job is held; a job that leaves the queue after being seen
+        is no longer waited for.  The time between queries backs off while
+        none of the jobs change state, as in waitForJobToRun.
         """
         log.debug("CondorJobs:waitForAllJobsToRun")
-        queueExp = re.compile(r"\S+")
-        jobList = list(numList)
-        while 1:
-            pop = os.popen("condor_q", "r")
-            while 1:
-                line = pop.readline()
-                line = line.decode()
-                if not line:
-                    break
-                values = queueExp.findall(line)
-                if len(values) == 0:
-                    continue
-                jobNum = values[0]
-                runstate = values[5]
-                for jobEntry in jobList:
-                    jobId = "%s.0" % jobEntry
-                    if (jobNum == jobId) and (runstate == 'R'):
-                        jobList = [job for job in jobList if job[:] != jobEntry]
-                        if len(jobList) == 0:
-                            return
-                        break
-                    else:
-                        continue
-                    if (jobNum == jobEntry) and (runstate == 'H'):
-                        pop.close()
+        pending = dict(("%s.0" % num, None) for num in numList)
+        interval = MIN_POLL_INTERVAL
+        while pending:
+            states = self.queryJobs([jobId.split(".")[0] for jobId in pending])
+            if states is not None:
+                changed = False
+                for jobId, lastState in list(pending.items()):
+                    runstate = states.get(jobId)
+                    if runstate == 'R':
+                        del pending[jobId]
+                        changed = True
+                    elif runstate == 'H':
                         # throw exception here
+                        print("Job %s is being held.  Please review the logs." % jobId)
                         return
-            pop.close()
-            time.sleep(1)
+                    elif runstate is None and lastState is not None:
+                        log.debug("CondorJobs:waitForAllJobsToRun: job %s left the queue", jobId)
+                        del pending[jobId]
+                        changed = True
+                    elif runstate != lastState:
+                        pending[jobId] = runstate
+                        changed = True
+                if not pending:
+                    return
+                if changed:
+                    interval = MIN_POLL_INTERVAL
+            time.sleep(interval)
+            interval = min(interval * POLL_BACKOFF, MAX_POLL_INTERVAL)
 
-    def condorSubmitDag(self, filename):
+    def condorSubmitDag(self, filename, cwd=None):
         """Submit a condor dag and return its cluster number
 
         Parameters
         ----------
         filename : `str`
-            name of condor DAG file
+            name of condor DAG file, relative to cwd
+        cwd : `str`, optional
+            directory DAGMan runs in; defaults to the current directory
+
+        Returns
+        -------
+        clusterId : `str`
+            cluster id of the DAGMan job, or -1 if it wasn't submitted
         """
         log.debug("CondorJobs: condorSubmitDag %s", filename)
-        # Just a note about why this was done this way...
-        # There's something wierd about how "condor_submit_dag" prints it's output.
-        # If you run it on the command line, it'll print the "1 job(s) submitted"
-        # message as one of the last lines of output.
-        # If you redirect output, even on the command line, to a file, it will
-        # be one of the first lines.
-        # In an effort to avoid having to fix any output behavior issues in the
-        # future, we just try and match every line of output with "1 jobs(s) submitted"
-        # and if we find, it, we grab the cluster id out of that line.
-        clusterexp = re.compile(r"1 job\(s\) submitted to cluster (\d+).")
-        cmd = "condor_submit_dag %s" % filename
-        log.debug(cmd)
-        process = subprocess.Popen(cmd.split(), shell=False, stdout=subprocess.PIPE)
-        output = []
-        line = process.stdout.readline()
-        line = line.decode()
-        i = 0
-        while line != "":
-            line = line.strip()
-            output.append(line)
-            line = process.stdout.readline()
-            line = line.decode()
-            i += 1
-        for line in output:
-            num = clusterexp.findall(line)
-            if len(num) != 0:
-                # read the rest (if any) and terminate
-                stdoutdata, stderrdata = process.communicate()
-                return num[0]
-        # read the rest (if any) and terminate
-        stdoutdata, stderrdata = process.communicate()
-        return -1
+        num = self.backend.submitDag(filename, cwd)
+        if num is None:
+            return -1
+        return num
 
     def killCondorId(self, cid):
         """Kill the HTCondor job with a this id
@@ -236,16 +253,7 @@ class CondorJobs:
             condor job id
         """
         log.debug("CondorJobs: killCondorId %s", str(cid))
-        cmd = "condor_rm "+str(cid)
-        process = subprocess.Popen(cmd.split(), shell=False, stdout=subprocess.PIPE)
-        line = process.stdout.readline()
-        line = line.decode()
-        while line != "":
-            line = line.strip()
-            line = process.stdout.readline()
-            line = line.decode()
-        # read the rest (if any) and terminate
-        stdoutdata, stderrdata = process.communicate()
+        self.backend.remove(cid)
 
     def isJobAlive(self, cid):
         """Check to see if the job with id "cid" is still alive
@@ -254,20 +262,14 @@ class CondorJobs:
         ----------
         cid : `str`
             condor job id
+
+        Returns
+        -------
+        alive : `bool`
+            True if a job of the cluster is still in the queue, or if the
+            queue couldn't be queried
         """
-        jobNum = int(cid)
-        cmd = "condor_q -af ClusterId"
-        process = subprocess.Popen(cmd.split(), shell=False, stdout=subprocess.PIPE)
-        while 1:
-            line = process.stdout.readline()
-            line = line.strip()
-            if not line:
-                break
-            value = int(line)
-            if value == jobNum:
-                # read the rest (if any) and terminate
-                stdoutdata, stderrdata = process.communicate()
-                return True
-        # read the rest (if any) and terminate
-        stdoutdata, stderrdata = process.communicate()
-        return False
+        states = self.queryJobs([cid])
+        if states is None:
+            return True
+        return len(states) > 0
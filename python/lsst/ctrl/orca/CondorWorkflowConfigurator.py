@@ -21,17 +21,38 @@
 #
 
 import stat
-import sys
 import os
 import os.path
+import re
 import getpass
+import subprocess
+import time
 
 import lsst.log as log
 
-from lsst.ctrl.orca.EnvString import EnvString
+from lsst.ctrl.orca.EnvString import EnvString, EnvResolver
 from lsst.ctrl.orca.WorkflowConfigurator import WorkflowConfigurator
 from lsst.ctrl.orca.CondorWorkflowLauncher import CondorWorkflowLauncher
 from lsst.ctrl.orca.TemplateWriter import TemplateWriter
+from lsst.ctrl.orca.StagingArea import StagingArea, fileDigest, writeIfChanged
+from lsst.ctrl.orca.dag import DagBuilder
+from lsst.ctrl.orca.exceptions import ConfigurationError
+
+# a DAG file line asking DAGMan for a node status file:  NODE_STATUS_FILE S2012Pipe.status 60
+_NODE_STATUS_FILE = re.compile(r"^\s*NODE_STATUS_FILE\s+(\S+)", re.IGNORECASE | re.MULTILINE)
+
+# the DAG generator script shipped in this package's etc directory, which takes the DAG name with -n
+BUNDLED_DAG_GENERATOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir,
+                                     os.pardir, os.pardir, "etc", "condor", "scripts", "generateDag.py")
+
+
+def _isBundledDagGenerator(script):
+    """Return whether a DAG generator script is the one shipped with this package
+    """
+    try:
+        return os.path.samefile(script, BUNDLED_DAG_GENERATOR)
+    except OSError:
+        return False
 
 ##
 #
@@ -98,6 +119,14 @@ class CondorWorkflowConfigurator(WorkflowConfigurator):
         # default root for the production
         self.defaultRoot = wfConfig.platform.dir.defaultRoot
 
+        # local staging area, and the writer shared by all the files
+        # generated from templates into it; set up by configure()
+        self.stagingArea = None
+        self.templateWriter = None
+
+        # snapshot of the environment the configuration's paths are resolved against
+        self.envResolver = None
+
     def configure(self, provSetup, wfVerbosity):
         """Setup as much as possible in preparation to execute the workflow
            and return a WorkflowLauncher object that will launch the
@@ -132,17 +161,19 @@ class CondorWorkflowConfigurator(WorkflowConfigurator):
 
         # local staging directory
         self.localStagingDir = os.path.join(self.localScratch, self.runid)
-        os.makedirs(self.localStagingDir)
+        os.makedirs(self.localStagingDir, exist_ok=True)
+        self.stagingArea = StagingArea(self.localStagingDir)
+        self.templateWriter = TemplateWriter(self.stagingArea.manifest)
 
-        # write the glidein file
-        startDir = os.getcwd()
-        os.chdir(self.localStagingDir)
+        # every path is resolved against the environment as it is now
+        self.envResolver = EnvResolver()
 
+        # write the glidein file; relative paths are in the staging directory,
+        # which is never made the working directory of the process
         if localConfig.glidein.template.inputFile is not None:
             self.writeGlideinFile(localConfig.glidein)
         else:
             log.debug("CondorWorkflowConfigurator: not writing glidein file")
-        os.chdir(startDir)
 
         # TODO - fix this loop for multiple condor submits; still working
         # out what this might mean.
@@ -152,124 +183,186 @@ class CondorWorkflowConfigurator(WorkflowConfigurator):
             # script directory
             self.scriptDir = task.scriptDir
 
-            # save initial directory we were called from so we can get back
-            # to it
-            startDir = os.getcwd()
-
-            # switch to staging directory
-            os.chdir(self.localStagingDir)
-
-            # switch to tasks directory in staging directory
-            taskOutputDir = os.path.join(self.localStagingDir, task.scriptDir)
-            os.makedirs(taskOutputDir)
-            os.chdir(taskOutputDir)
-
-            # generate pre job
-            preJobScript = EnvString.resolve(task.preJob.script.outputFile)
-            preJobScriptInputFile = EnvString.resolve(task.preJob.script.inputFile)
-            keywords = task.preJob.script.keywords
-            self.writeJobScript(preJobScript, preJobScriptInputFile, keywords)
-
-            preJobCondorOutputFile = EnvString.resolve(task.preJob.condor.outputFile)
-            preJobCondorInputFile = EnvString.resolve(task.preJob.condor.inputFile)
-            keywords = task.preJob.condor.keywords
-            self.writeJobScript(preJobCondorOutputFile, preJobCondorInputFile, keywords, preJobScript)
-
-            # generate post job
-            postJobScript = EnvString.resolve(task.postJob.script.outputFile)
-            postJobScriptInputFile = EnvString.resolve(task.postJob.script.inputFile)
-            keywords = task.postJob.script.keywords
-            self.writeJobScript(postJobScript, postJobScriptInputFile, keywords)
-
-            postJobCondorOutputFile = EnvString.resolve(task.postJob.condor.outputFile)
-            postJobCondorInputFile = EnvString.resolve(task.postJob.condor.inputFile)
-            keywords = task.postJob.condor.keywords
-            self.writeJobScript(postJobCondorOutputFile, postJobCondorInputFile, keywords, postJobScript)
-
-            # generate worker job
-            workerJobScript = EnvString.resolve(task.workerJob.script.outputFile)
-            workerJobScriptInputFile = EnvString.resolve(task.workerJob.script.inputFile)
-            keywords = task.workerJob.script.keywords
-            self.writeJobScript(workerJobScript, workerJobScriptInputFile, keywords)
-
-            workerJobCondorOutputFile = EnvString.resolve(task.workerJob.condor.outputFile)
-            workerJobCondorInputFile = EnvString.resolve(task.workerJob.condor.inputFile)
-            keywords = task.workerJob.condor.keywords
-            self.writeJobScript(workerJobCondorOutputFile,
-                                workerJobCondorInputFile, keywords, workerJobScript)
-
-            # switch to staging directory
-            os.chdir(self.localStagingDir)
-
-            # generate pre script
+            # tasks directory in staging directory; the job files are relative to it
+            taskOutputDir = self.stagingArea.path(task.scriptDir)
+            os.makedirs(taskOutputDir, exist_ok=True)
+
+            # resolve all of the task's paths at once
+            task.generator.name = "dag"
+            generatorConfig = task.generator.active
+            jobConfigs = (task.preJob, task.postJob, task.workerJob)
+            preScriptConfig = task.preScript.script
+            paths = [path for job in jobConfigs
+                     for path in (job.script.outputFile, job.script.inputFile,
+                                  job.condor.outputFile, job.condor.inputFile)]
+            if preScriptConfig.outputFile is not None:
+                paths += [preScriptConfig.outputFile, preScriptConfig.inputFile]
+            else:
+                paths += [None, None]
+            paths.append(generatorConfig.inputFile)
+            paths = EnvString.resolve_many(paths, self.envResolver)
+            preScriptOutputFile, preScriptInputFile, dagGeneratorInput = paths[-3:]
+            dagGeneratorInput = self.stagingArea.path(dagGeneratorInput)
+
+            # generate pre, post and worker jobs: a script and the condor
+            # file that runs it for each
+            jobs = []
+            for index, job in enumerate(jobConfigs):
+                jobScript, jobScriptInputFile, jobCondorOutputFile, jobCondorInputFile = \
+                    paths[4*index:4*index + 4]
+                jobs.append((os.path.join(taskOutputDir, jobScriptInputFile),
+                             os.path.join(taskOutputDir, jobScript),
+                             self.jobScriptPairs(job.script.keywords)))
+                jobs.append((os.path.join(taskOutputDir, jobCondorInputFile),
+                             os.path.join(taskOutputDir, jobCondorOutputFile),
+                             self.jobScriptPairs(job.condor.keywords, jobScript)))
+            self.templateWriter.render_many(jobs)
+
+            # generate pre script; it and the dag are relative to the staging directory
             log.debug("CondorWorkflowConfigurator:configure: generate pre script")
 
-            if task.preScript.script.outputFile is not None:
-                preScriptOutputFile = EnvString.resolve(task.preScript.script.outputFile)
-                preScriptInputFile = EnvString.resolve(task.preScript.script.inputFile)
-                keywords = task.preScript.script.keywords
-                self.writePreScript(preScriptOutputFile, preScriptInputFile, keywords)
-                os.chmod(task.preScript.outputFile, stat.S_IRWXU | stat.S_IRGRP |
+            if preScriptOutputFile is not None:
+                keywords = preScriptConfig.keywords
+                preScript = self.stagingArea.path(preScriptOutputFile)
+                self.writePreScript(preScript, self.stagingArea.path(preScriptInputFile), keywords)
+                os.chmod(preScript, stat.S_IRWXU | stat.S_IRGRP |
                          stat.S_IXGRP | stat.S_IROTH | stat.S_IXOTH)
 
             # generate dag
             log.debug("CondorWorkflowConfigurator:configure: generate dag")
 
-            task.generator.name = "dag"
-            generatorConfig = task.generator.active
-            dagGenerator = EnvString.resolve(generatorConfig.script)
-            dagGeneratorInput = EnvString.resolve(generatorConfig.inputFile)
-            dagCreatorCmd = [dagGenerator, "-s", dagGeneratorInput, "-w", task.scriptDir, "-t",
-                             task.workerJob.condor.outputFile, "-r",
-                             self.runid, "--idsPerJob", str(generatorConfig.idsPerJob)]
-            if task.preScript.script.outputFile is not None:
-                dagCreatorCmd.append("-p")
-                dagCreatorCmd.append(task.preScript.script.outputFile)
-            pid = os.fork()
-            if not pid:
-                # turn off all output from this command
-                sys.stdin.close()
-                sys.stdout.close()
-                sys.stderr.close()
-                os.close(0)
-                os.close(1)
-                os.close(2)
-                os.execvp(dagCreatorCmd[0], dagCreatorCmd)
-            os.wait()[0]
+            if generatorConfig.script is None:
+                builder = DagBuilder.fromConfig(generatorConfig, task.scriptDir,
+                                                task.workerJob.condor.outputFile, self.runid,
+                                                task.preScript.script.outputFile)
+                result = builder.build(dagGeneratorInput, self.localStagingDir, self.stagingArea.manifest)
+                log.debug("CondorWorkflowConfigurator:configure: %s", result)
+                buckets = result.buckets
+                nodeStatusFile = builder.getNodeStatusFileName()
+            else:
+                self.runDagGeneratorScript(task, generatorConfig, dagGeneratorInput)
+                buckets = DagBuilder.logBuckets(DagBuilder.countIds(dagGeneratorInput),
+                                                generatorConfig.logBucketSize)
+                nodeStatusFile = self.addNodeStatusFile(generatorConfig)
 
             # create dag logs directories
-            fileObj = open(dagGeneratorInput, 'r')
-            visitSet = set()
-            count = 0
-            # this info from gd:
-            # Searching for a space detects
-            # extended input like :  visit=887136081 raft=2,2 sensor=0,1
-            # No space is something simple like a skytile id
-            for aline in fileObj:
-                count += 1
-                visit = str(count//100)
-                visitSet.add(visit)
-            log.debug("CondorWorkflowConfigurator:configure: about to make logs")
-            logDirName = os.path.join(self.localStagingDir, "logs")
-            log.debug("CondorWorkflowConfigurator:configure: logDirName = %s", logDirName)
-            logDirName = os.path.join(self.localStagingDir, "logs")
-            os.makedirs(logDirName)
-            for visit in visitSet:
-                dirName = os.path.join(logDirName, visit)
-                log.debug("making dir %s ", dirName)
-                os.makedirs(dirName)
-
-            # change back to initial directory
-            os.chdir(startDir)
+            log.debug("CondorWorkflowConfigurator:configure: about to make %d log directories",
+                      len(buckets))
+            self.stagingArea.makeDirs("logs", buckets)
+
+        # record what was staged, for later stages and remote syncs
+        self.stagingArea.manifest.save()
 
         # create the Launcher
 
         workflowLauncher = CondorWorkflowLauncher(self.prodConfig, self.wfConfig, self.runid,
                                                   self.localStagingDir,
                                                   generatorConfig.dagName + ".diamond.dag",
-                                                  wfConfig.monitor)
+                                                  wfConfig.monitor, nodeStatusFile, self.wfName)
         return workflowLauncher
 
+    def runDagGeneratorScript(self, task, generatorConfig, dagGeneratorInput):
+        """Run an external DAG generator script in the local staging directory
+
+        Parameters
+        ----------
+        task : Config
+            task configuration
+        generatorConfig : Config
+            the "dag" generator configuration of the task
+        dagGeneratorInput : str
+            input id list for the generator
+
+        Notes
+        -----
+        Generators are called with the same ``-s``, ``-w``, ``-t``, ``-r``, ``--idsPerJob``
+        and ``-p`` options as before.  The DAG name is only passed, with ``-n``, to the
+        generateDag.py script shipped in etc/condor/scripts (BUNDLED_DAG_GENERATOR); any other
+        script must write ``<dagName>.diamond.dag`` itself.  The ``--subDagType`` option, and
+        ``--nodesPerSubDag``/``--maxJobsPerSubDag``/``--subDagByVisit`` when they differ from
+        their defaults, are only added when ``subDagType`` is set, so existing scripts keep
+        working with the configurations they were written for.
+
+        Raises
+        ------
+        `ConfigurationError`
+            if the generator script can't be run, exits with a non-zero status
+            or doesn't write <dagName>.diamond.dag
+        """
+        dagGenerator = self.envResolver.resolve(generatorConfig.script)
+        dagCreatorCmd = [dagGenerator, "-s", dagGeneratorInput, "-w", task.scriptDir,
+                         "-t", task.workerJob.condor.outputFile, "-r", self.runid,
+                         "--idsPerJob", str(generatorConfig.idsPerJob)]
+        if task.preScript.script.outputFile is not None:
+            dagCreatorCmd.append("-p")
+            dagCreatorCmd.append(task.preScript.script.outputFile)
+        if _isBundledDagGenerator(dagGenerator):
+            dagCreatorCmd += ["-n", generatorConfig.dagName]
+        if generatorConfig.subDagType is not None:
+            defaults = type(generatorConfig)
+            dagCreatorCmd += ["--subDagType", generatorConfig.subDagType]
+            if generatorConfig.nodesPerSubDag != defaults.nodesPerSubDag.default:
+                dagCreatorCmd += ["--nodesPerSubDag", str(generatorConfig.nodesPerSubDag)]
+            if generatorConfig.maxJobsPerSubDag != defaults.maxJobsPerSubDag.default:
+                dagCreatorCmd += ["--maxJobsPerSubDag", str(generatorConfig.maxJobsPerSubDag)]
+            if generatorConfig.subDagByVisit:
+                dagCreatorCmd.append("--subDagByVisit")
+
+        log.debug("CondorWorkflowConfigurator:runDagGeneratorScript: %s", " ".join(dagCreatorCmd))
+        startTime = time.time()
+        try:
+            process = subprocess.run(dagCreatorCmd, cwd=self.localStagingDir, stdin=subprocess.DEVNULL,
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except OSError as error:
+            raise ConfigurationError("couldn't run DAG generator %s: %s" % (dagGenerator, error))
+        if process.returncode != 0:
+            errmsg = process.stderr.decode(errors="replace").strip()
+            raise ConfigurationError("DAG generator %s failed with exit status %d: %s" %
+                                     (dagGenerator, process.returncode, errmsg))
+        log.debug("CondorWorkflowConfigurator:runDagGeneratorScript: finished in %.3f seconds",
+                  time.time() - startTime)
+        dagFile = os.path.join(self.localStagingDir, generatorConfig.dagName + ".diamond.dag")
+        if not os.path.exists(dagFile):
+            raise ConfigurationError("DAG generator %s didn't write %s" % (dagGenerator, dagFile))
+
+    def addNodeStatusFile(self, generatorConfig):
+        """Find, or ask DAGMan for, the node status file of a DAG written by an external generator script
+
+        Parameters
+        ----------
+        generatorConfig : Config
+            the "dag" generator configuration of the task
+
+        Returns
+        -------
+        nodeStatusFile : `str`
+            the node status file, relative to the local staging directory;
+            None if the DAG has none
+
+        Notes
+        -----
+        A NODE_STATUS_FILE line the script wrote is used as it is.  Otherwise
+        one is added only if scriptNodeStatusFile is set, and nodeStatusUpdate
+        is positive.  The DAG's digest is recorded in the staging manifest.
+        """
+        dagFile = os.path.join(self.localStagingDir, generatorConfig.dagName + ".diamond.dag")
+        with open(dagFile, "r") as fp:
+            text = fp.read()
+        match = _NODE_STATUS_FILE.search(text)
+        if match is not None:
+            nodeStatusFile = match.group(1)
+        elif generatorConfig.scriptNodeStatusFile and generatorConfig.nodeStatusUpdate > 0:
+            nodeStatusFile = generatorConfig.dagName + ".status"
+            if text and not text.endswith("\n"):
+                text += "\n"
+            text += DagBuilder.nodeStatusLine(nodeStatusFile, generatorConfig.nodeStatusUpdate)
+            # the manifest can't vouch for a file the script rewrote, so it's compared in full
+            writeIfChanged(dagFile, text)
+        else:
+            nodeStatusFile = None
+        self.stagingArea.manifest.record(dagFile, fileDigest(dagFile))
+        return nodeStatusFile
+
     def writePreScript(self, outputFileName, template, keywords):
         """Write the HTCondor prescript script
 
@@ -288,8 +381,7 @@ class CondorWorkflowConfigurator(WorkflowConfigurator):
             pairs[value] = val
         pairs["ORCA_RUNID"] = self.runid
         pairs["ORCA_DEFAULTROOT"] = self.defaultRoot
-        writer = TemplateWriter()
-        writer.rewrite(template, outputFileName, pairs)
+        self.templateWriter.rewrite(template, outputFileName, pairs)
 
     def writeJobScript(self, outputFileName, template, keywords, scriptName=None):
         """Write the HTCondor script that is used to execute the job
@@ -305,6 +397,24 @@ class CondorWorkflowConfigurator(WorkflowConfigurator):
         scriptName : str, optional
             name of script to substitute in place of default
         """
+        pairs = self.jobScriptPairs(keywords, scriptName)
+        self.templateWriter.rewrite(template, outputFileName, pairs)
+
+    def jobScriptPairs(self, keywords, scriptName=None):
+        """Return the key/value pairs substituted into a job script template
+
+        Parameters
+        ----------
+        keywords : { 'key1' : 'value', 'key2' : 'value2'}
+            keyword/value dictionary
+        scriptName : str, optional
+            name of script to substitute in place of default
+
+        Returns
+        -------
+        pairs : `dict`
+            the keywords, plus the ORCA_ values set for every job
+        """
         pairs = {}
         for value in keywords:
             val = keywords[value]
@@ -313,8 +423,7 @@ class CondorWorkflowConfigurator(WorkflowConfigurator):
             pairs["ORCA_SCRIPT"] = self.scriptDir+"/"+scriptName
         pairs["ORCA_RUNID"] = self.runid
         pairs["ORCA_DEFAULTROOT"] = self.defaultRoot
-        writer = TemplateWriter()
-        writer.rewrite(template, outputFileName, pairs)
+        return pairs
 
     def writeGlideinFile(self, glideinConfig):
         """Write the HTCondor glide-in file
@@ -325,7 +434,7 @@ class CondorWorkflowConfigurator(WorkflowConfigurator):
             config file used to write glide-in information
         """
         template = glideinConfig.template
-        inputFile = EnvString.resolve(template.inputFile)
+        inputFile = self.envResolver.resolve(template.inputFile)
 
         # copy the keywords so we can add a couple more
         pairs = {}
@@ -336,8 +445,8 @@ class CondorWorkflowConfigurator(WorkflowConfigurator):
         if "ORCA_START_OWNER" not in pairs:
             pairs["ORCA_START_OWNER"] = getpass.getuser()
 
-        writer = TemplateWriter()
-        writer.rewrite(inputFile, template.outputFile, pairs)
+        outputFile = self.stagingArea.path(template.outputFile)
+        self.templateWriter.rewrite(self.stagingArea.path(inputFile), outputFile, pairs)
 
     def getWorkflowName(self):
         """get the workflow name
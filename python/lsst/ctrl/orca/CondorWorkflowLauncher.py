@@ -24,7 +24,11 @@ import os
 import lsst.log as log
 from lsst.ctrl.orca.WorkflowLauncher import WorkflowLauncher
 from lsst.ctrl.orca.CondorJobs import CondorJobs
+from lsst.ctrl.orca.AsyncCondorJobs import AsyncCondorJobs
+from lsst.ctrl.orca.JobBackend import getJobBackend
 from lsst.ctrl.orca.CondorWorkflowMonitor import CondorWorkflowMonitor
+from lsst.ctrl.orca.EventLogWorkflowMonitor import EventLogWorkflowMonitor
+from lsst.ctrl.orca import EventLog
 
 
 class CondorWorkflowLauncher(WorkflowLauncher):
@@ -44,9 +48,14 @@ class CondorWorkflowLauncher(WorkflowLauncher):
         DAGman file
     monitorConfig : Config
         monitor Config
+    nodeStatusFile : str, optional
+        node status file DAGMan writes, relative to localStagingDir
+    wfName : str, optional
+        name of the workflow
     """
 
-    def __init__(self, prodConfig, wfConfig, runid, localStagingDir, dagFile, monitorConfig):
+    def __init__(self, prodConfig, wfConfig, runid, localStagingDir, dagFile, monitorConfig,
+                 nodeStatusFile=None, wfName=None):
         log.debug("CondorWorkflowLauncher:__init__")
 
         self.prodConfig = prodConfig
@@ -55,6 +64,32 @@ class CondorWorkflowLauncher(WorkflowLauncher):
         self.localStagingDir = localStagingDir
         self.dagFile = dagFile
         self.monitorConfig = monitorConfig
+        self.nodeStatusFile = nodeStatusFile
+        self.wfName = wfName
+
+    @classmethod
+    def fromRunState(cls, prodConfig, wfConfig, runid, wfName, runState):
+        """Create the launcher of a workflow another process launched
+
+        Parameters
+        ----------
+        prodConfig : Config
+            production Config
+        wfConfig : Config
+            workflow Config
+        runid : str
+            run id
+        wfName : str
+            name of the workflow
+        runState : dict
+            what getRunState() reported when the workflow was launched
+
+        Returns
+        -------
+        launcher : `CondorWorkflowLauncher`
+        """
+        return cls(prodConfig, wfConfig, runid, runState["stagingDir"], runState["dagFile"],
+                   wfConfig.monitor, runState["nodeStatusFile"], wfName)
 
     def cleanUp(self):
         """Perform cleanup after workflow has ended.
@@ -68,25 +103,140 @@ class CondorWorkflowLauncher(WorkflowLauncher):
         ----------
         statusListener : StatusListener
             status listener object
+
+        Returns
+        -------
+        workflowMonitor : `CondorWorkflowMonitor`
+
+        Raises
+        ------
+        RuntimeError
+            if the dag couldn't be submitted
         """
         log.debug("CondorWorkflowLauncher:launch")
 
-        # start the monitor
+        # submit from the staging directory; the process's working directory is left alone
+        cj = CondorJobs(getJobBackend(self.monitorConfig.jobBackend))
+        offsets = self._logOffsets()
+        condorDagId = cj.condorSubmitDag(self.dagFile, cwd=self.localStagingDir)
+        if condorDagId == -1:
+            raise RuntimeError("dag %s of workflow %s wasn't submitted" % (self.dagFile, self.wfName))
+        log.debug("Condor dag submitted as job %s", condorDagId)
+
+        return self._startMonitor(condorDagId, statusListener, offsets)
 
-        # Launch process
-        startDir = os.getcwd()
-        os.chdir(self.localStagingDir)
+    async def launchAsync(self, statusListener):
+        """Launch this workflow from asyncio code
 
-        cj = CondorJobs()
-        condorDagId = cj.condorSubmitDag(self.dagFile)
+        Parameters
+        ----------
+        statusListener : StatusListener
+            status listener object
+
+        Notes
+        -----
+        condor_submit_dag runs as an asyncio subprocess in the staging
+        directory, so the workflows of a production can be submitted at
+        the same time.  With the other job backends, launch() runs on the
+        event loop's default executor.  As launch(), this raises RuntimeError
+        if the dag couldn't be submitted.
+        """
+        log.debug("CondorWorkflowLauncher:launchAsync")
+        if self.monitorConfig.jobBackend != "cli":
+            return await WorkflowLauncher.launchAsync(self, statusListener)
+
+        offsets = self._logOffsets()
+        condorDagId = await AsyncCondorJobs.getInstance().submit_dag(self.dagFile, cwd=self.localStagingDir)
+        if condorDagId == -1:
+            raise RuntimeError("dag %s of workflow %s wasn't submitted" % (self.dagFile, self.wfName))
         log.debug("Condor dag submitted as job %s", condorDagId)
-        os.chdir(startDir)
 
+        return self._startMonitor(condorDagId, statusListener, offsets)
+
+    def _logOffsets(self):
+        """Note where the logs of a dag submitted now will start
+
+        Returns
+        -------
+        offsets : `dict` [`str`, `int`]
+            the current size of each of the dag's logs; None unless the
+            eventlog monitor backend follows them
+        """
+        if self.monitorConfig.backend != "eventlog":
+            return None
+        return EventLog.logOffsets(os.path.join(self.localStagingDir, self.dagFile))
+
+    def _startMonitor(self, condorDagId, statusListener, logOffsets=None):
+        """Start monitoring the submitted dag
+
+        Parameters
+        ----------
+        condorDagId : `str`
+            job id of the submitted dag
+        statusListener : StatusListener
+            status listener object
+        logOffsets : `dict` [`str`, `int`], optional
+            sizes of the dag's logs before it was submitted; the logs are
+            read from their start if not given
+
+        Returns
+        -------
+        workflowMonitor : `CondorWorkflowMonitor`
+        """
         # workflow monitor for HTCondor jobs
-        self.workflowMonitor = CondorWorkflowMonitor(condorDagId, self.monitorConfig)
+        nodeStatusFile = None
+        if self.nodeStatusFile is not None:
+            nodeStatusFile = os.path.join(self.localStagingDir, self.nodeStatusFile)
+        if self.monitorConfig.backend == "eventlog":
+            dagFile = os.path.join(self.localStagingDir, self.dagFile)
+            self.workflowMonitor = EventLogWorkflowMonitor(condorDagId, self.monitorConfig, dagFile,
+                                                           nodeStatusFile, self.wfName, self.runid,
+                                                           logOffsets)
+        else:
+            self.workflowMonitor = CondorWorkflowMonitor(condorDagId, self.monitorConfig, nodeStatusFile,
+                                                         self.wfName, self.runid)
 
         if statusListener is not None:
             self.workflowMonitor.addStatusListener(statusListener)
         self.workflowMonitor.startMonitorThread()
 
         return self.workflowMonitor
+
+    def getRunState(self):
+        """Report what a new process needs to monitor the launched workflow again
+
+        Returns
+        -------
+        runState : `dict`
+            this launcher's module, the condorDagId of the dag, the staging
+            directory, and the DAG and node status files in it
+        """
+        return {"launcher": type(self).__module__,
+                "condorDagId": str(self.workflowMonitor.condorDagId),
+                "stagingDir": os.path.abspath(self.localStagingDir),
+                "dagFile": self.dagFile,
+                "nodeStatusFile": self.nodeStatusFile}
+
+    def reattach(self, condorDagId, statusListener):
+        """Monitor a dag submitted by another process, without submitting anything
+
+        Parameters
+        ----------
+        condorDagId : `str`
+            job id of the submitted dag
+        statusListener : StatusListener
+            status listener object
+
+        Returns
+        -------
+        workflowMonitor : `CondorWorkflowMonitor`
+
+        Notes
+        -----
+        With the eventlog monitor backend, the dag's logs are read again from
+        their start, so the node events logged while no process monitored
+        the dag are published too; an exit logged by an earlier DAGMan job
+        in the same directory is ignored.
+        """
+        log.debug("CondorWorkflowLauncher:reattach: dag %s", condorDagId)
+        return self._startMonitor(condorDagId, statusListener)
@@ -27,6 +27,11 @@ import lsst.log as log
 from lsst.ctrl.orca.WorkflowMonitor import WorkflowMonitor
 from lsst.ctrl.orca.multithreading import SharedData
 from lsst.ctrl.orca.CondorJobs import CondorJobs
+from lsst.ctrl.orca.JobBackend import getJobBackend
+from lsst.ctrl.orca.QueuePoller import QueuePoller
+from lsst.ctrl.orca.DagProgress import DagProgress, NODE_STATES, IDLE, RUNNING, DONE, FAILED
+from lsst.ctrl.orca import EventBus
+from lsst.ctrl.orca.Metrics import Metrics, DAG_NODES, MONITOR_LAG
 
 
 # HTCondor workflow monitor
@@ -39,8 +44,15 @@ class CondorWorkflowMonitor(WorkflowMonitor):
         job id of submitted HTCondor dag
     monitorConfig : Config
         configuration file for monitor information
+    nodeStatusFile : `str`, optional
+        node status file DAGMan writes for the dag; progress is logged from
+        it while the dag runs, and node events are published from it
+    name : `str`, optional
+        name of the workflow, used in the events published
+    runid : `str`, optional
+        run id of the production the workflow belongs to, used in the events published
     """
-    def __init__(self, condorDagId, monitorConfig):
+    def __init__(self, condorDagId, monitorConfig, nodeStatusFile=None, name=None, runid=None):
 
         # _locked: a container for data to be shared across threads that
         # have access to this object.
@@ -49,18 +61,29 @@ class CondorWorkflowMonitor(WorkflowMonitor):
         log.debug("CondorWorkflowMonitor:__init__")
         self._statusListeners = []
 
+        # name of the workflow, used in the events this monitor publishes
+        self.name = name
+
+        # run id of the production the workflow belongs to, used in the events this monitor publishes
+        self.runid = runid
+
+        # the workflow's exit status, once it has completed, if known
+        self.exitStatus = None
+
         # make a copy of this liste, since we'll be removing things.
 
         self.condorDagId = condorDagId
 
         self.monitorConfig = monitorConfig
 
+        # progress of the dag's nodes, if DAGMan writes a node status file
+        self.progress = DagProgress(nodeStatusFile) if nodeStatusFile is not None else None
+        self._progressLock = threading.Lock()
+
         self._wfMonitorThread = None
 
         with self._locked:
-            self._wfMonitorThread = CondorWorkflowMonitor._WorkflowMonitorThread(self,
-                                                                                 self.condorDagId,
-                                                                                 self.monitorConfig)
+            self._wfMonitorThread = self._WorkflowMonitorThread(self, self.condorDagId, self.monitorConfig)
 
     class _WorkflowMonitorThread(threading.Thread):
         """Workflow thread that watches for shutdown
@@ -88,23 +111,153 @@ class CondorWorkflowMonitor(WorkflowMonitor):
         def run(self):
             """Continously monitor life of workflow, shutting down when complete
             """
-            cj = CondorJobs()
             log.debug("CondorWorkflowMonitor Thread started")
             statusCheckInterval = int(self.monitorConfig.statusCheckInterval)
-            sleepInterval = statusCheckInterval
-            # we don't decide when we finish, someone else does.
-            while True:
-                time.sleep(sleepInterval)
 
-                # if the dag is no longer running, return
-                if not cj.isJobAlive(self.condorDagId):
-                    print("work complete.")
-                    with self._parent._locked:
-                        self._parent._locked.running = False
+            # the queue is polled once for every monitor in the process
+            poller = QueuePoller.getInstance(self.monitorConfig.jobBackend)
+            poller.register(self.condorDagId, statusCheckInterval)
+            try:
+                generation = poller.waitForPoll(timeout=0)
+                while True:
+                    # wake up as soon as the queue was polled again
+                    generation = poller.waitForPoll(generation, timeout=statusCheckInterval)
+                    pollTime = poller.getPollTime()
+                    if pollTime is not None:
+                        Metrics.getInstance().gauge(MONITOR_LAG).set(time.time() - pollTime,
+                                                                     *self._parent.getMetricLabels())
+                    self._parent.updateProgress()
+
+                    # if the dag is no longer running, return
+                    if not poller.isJobAlive(self.condorDagId):
+                        print("work complete.")
+                        self._parent.updateProgress()
+                        self._parent.handleCompletion(self._parent.getExitStatus())
+                        return
+            finally:
+                poller.unregister(self.condorDagId)
+
+    def getName(self):
+        """Accessor to the name of the workflow, as given in its events
+        """
+        return self.name if self.name is not None else "dag %s" % self.condorDagId
+
+    def getMetricLabels(self):
+        """Return the run id and name of the workflow, as labelled in the metrics
+        """
+        return (self.runid if self.runid is not None else "", self.getName())
+
+    def updateProgress(self):
+        """Read the node status file again, logging the dag's progress if it changed
+        """
+        if self.progress is None:
+            return
+        with self._progressLock:
+            nodes = self.progress.reader.nodes
+            if self.progress.update():
+                log.info("CondorWorkflowMonitor: dag %s: %s", self.condorDagId, self.progress)
+                self.publishNodeChanges(nodes, self.progress.reader.nodes)
+                gauge = Metrics.getInstance().gauge(DAG_NODES)
+                for state, count in self.progress.counts.items():
+                    gauge.set(count, *self.getMetricLabels(), state)
+
+    def publishNodeChanges(self, oldNodes, newNodes):
+        """Publish the node events that explain the change between two reads of the node status file
+
+        Parameters
+        ----------
+        oldNodes, newNodes : `dict`
+            DAG node -> IDLE, RUNNING, DONE or FAILED, before and after
+        """
+        for node, state in newNodes.items():
+            oldState = oldNodes.get(node)
+            if state == oldState:
+                continue
+            if state == RUNNING:
+                self.publishEvent(EventBus.NODE_STARTED, node=node)
+            elif state == DONE:
+                self.publishEvent(EventBus.NODE_FINISHED, node=node, returnValue=0)
+            elif state == FAILED:
+                self.publishEvent(EventBus.NODE_FINISHED, node=node)
+
+    def getExitStatus(self):
+        """Return the dag's exit status, as far as the node status file tells
+
+        Returns
+        -------
+        exitStatus : `int`
+            1 if a node failed, or DAGMan reported the dag failed; 0 if every
+            node is done; None without a node status file, or if nodes were
+            left idle or running, as when the dag was removed with condor_rm
+            or DAGMan's last write of the file was missed
+        """
+        if self.progress is None or not self.progress.reader.nodes:
+            return None
+        with self._progressLock:
+            counts = self.progress.counts
+            dagStatus = self.progress.reader.dagStatus.get("DagStatus")
+            if counts[FAILED] or NODE_STATES.get(dagStatus) == FAILED:
+                return 1
+            if counts[IDLE] or counts[RUNNING]:
+                return None
+            return 0
+
+    def getProgress(self):
+        """Report the progress of the dag's nodes
+
+        Returns
+        -------
+        progress : `dict`
+            number of idle, running, done and failed nodes, throughput in
+            nodes per minute and the ETA in seconds, the last two None when
+            unknown; None if there is no node status file
+        """
+        if self.progress is None:
+            return None
+        with self._progressLock:
+            progress = dict(self.progress.counts)
+            progress["throughput"] = self.progress.throughput()
+            progress["eta"] = self.progress.eta()
+            return progress
+
+    def getNodeStates(self):
+        """Return the state of each DAG node, as of the last read of the node status file
+
+        Returns
+        -------
+        nodeStates : { 'A1' : 'done', 'A2' : 'running' }
+            IDLE, RUNNING, DONE or FAILED for each node
+        """
+        if self.progress is None:
+            return {}
+        with self._progressLock:
+            return dict(self.progress.reader.nodes)
+
+    def getStatus(self, nodes=False):
+        """Report the status of the dag, from what the monitor already knows
+
+        Parameters
+        ----------
+        nodes : `bool`, optional
+            include the state of each node
+
+        Returns
+        -------
+        status : `dict`
+            the workflow's name, whether it is running or done, its exit
+            status, dag id and progress, and the node states if asked for
+        """
+        status = WorkflowMonitor.getStatus(self)
+        status["condorDagId"] = str(self.condorDagId)
+        status["progress"] = self.getProgress()
+        if nodes:
+            status["nodes"] = self.getNodeStates()
+        return status
 
     def startMonitorThread(self):
         """Begin one monitor thread
         """
+        self.publishEvent(EventBus.WORKFLOW_STARTED, jobId=str(self.condorDagId))
         with self._locked:
             self._wfMonitorThread.start()
             self._locked.running = True
@@ -116,5 +269,5 @@ class CondorWorkflowMonitor(WorkflowMonitor):
 
         # do a condor_rm on the cluster id for the dag we submitted.
         print("shutdown request received: stopping workflow")
-        cj = CondorJobs()
+        cj = CondorJobs(getJobBackend(self.monitorConfig.jobBackend))
         cj.killCondorId(self.condorDagId)
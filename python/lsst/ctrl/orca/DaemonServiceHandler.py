@@ -0,0 +1,196 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+
+import json
+import urllib.parse
+
+from lsst.ctrl.orca.ServiceHandler import ServiceHandler
+
+
+class DaemonServiceHandler(ServiceHandler):
+    """Serves the REST API of a ProductionDaemon.
+
+    Notes
+    -----
+    GET /api/v1/productions lists the productions, and POST to it submits
+    one, as {"runid": ..., "configFile": ...} with optional "repository",
+    "skipConfigCheck" and "workflowVerbosity".  The production, workflow
+    and event resources of a single production are served under
+    /api/v1/productions/<runid>, and DELETE on it stops the production, or
+    forgets it once it has finished.  DELETE /api/v1/production with the
+    run id in the body stops a production as it would a single one, and
+    /api/v1/metrics covers every production.
+    """
+
+    productions = "/api/%s/productions" % ServiceHandler.version
+
+    def do_GET(self):
+        """handle a HTTP GET request
+        """
+        url = urllib.parse.urlsplit(self.path)
+        if url.path == self.metrics:
+            ServiceHandler.do_GET(self)
+            return
+        if url.path == self.productions:
+            self.writeJson(200, {"productions": self.parent.getProductions()})
+            return
+        runid, resource = self.splitPath(url.path)
+        if runid is None:
+            self.send_response(404)
+            self.end_headers()
+            self.writeError("Not Found", "Resource %s is unknown" % self.path)
+            return
+
+        production = self.parent.getProduction(runid)
+        if resource == "" and production is None:
+            state = self.parent.getProductionState(runid)
+            if state is not None:
+                # the production is launching, or failed to
+                self.writeJson(200, state)
+                return
+        if production is None:
+            self.send_response(404)
+            self.end_headers()
+            self.writeError("Not Found", "Production %s is unknown" % runid)
+            return
+
+        query = urllib.parse.parse_qs(url.query)
+        if resource == "":
+            self.writeStatus(None, query, production)
+        elif resource == "/events":
+            self.writeEvents(production)
+        elif resource.startswith("/workflows/"):
+            self.writeStatus(urllib.parse.unquote(resource[len("/workflows/"):]), query, production)
+        else:
+            self.send_response(404)
+            self.end_headers()
+            self.writeError("Not Found", "Resource %s is unknown" % self.path)
+
+    def do_POST(self):
+        """handle a HTTP POST request, submitting a production
+        """
+        if self.path != self.productions:
+            self.send_response(400)
+            self.end_headers()
+            self.writeError("Bad Request", "Request is unsupported")
+            return
+        try:
+            data = json.loads(self.readBody())
+            runid = data["runid"]
+            configFile = data["configFile"]
+            if not isinstance(runid, str) or not isinstance(configFile, str) or "/" in runid:
+                raise ValueError("runid and configFile must be strings, and runid can't contain a /")
+        except Exception as error:
+            self.send_response(422)
+            self.end_headers()
+            self.writeError("Unprocessable entity", "Error in syntax of message: %s" % error)
+            return
+        try:
+            self.parent.submit(runid, configFile, data.get("repository"), bool(data.get("skipConfigCheck")),
+                               data.get("workflowVerbosity"))
+        except ValueError as error:
+            self.send_response(409)
+            self.end_headers()
+            self.writeError("Conflict", str(error))
+            return
+        self.writeJson(202, self.parent.getProductionState(runid),
+                       {"Location": "%s/%s" % (self.productions, urllib.parse.quote(runid))})
+
+    def do_DELETE(self):
+        """handle a HTTP DELETE request, stopping or forgetting a production
+        """
+        runid, resource = self.splitPath(self.path)
+        level = 0
+        try:
+            body = self.readBody()
+            data = json.loads(body) if body else {}
+            if self.path == self.production:
+                runid = data["runid"]
+                resource = ""
+            level = int(data.get("level", level))
+        except Exception as error:  # noqa: F841
+            self.send_response(422)
+            self.end_headers()
+            self.writeError("Unprocessable entity", "Error in syntax of message")
+            return
+        if runid is None or resource != "":
+            self.send_response(400)
+            self.end_headers()
+            self.writeError("Bad Request", "Request is unsupported")
+            return
+        if self.parent.getProductionState(runid) is None:
+            self.send_response(404)
+            self.end_headers()
+            self.writeError("Not Found", "Production %s is unknown" % runid)
+            return
+        self.send_response(204)
+        self.end_headers()
+        self.wfile.flush()
+        self.parent.stopProduction(runid, level)
+
+    def splitPath(self, path):
+        """Split the path of a production's resource
+
+        Parameters
+        ----------
+        path : `str`
+            the path of the request, without its query
+
+        Returns
+        -------
+        runid, resource : `str`
+            the run id, and what follows it in the path, e.g. '/workflows/wf';
+            (None, None) if the path isn't under /api/v1/productions/
+        """
+        prefix = self.productions + "/"
+        if not path.startswith(prefix) or len(path) == len(prefix):
+            return None, None
+        runid, slash, resource = path[len(prefix):].partition("/")
+        return urllib.parse.unquote(runid), slash + resource
+
+    def readBody(self):
+        """Read the body of the request; empty if it has none
+        """
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length > 0 else b""
+
+    def writeJson(self, code, document, headers=None):
+        """Respond with a JSON document
+
+        Parameters
+        ----------
+        code : `int`
+            the HTTP status code
+        document : `object`
+            what is written as JSON
+        headers : `dict`, optional
+            more headers of the response
+        """
+        body = json.dumps(document, sort_keys=True).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
@@ -0,0 +1,260 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+import collections
+import os
+import re
+import time
+
+# DAGMan NodeStatus codes, grouped into the states orca reports
+IDLE = "idle"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+NODE_STATES = {0: IDLE,      # STATUS_NOT_READY
+               1: IDLE,      # STATUS_READY
+               2: RUNNING,   # STATUS_PRERUN
+               3: RUNNING,   # STATUS_SUBMITTED
+               4: RUNNING,   # STATUS_POSTRUN
+               5: DONE,      # STATUS_DONE
+               6: FAILED,    # STATUS_ERROR
+               7: FAILED}    # STATUS_FUTILE
+
+# seconds of history the throughput is computed over
+THROUGHPUT_WINDOW = 600.0
+
+# an attribute of a ClassAd in a node status file:  Node = "A1";
+_ATTRIBUTE = re.compile(r'^\s*(\w+)\s*=\s*(.*?);?\s*(/\*.*\*/)?\s*$')
+
+
+def _value(text):
+    text = text.strip()
+    if text.startswith('"') and text.endswith('"'):
+        return text[1:-1]
+    try:
+        return int(text)
+    except ValueError:
+        return text
+
+
+class NodeStatusReader:
+    """Reads the NODE_STATUS_FILE DAGMan keeps up to date for a running DAG.
+
+    Parameters
+    ----------
+    fileName : `str`
+        the node status file; it doesn't have to exist yet
+
+    Notes
+    -----
+    DAGMan rewrites the whole file on each update, so it is parsed again
+    only when its modification time or size changes.
+    """
+
+    def __init__(self, fileName):
+        # the node status file
+        self.fileName = fileName
+
+        # DAG node -> IDLE, RUNNING, DONE or FAILED
+        self.nodes = {}
+
+        # attributes of the file's DagStatus ClassAd
+        self.dagStatus = {}
+
+        self._stamp = None
+
+    def update(self):
+        """Read the file again if DAGMan rewrote it
+
+        Returns
+        -------
+        changed : `bool`
+            True if the file was read
+        """
+        try:
+            st = os.stat(self.fileName)
+        except FileNotFoundError:
+            return False
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self._stamp:
+            return False
+
+        with open(self.fileName, "r") as fp:
+            ads = self._parse(fp)
+        nodes = {}
+        dagStatus = self.dagStatus
+        complete = False
+        for ad in ads:
+            adType = ad.get("Type")
+            if adType == "NodeStatus" and "Node" in ad:
+                nodes[ad["Node"]] = NODE_STATES.get(ad.get("NodeStatus"), IDLE)
+            elif adType == "DagStatus":
+                dagStatus = ad
+            elif adType == "StatusEnd":
+                complete = True
+
+        # DAGMan writes the file atomically, but don't trust one cut short
+        if not complete:
+            return False
+        self._stamp = stamp
+        self.nodes = nodes
+        self.dagStatus = dagStatus
+        return True
+
+    @staticmethod
+    def _parse(lines):
+        ads = []
+        ad = None
+        for line in lines:
+            line = line.strip()
+            if line == "[":
+                ad = {}
+            elif line == "]":
+                if ad is not None:
+                    ads.append(ad)
+                ad = None
+            elif ad is not None:
+                match = _ATTRIBUTE.match(line)
+                if match is not None:
+                    ad[match.group(1)] = _value(match.group(2))
+        return ads
+
+
+class DagProgress:
+    """Tracks the progress of a running DAG from its node status file.
+
+    Parameters
+    ----------
+    fileName : `str`
+        the DAG's node status file
+    window : `float`, optional
+        seconds of history the throughput is computed over
+
+    Notes
+    -----
+    The throughput is the number of nodes that finished, successfully or
+    not, per minute over the last window seconds, and the ETA is the time
+    the nodes left would take at that rate.
+    """
+
+    def __init__(self, fileName, window=THROUGHPUT_WINDOW):
+        # the node status file reader
+        self.reader = NodeStatusReader(fileName)
+
+        # seconds of history the throughput is computed over
+        self.window = window
+
+        # number of nodes in each state
+        self.counts = dict.fromkeys((IDLE, RUNNING, DONE, FAILED), 0)
+
+        # (time, finished nodes) samples within the window
+        self._samples = collections.deque()
+
+    def update(self, now=None):
+        """Read the node status file again if it changed
+
+        Parameters
+        ----------
+        now : `float`, optional
+            the current time; defaults to time.time()
+
+        Returns
+        -------
+        changed : `bool`
+            True if the node counts were updated
+        """
+        if now is None:
+            now = time.time()
+        changed = self.reader.update()
+        if changed:
+            counts = dict.fromkeys((IDLE, RUNNING, DONE, FAILED), 0)
+            for state in self.reader.nodes.values():
+                counts[state] += 1
+            self.counts = counts
+
+        # sample even when nothing changed, so that a stall brings the throughput down
+        if self.reader.nodes:
+            self._samples.append((now, self.counts[DONE] + self.counts[FAILED]))
+            while len(self._samples) > 2 and now - self._samples[1][0] >= self.window:
+                self._samples.popleft()
+        return changed
+
+    def total(self):
+        """Return the number of nodes in the DAG
+        """
+        return sum(self.counts.values())
+
+    def throughput(self):
+        """Return the number of nodes finished per minute, or None before there are two samples
+        """
+        if len(self._samples) < 2:
+            return None
+        (firstTime, firstFinished), (lastTime, lastFinished) = self._samples[0], self._samples[-1]
+        if lastTime <= firstTime:
+            return None
+        return 60.0 * (lastFinished - firstFinished) / (lastTime - firstTime)
+
+    def eta(self):
+        """Return the estimated number of seconds until every node has finished
+
+        Returns
+        -------
+        eta : `float`
+            seconds left; None if nothing finished within the window
+        """
+        remaining = self.counts[IDLE] + self.counts[RUNNING]
+        if remaining == 0:
+            return 0.0
+        rate = self.throughput()
+        if not rate:
+            return None
+        return 60.0 * remaining / rate
+
+    def __str__(self):
+        rate = self.throughput()
+        eta = self.eta()
+        return ("%d/%d nodes done, %d failed, %d running, %d idle; %s nodes/min, ETA %s" %
+                (self.counts[DONE], self.total(), self.counts[FAILED], self.counts[RUNNING],
+                 self.counts[IDLE], "-" if rate is None else "%.1f" % rate,
+                 "-" if eta is None else formatDuration(eta)))
+
+
+def formatDuration(seconds):
+    """Format a number of seconds as e.g. 1d02h03m
+
+    Parameters
+    ----------
+    seconds : `float`
+        the duration
+
+    Returns
+    -------
+    text : `str`
+    """
+    minutes = int(seconds + 59) // 60
+    days, minutes = divmod(minutes, 24*60)
+    hours, minutes = divmod(minutes, 60)
+    if days:
+        return "%dd%02dh%02dm" % (days, hours, minutes)
+    if hours:
+        return "%dh%02dm" % (hours, minutes)
+    return "%dm" % minutes
@@ -23,6 +23,60 @@
 import re
 import os
 
+# a $ prefixed environment variable name
+_VARIABLE = re.compile(r'\$[a-zA-Z0-9_]+')
+
+
+class EnvResolver:
+    """Resolves environment variables against a fixed snapshot of the environment.
+
+    Parameters
+    ----------
+    env : `dict`, optional
+        environment to resolve against; defaults to a copy of os.environ
+
+    Notes
+    -----
+    The snapshot is taken when the resolver is created and never changes,
+    so each distinct string is resolved once and the result reused.
+    """
+
+    def __init__(self, env=None):
+        # the environment snapshot
+        self.env = dict(os.environ if env is None else env)
+
+        # string -> resolved string
+        self.resolved = {}
+
+    def _lookup(self, match):
+        val = self.env.get(match.group(0)[1:])
+        if val is None:
+            raise RuntimeError("couldn't find "+match.group(0)+" environment variable")
+        return val
+
+    def resolve(self, strVal):
+        """Replace environment variables within a string, in a single pass
+
+        Parameters
+        ----------
+        strVal : `str`
+            the string to resolve
+
+        Raises
+        ------
+        `RuntimeError`
+            if the environment variable doesn't exist
+
+        Returns
+        -------
+        retVal : `str`
+            the resulting string with environment variable info substituted.
+        """
+        retVal = self.resolved.get(strVal)
+        if retVal is None:
+            retVal = self.resolved[strVal] = _VARIABLE.sub(self._lookup, strVal)
+        return retVal
+
 
 class EnvString:
     def resolve(strVal):
@@ -43,16 +97,39 @@ class EnvString:
         retVal : `str`
             the resulting string with environment variable info substituted.
         """
-
-        p = re.compile(r'\$[a-zA-Z0-9_]+')
-        retVal = strVal
-        exprs = p.findall(retVal)
-        for i in exprs:
-            var = i[1:]
-            val = os.getenv(var, None)
+        def lookup(match):
+            val = os.getenv(match.group(0)[1:], None)
             if val is None:
-                raise RuntimeError("couldn't find "+i+" environment variable")
-            retVal = p.sub(val, retVal, 1)
-        return retVal
+                raise RuntimeError("couldn't find "+match.group(0)+" environment variable")
+            return val
+
+        return _VARIABLE.sub(lookup, strVal)
     # static method to resolve string
     resolve = staticmethod(resolve)
+
+    def resolve_many(values, env=None):
+        """Replace environment variables within several strings at once
+
+        Parameters
+        ----------
+        values : iterable of `str`
+            the strings to resolve; None values are passed through unchanged
+        env : `dict` or `EnvResolver`, optional
+            environment to resolve against; defaults to a snapshot of os.environ
+            taken for this call.  Passing an EnvResolver reuses its snapshot
+            and the strings it has already resolved.
+
+        Raises
+        ------
+        `RuntimeError`
+            if an environment variable doesn't exist
+
+        Returns
+        -------
+        retVals : `list` of `str`
+            the resolved strings, in the order of values
+        """
+        resolver = env if isinstance(env, EnvResolver) else EnvResolver(env)
+        return [None if strVal is None else resolver.resolve(strVal) for strVal in values]
+    # static method to resolve a batch of strings
+    resolve_many = staticmethod(resolve_many)
@@ -0,0 +1,397 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+import queue
+import threading
+import time
+import lsst.log as log
+
+from lsst.ctrl.orca.multithreading import SharedData
+
+# kinds of status events
+WORKFLOW_STARTED = "workflowStarted"
+NODE_STARTED = "nodeStarted"
+NODE_FINISHED = "nodeFinished"
+NODE_HELD = "nodeHeld"
+WORKFLOW_DONE = "workflowDone"
+WORKFLOW_FAILED = "workflowFailed"
+EVENT_KINDS = (WORKFLOW_STARTED, NODE_STARTED, NODE_FINISHED, NODE_HELD, WORKFLOW_DONE, WORKFLOW_FAILED)
+
+# most events waiting for the dispatcher, and for each listener
+MAX_PENDING_EVENTS = 10000
+MAX_LISTENER_EVENTS = 10000
+
+# most seconds a completed monitor waits for its listeners to be handed its last events
+RELEASE_TIMEOUT = 10.0
+
+# put on a queue to stop the thread reading it
+_STOP = object()
+
+
+class StatusEvent:
+    """Something that happened to a workflow, published by its monitor.
+
+    Parameters
+    ----------
+    kind : `str`
+        one of EVENT_KINDS
+    workflow : `str`
+        name of the workflow
+    source : `WorkflowMonitor`, optional
+        the monitor that published the event
+    node : `str`, optional
+        the DAG node, for node events
+    jobId : `str`, optional
+        the condor job id of the node or workflow
+    returnValue : `int`, optional
+        exit code of a finished node, or of DAGMan for a finished workflow
+    message : `str`, optional
+        description of a failure
+    runid : `str`, optional
+        run id of the production the workflow belongs to, if known
+    """
+
+    def __init__(self, kind, workflow, source=None, node=None, jobId=None, returnValue=None,
+                 message=None, runid=None):
+        # one of EVENT_KINDS
+        self.kind = kind
+
+        # name of the workflow
+        self.workflow = workflow
+
+        # the monitor that published the event
+        self.source = source
+
+        # the DAG node, for node events
+        self.node = node
+
+        # the condor job id of the node or workflow
+        self.jobId = jobId
+
+        # exit code of a finished node or workflow, if known
+        self.returnValue = returnValue
+
+        # description of a failure
+        self.message = message
+
+        # run id of the production the workflow belongs to, if known
+        self.runid = runid
+
+        # time the event was published
+        self.timestamp = time.time()
+
+    def toDict(self):
+        """Return the event as a dict that can be written as JSON
+
+        Returns
+        -------
+        event : `dict`
+            every attribute of the event but its source
+        """
+        return {"kind": self.kind, "workflow": self.workflow, "node": self.node, "jobId": self.jobId,
+                "returnValue": self.returnValue, "message": self.message, "timestamp": self.timestamp,
+                "runid": self.runid}
+
+    def __str__(self):
+        node = "" if self.node is None else " node %s" % self.node
+        return "%s %s%s" % (self.kind, self.workflow, node)
+
+
+class ListenerChannel:
+    """Delivers the events of an EventBus to one listener, from a thread of its own.
+
+    Parameters
+    ----------
+    listener : `StatusListener`
+        the listener; its handleEvent() is called for each event
+    source : `WorkflowMonitor`, optional
+        only deliver the events this monitor publishes; all events if None
+    maxEvents : `int`, optional
+        most events waiting for the listener; more are dropped
+
+    Notes
+    -----
+    The lag of an event is the time from its publication to the end of its
+    delivery, so it includes the time spent queued behind a slow listener.
+    """
+
+    def __init__(self, listener, source=None, maxEvents=MAX_LISTENER_EVENTS):
+        # the listener
+        self.listener = listener
+
+        # the monitor whose events are delivered, or None for all
+        self.source = source
+
+        self._queue = queue.Queue(maxEvents)
+
+        # delivered: events handed to the listener
+        # dropped: events lost because the listener fell too far behind
+        # failures: events the listener raised an exception for
+        # lastLag, maxLag: seconds from publication to delivery
+        self._locked = SharedData.SharedData(False, {"delivered": 0, "dropped": 0, "failures": 0,
+                                                     "lastLag": 0.0, "maxLag": 0.0})
+        self._thread = threading.Thread(target=self._run, name="ListenerChannel", daemon=True)
+        self._thread.start()
+
+    def offer(self, event):
+        """Queue an event for the listener, without blocking
+
+        Returns
+        -------
+        queued : `bool`
+            False if the event was dropped because the queue is full
+        """
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            with self._locked:
+                self._locked.dropped += 1
+            return False
+
+    def metrics(self):
+        """Report how the listener is keeping up
+
+        Returns
+        -------
+        metrics : `dict`
+            pending, delivered, dropped and failures counts, and the
+            lastLag and maxLag in seconds
+        """
+        with self._locked:
+            return {"listener": type(self.listener).__name__,
+                    "pending": self._queue.qsize(),
+                    "delivered": self._locked.delivered,
+                    "dropped": self._locked.dropped,
+                    "failures": self._locked.failures,
+                    "lastLag": self._locked.lastLag,
+                    "maxLag": self._locked.maxLag}
+
+    def close(self, timeout=None):
+        """Stop delivering events, once the ones queued are delivered
+        """
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            if event is _STOP:
+                return
+            failed = False
+            try:
+                self.listener.handleEvent(event)
+            except Exception as error:
+                log.warn("ListenerChannel: %s failed on %s: %s", type(self.listener).__name__, event, error)
+                failed = True
+            lag = time.time() - event.timestamp
+            with self._locked:
+                self._locked.delivered += 1
+                if failed:
+                    self._locked.failures += 1
+                self._locked.lastLag = lag
+                self._locked.maxLag = max(self._locked.maxLag, lag)
+
+
+class EventBus:
+    """Carries the status events of the workflow monitors to their listeners.
+
+    Parameters
+    ----------
+    maxEvents : `int`, optional
+        most events waiting for the dispatcher; more are dropped
+
+    Notes
+    -----
+    publish() never blocks: the event is put on a bounded queue, and a
+    dispatcher thread hands it to the queue of each subscribed listener,
+    each drained by a thread of its own.  So a slow listener, such as one
+    writing to a database, neither stalls the monitor publishing the event
+    nor delays the other listeners; when it falls too far behind, events
+    for it are dropped and counted.
+
+    Use getInstance() to get the bus shared by the whole process.
+    """
+
+    _instance = None
+    _instanceLock = threading.Lock()
+
+    def __init__(self, maxEvents=MAX_PENDING_EVENTS):
+        self._queue = queue.Queue(maxEvents)
+
+        # channels: the ListenerChannel of each subscribed listener
+        # published, dropped: events published, and lost because the bus was full
+        self._locked = SharedData.SharedData(False, {"channels": [], "published": 0, "dropped": 0})
+        self._thread = None
+
+    @staticmethod
+    def getInstance():
+        """Return the event bus shared by all the monitors of this process
+
+        Returns
+        -------
+        bus : `EventBus`
+        """
+        with EventBus._instanceLock:
+            if EventBus._instance is None:
+                EventBus._instance = EventBus()
+            return EventBus._instance
+
+    def subscribe(self, listener, source=None, maxEvents=MAX_LISTENER_EVENTS):
+        """Start delivering events to a listener
+
+        Parameters
+        ----------
+        listener : `StatusListener`
+            the listener
+        source : `WorkflowMonitor`, optional
+            only deliver the events this monitor publishes; all events if None
+        maxEvents : `int`, optional
+            most events waiting for the listener
+
+        Returns
+        -------
+        channel : `ListenerChannel`
+            the channel delivering the events
+        """
+        channel = ListenerChannel(listener, source, maxEvents)
+        with self._locked:
+            # readers iterate over the list they got, so replace it rather than change it
+            self._locked.channels = self._locked.channels + [channel]
+            self._startDispatcher()
+        log.debug("EventBus:subscribe: %s", type(listener).__name__)
+        return channel
+
+    def unsubscribe(self, listener, timeout=None):
+        """Stop delivering events to a listener, once the ones queued for it are delivered
+
+        Parameters
+        ----------
+        listener : `StatusListener`
+            the listener
+        timeout : `float`, optional
+            most seconds to wait for the queued events to be delivered
+        """
+        with self._locked:
+            channels = [channel for channel in self._locked.channels if channel.listener is listener]
+            self._locked.channels = [channel for channel in self._locked.channels
+                                     if channel.listener is not listener]
+        for channel in channels:
+            channel.close(timeout)
+
+    def unsubscribeSource(self, source, timeout=None):
+        """Stop delivering the events of a monitor to the listeners subscribed to it alone
+
+        Parameters
+        ----------
+        source : `WorkflowMonitor`
+            the monitor
+        timeout : `float`, optional
+            most seconds to wait for the monitor's events to be delivered
+
+        Notes
+        -----
+        The events already published are handed to the listeners first, so
+        that they still get the monitor's last events.  Listeners subscribed
+        to every monitor are left alone.
+        """
+        self.flush(timeout)
+        with self._locked:
+            channels = [channel for channel in self._locked.channels if channel.source is source]
+            self._locked.channels = [channel for channel in self._locked.channels
+                                     if channel.source is not source]
+        for channel in channels:
+            channel.close(timeout)
+
+    def publish(self, event):
+        """Publish an event, without blocking
+
+        Parameters
+        ----------
+        event : `StatusEvent`
+            the event
+
+        Returns
+        -------
+        queued : `bool`
+            False if the event was dropped because the bus is full
+        """
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            with self._locked:
+                self._locked.dropped += 1
+            return False
+        with self._locked:
+            self._locked.published += 1
+            self._startDispatcher()
+        return True
+
+    def _startDispatcher(self):
+        # called with the lock held
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._dispatch, name="EventBus", daemon=True)
+            self._thread.start()
+
+    def flush(self, timeout=None):
+        """Wait for the events published so far to be handed to the listeners' queues
+
+        Parameters
+        ----------
+        timeout : `float`, optional
+            most seconds to wait
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return
+                self._queue.all_tasks_done.wait(remaining)
+
+    def metrics(self):
+        """Report the state of the bus and of each listener
+
+        Returns
+        -------
+        metrics : `dict`
+            published, dropped and pending event counts of the bus, and the
+            metrics of each listener's channel under "listeners"
+        """
+        with self._locked:
+            channels = self._locked.channels
+            metrics = {"published": self._locked.published,
+                       "dropped": self._locked.dropped,
+                       "pending": self._queue.qsize()}
+        metrics["listeners"] = [channel.metrics() for channel in channels]
+        return metrics
+
+    def _dispatch(self):
+        log.debug("EventBus thread started")
+        while True:
+            event = self._queue.get()
+            try:
+                for channel in self._locked.channels:
+                    if channel.source is None or channel.source is event.source:
+                        channel.offer(event)
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,461 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+import ctypes
+import ctypes.util
+import os
+import re
+import select
+import time
+
+import lsst.log as log
+
+# HTCondor user log event codes
+SUBMIT = 0
+EXECUTE = 1
+EVICTED = 4
+TERMINATED = 5
+ABORTED = 9
+HELD = 12
+RELEASED = 13
+
+# names of the user log events a workflow monitor cares about
+EVENT_NAMES = {SUBMIT: "submit",
+               EXECUTE: "execute",
+               EVICTED: "evicted",
+               TERMINATED: "terminated",
+               ABORTED: "aborted",
+               HELD: "held",
+               RELEASED: "released"}
+
+# first line of a user log event:
+# 005 (1234.000.000) 2017-03-21 12:00:01 Job terminated.
+_EVENT_HEADER = re.compile(r"^(\d{3}) \((\d+)\.(\d+)\.(\d+)\) (\S+ \S+) (.*)$")
+
+# line in a DAGMan submitted job's submit event naming its node
+_DAG_NODE = re.compile(r"DAG Node: (\S+)")
+
+# line in a terminated event with the job's exit code
+_RETURN_VALUE = re.compile(r"\(return value (-?\d+)\)")
+
+# last line DAGMan writes to its .dagman.out file
+_DAGMAN_EXIT = re.compile(r"EXITING WITH STATUS (-?\d+)")
+
+# banner DAGMan starts its part of the .dagman.out file with:
+# ** condor_scheduniv_exec.1234.0 (CONDOR_DAGMAN) STARTING UP
+_DAGMAN_START = re.compile(r"\*\* condor_scheduniv_exec\.(\d+)\.\d+ \(CONDOR_DAGMAN\) STARTING UP")
+
+# the logs DAGMan writes next to a DAG, by the suffix added to the DAG file name
+DAG_LOGS = (".nodes.log", ".dagman.log", ".dagman.out")
+
+# line that ends a user log event
+_EVENT_END = "..."
+
+# bytes read from a log file at a time
+_READ_SIZE = 1 << 16
+
+# formats of event times: ISO dates, and the month/day dates of older HTCondor versions
+_TIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%m/%d %H:%M:%S")
+
+# event time text -> seconds since the epoch; many events share a time
+_eventTimes = {}
+_MAX_EVENT_TIMES = 10000
+
+
+def eventTime(timestamp):
+    """Convert the time of a user log event to seconds since the epoch
+
+    Parameters
+    ----------
+    timestamp : `str`
+        time of the event, as written in the log, e.g. '2017-03-21 12:00:01'
+
+    Returns
+    -------
+    seconds : `float`
+        the local time in seconds since the epoch; None if it can't be parsed
+
+    Notes
+    -----
+    A date without a year is taken to be in the current year.
+    """
+    seconds = _eventTimes.get(timestamp)
+    if seconds is not None:
+        return seconds
+    for timeFormat in _TIME_FORMATS:
+        try:
+            parsed = time.strptime(timestamp, timeFormat)
+        except ValueError:
+            continue
+        if "%Y" not in timeFormat:
+            parsed = time.struct_time((time.localtime().tm_year,) + tuple(parsed)[1:])
+        seconds = time.mktime(parsed)
+        if len(_eventTimes) >= _MAX_EVENT_TIMES:
+            _eventTimes.clear()
+        _eventTimes[timestamp] = seconds
+        return seconds
+    return None
+
+
+class JobEvent:
+    """One event of an HTCondor user log.
+
+    Parameters
+    ----------
+    code : `int`
+        the event code, e.g. TERMINATED
+    cluster : `str`
+        cluster id of the job
+    proc : `str`
+        process id of the job within its cluster
+    timestamp : `str`
+        time of the event, as written in the log
+    text : `str`
+        the event description on its first line
+    lines : `list` of `str`
+        the rest of the event's lines
+    """
+
+    def __init__(self, code, cluster, proc, timestamp, text, lines):
+        # the event code
+        self.code = code
+
+        # the event name, or "event <code>" for events without one
+        self.name = EVENT_NAMES.get(code, "event %03d" % code)
+
+        # cluster id of the job
+        self.cluster = cluster
+
+        # process id of the job within its cluster
+        self.proc = proc
+
+        # time of the event, as written in the log
+        self.timestamp = timestamp
+
+        # the event description on its first line
+        self.text = text
+
+        # the rest of the event's lines
+        self.lines = lines
+
+        # DAG node the job runs, if known
+        self.node = None
+
+        # exit code of a terminated job, if it terminated normally
+        self.returnValue = None
+        for line in lines:
+            match = _DAG_NODE.search(line)
+            if match is not None:
+                self.node = match.group(1)
+            match = _RETURN_VALUE.search(line)
+            if match is not None:
+                self.returnValue = int(match.group(1))
+
+    def jobId(self):
+        """Return the job id, e.g. '1234.0'
+        """
+        return self.cluster + "." + self.proc
+
+    def time(self):
+        """Return the time of the event in seconds since the epoch, or None if it can't be parsed
+        """
+        return eventTime(self.timestamp)
+
+    def __str__(self):
+        node = "" if self.node is None else " node %s" % self.node
+        return "%s %s%s %s" % (self.name, self.jobId(), node, self.timestamp)
+
+
+def logOffsets(dagFile):
+    """Return the current size of each log DAGMan writes next to a DAG
+
+    Parameters
+    ----------
+    dagFile : `str`
+        the DAG file
+
+    Returns
+    -------
+    offsets : `dict` [`str`, `int`]
+        size of <dagFile><suffix> for each suffix in DAG_LOGS; 0 for a log
+        that doesn't exist yet
+    """
+    offsets = {}
+    for suffix in DAG_LOGS:
+        try:
+            offsets[suffix] = os.stat(dagFile + suffix).st_size
+        except FileNotFoundError:
+            offsets[suffix] = 0
+    return offsets
+
+
+class LogTail:
+    """Reads the lines appended to a log file since it was last read.
+
+    Parameters
+    ----------
+    fileName : `str`
+        the log file; it doesn't have to exist yet
+    offset : `int`, optional
+        offset in the file to start reading at; what was written before it
+        is never returned
+
+    Notes
+    -----
+    Only complete lines are returned; a partial last line is kept until the
+    rest of it is written.  If the file shrinks, it is assumed to have been
+    replaced, and is read again from the start.
+    """
+
+    def __init__(self, fileName, offset=0):
+        # the log file
+        self.fileName = fileName
+
+        # offset in the file read up to
+        self.offset = offset
+
+        self._partial = b""
+
+    def readLines(self):
+        """Return the complete lines appended since the last call
+
+        Returns
+        -------
+        lines : `list` of `str`
+            the new lines, without their line endings
+        """
+        try:
+            size = os.stat(self.fileName).st_size
+        except FileNotFoundError:
+            return []
+        if size < self.offset:
+            log.debug("LogTail:readLines: %s was truncated; reading it from the start", self.fileName)
+            self.offset = 0
+            self._partial = b""
+        if size == self.offset:
+            return []
+
+        chunks = [self._partial]
+        with open(self.fileName, "rb") as fp:
+            fp.seek(self.offset)
+            while True:
+                data = fp.read(_READ_SIZE)
+                if not data:
+                    break
+                chunks.append(data)
+                self.offset += len(data)
+        data = b"".join(chunks)
+        end = data.rfind(b"\n") + 1
+        self._partial = data[end:]
+        return data[:end].decode(errors="replace").splitlines()
+
+
+class EventLogReader:
+    """Reads the events appended to an HTCondor user log, such as a DAG's nodes.log.
+
+    Parameters
+    ----------
+    fileName : `str`
+        the user log; it doesn't have to exist yet
+    offset : `int`, optional
+        offset in the log of the first event to read
+    """
+
+    def __init__(self, fileName, offset=0):
+        # the user log
+        self.fileName = fileName
+
+        # DAG node of each cluster, learned from its submit event
+        self.nodes = {}
+
+        self._tail = LogTail(fileName, offset)
+        self._lines = []
+
+    def readEvents(self):
+        """Return the complete events appended since the last call
+
+        Returns
+        -------
+        events : `list` of `JobEvent`
+            the new events, in the order they were logged
+        """
+        events = []
+        for line in self._tail.readLines():
+            if line.strip() != _EVENT_END:
+                self._lines.append(line)
+                continue
+            event = self._parse(self._lines)
+            self._lines = []
+            if event is not None:
+                events.append(event)
+        return events
+
+    def _parse(self, lines):
+        while lines and _EVENT_HEADER.match(lines[0]) is None:
+            lines = lines[1:]
+        if not lines:
+            return None
+        match = _EVENT_HEADER.match(lines[0])
+        code, cluster, proc, subproc, timestamp, text = match.groups()
+        event = JobEvent(int(code), str(int(cluster)), str(int(proc)), timestamp, text, lines[1:])
+        if event.node is not None:
+            self.nodes[event.cluster] = event.node
+        else:
+            event.node = self.nodes.get(event.cluster)
+        return event
+
+
+class DagmanOutReader:
+    """Watches a DAG's .dagman.out file for DAGMan's exit.
+
+    Parameters
+    ----------
+    fileName : `str`
+        the .dagman.out file; it doesn't have to exist yet
+    offset : `int`, optional
+        offset in the file to start reading at
+    condorDagId : `str`, optional
+        cluster id of the DAGMan job to watch for
+
+    Notes
+    -----
+    Every DAGMan run in a directory appends to the same .dagman.out file.
+    Given a condorDagId, only an exit logged after the STARTING UP banner of
+    that DAGMan job counts, so the exit of an earlier run of the same DAG
+    isn't taken for this one's.
+    """
+
+    def __init__(self, fileName, offset=0, condorDagId=None):
+        # the .dagman.out file
+        self.fileName = fileName
+
+        # cluster id of the DAGMan job watched for, if known
+        self.condorDagId = None if condorDagId is None else str(condorDagId)
+
+        # DAGMan's exit status, once it has exited
+        self.exitStatus = None
+
+        self._tail = LogTail(fileName, offset)
+        self._started = self.condorDagId is None
+
+    def readExitStatus(self):
+        """Read the lines appended since the last call, looking for DAGMan's exit
+
+        Returns
+        -------
+        exitStatus : `int`
+            DAGMan's exit status, or None if it hasn't exited yet
+        """
+        for line in self._tail.readLines():
+            if self.condorDagId is not None:
+                match = _DAGMAN_START.search(line)
+                if match is not None:
+                    self._started = match.group(1) == self.condorDagId
+                    continue
+            if not self._started:
+                continue
+            match = _DAGMAN_EXIT.search(line)
+            if match is not None:
+                self.exitStatus = int(match.group(1))
+        return self.exitStatus
+
+
+class FileWatcher:
+    """Waits for files in a directory to change.
+
+    Parameters
+    ----------
+    directory : `str`
+        the directory to watch
+    pollInterval : `float`, optional
+        seconds between checks when inotify isn't available
+
+    Notes
+    -----
+    On Linux, inotify is used through ctypes, so a change wakes the waiter
+    up immediately.  Elsewhere, or if inotify can't be set up, wait() just
+    sleeps for pollInterval, or the timeout if that is shorter.
+    """
+
+    # inotify event mask: a file was written, closed, created or moved in
+    _IN_MODIFY = 0x002
+    _IN_CLOSE_WRITE = 0x008
+    _IN_MOVED_TO = 0x080
+    _IN_CREATE = 0x100
+
+    def __init__(self, directory, pollInterval=0.5):
+        # the directory to watch
+        self.directory = directory
+
+        # seconds between checks when inotify isn't available
+        self.pollInterval = pollInterval
+
+        # inotify file descriptor, or None when polling
+        self.fd = None
+
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+            mask = self._IN_MODIFY | self._IN_CLOSE_WRITE | self._IN_MOVED_TO | self._IN_CREATE
+            if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+                errno = ctypes.get_errno()
+                os.close(fd)
+                raise OSError(errno, "inotify_add_watch failed")
+            self.fd = fd
+        except (OSError, AttributeError) as error:
+            log.debug("FileWatcher: polling %s every %s seconds: %s", directory, pollInterval, error)
+
+    def wait(self, timeout):
+        """Wait until a file in the directory changes, or the timeout expires
+
+        Parameters
+        ----------
+        timeout : `float`
+            most seconds to wait
+
+        Returns
+        -------
+        changed : `bool`
+            True if a change was seen; always False when polling
+        """
+        if self.fd is None:
+            time.sleep(min(timeout, self.pollInterval))
+            return False
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+        # drain the pending notifications; the readers find out what changed
+        try:
+            while os.read(self.fd, _READ_SIZE):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        """Stop watching
+        """
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
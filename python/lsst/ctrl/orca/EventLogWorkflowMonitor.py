@@ -0,0 +1,220 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+import os
+import threading
+import time
+import lsst.log as log
+
+from lsst.ctrl.orca.CondorWorkflowMonitor import CondorWorkflowMonitor
+from lsst.ctrl.orca.EventLog import EventLogReader, DagmanOutReader, FileWatcher
+from lsst.ctrl.orca.EventLog import SUBMIT, EXECUTE, TERMINATED, ABORTED, HELD
+from lsst.ctrl.orca.Metrics import Metrics, NODE_SUBMIT_TO_RUN, NODE_RUNTIME, MONITOR_LAG
+from lsst.ctrl.orca import EventBus
+
+
+class EventLogWorkflowMonitor(CondorWorkflowMonitor):
+    """Monitors a running DAG by following the logs DAGMan writes next to it.
+
+    Parameters
+    ----------
+    condorDagId : `str`
+        job id of submitted HTCondor dag
+    monitorConfig : Config
+        configuration file for monitor information
+    dagFile : `str`
+        the DAG file that was submitted
+    nodeStatusFile : `str`, optional
+        node status file DAGMan writes for the dag
+    name : `str`, optional
+        name of the workflow, used in the events published
+    runid : `str`, optional
+        run id of the production the workflow belongs to, used in the events published
+    logOffsets : `dict` [`str`, `int`], optional
+        where to start reading each of the DAG's logs, as returned by
+        EventLog.logOffsets() before the DAG was submitted; the logs are read
+        from their start if not given
+
+    Notes
+    -----
+    The <dagFile>.nodes.log user log is read incrementally, and every event
+    in it becomes a JobEvent passed to handleJobEvent().  The workflow is
+    complete when <dagFile>.dagman.out records DAGMan exiting, or when the
+    DAGMan job itself terminates or is removed according to
+    <dagFile>.dagman.log.  The schedd is never queried: the monitor waits on
+    inotify for the files to change, so completion is seen within a fraction
+    of a second, and falls back to polling the files where inotify isn't
+    available.
+
+    DAGMan appends to the logs of a DAG submitted again in the same
+    directory, so a newly launched DAG is followed from where its logs ended
+    when it was submitted.  Reading them from their start is for reattaching
+    to a DAG launched by another process.
+    """
+
+    def __init__(self, condorDagId, monitorConfig, dagFile, nodeStatusFile=None, name=None, runid=None,
+                 logOffsets=None):
+        # the DAG file that was submitted
+        self.dagFile = os.path.abspath(dagFile)
+
+        # where reading each of the DAG's logs starts, by suffix
+        self.logOffsets = logOffsets if logOffsets is not None else {}
+
+        # DAG node -> name of the last event seen for it
+        self.nodeStates = {}
+        self._nodeStatesLock = threading.Lock()
+
+        # job id -> time of the last submit or execute event of each job that hasn't terminated
+        self._jobTimes = {}
+
+        CondorWorkflowMonitor.__init__(self, condorDagId, monitorConfig, nodeStatusFile, name, runid)
+
+    def handleJobEvent(self, event):
+        """Record an event of one of the DAG's node jobs
+
+        Parameters
+        ----------
+        event : `JobEvent`
+            the event
+        """
+        log.debug("EventLogWorkflowMonitor: %s", event)
+        if event.node is None:
+            return
+        with self._nodeStatesLock:
+            self.nodeStates[event.node] = event.name
+        self._recordTimes(event)
+        if event.code == EXECUTE:
+            self.publishEvent(EventBus.NODE_STARTED, node=event.node, jobId=event.jobId())
+        elif event.code in (TERMINATED, ABORTED):
+            self.publishEvent(EventBus.NODE_FINISHED, node=event.node, jobId=event.jobId(),
+                              returnValue=event.returnValue)
+        elif event.code == HELD:
+            self.publishEvent(EventBus.NODE_HELD, node=event.node, jobId=event.jobId())
+
+    def _recordTimes(self, event):
+        """Record the time a node's job waited to run, or ran, in the metrics
+        """
+        eventTime = event.time()
+        if eventTime is None:
+            return
+        jobId = event.jobId()
+        if event.code == SUBMIT:
+            self._jobTimes[jobId] = eventTime
+        elif event.code == EXECUTE:
+            submitTime = self._jobTimes.get(jobId)
+            if submitTime is not None:
+                Metrics.getInstance().histogram(NODE_SUBMIT_TO_RUN).observe(eventTime - submitTime,
+                                                                            *self.getMetricLabels())
+            self._jobTimes[jobId] = eventTime
+        elif event.code in (TERMINATED, ABORTED):
+            executeTime = self._jobTimes.pop(jobId, None)
+            if executeTime is not None and event.code == TERMINATED:
+                Metrics.getInstance().histogram(NODE_RUNTIME).observe(eventTime - executeTime,
+                                                                      *self.getMetricLabels())
+
+    def publishNodeChanges(self, oldNodes, newNodes):
+        """Publish nothing: the node events are published as they are read from the user log
+        """
+        return
+
+    def getNodeStates(self):
+        """Return the state of each DAG node seen so far
+
+        Returns
+        -------
+        nodeStates : { 'A1' : 'terminated', 'A2' : 'execute' }
+            name of the last event seen for each node
+        """
+        with self._nodeStatesLock:
+            return dict(self.nodeStates)
+
+    class _WorkflowMonitorThread(threading.Thread):
+        """Workflow thread that follows the DAG's logs until DAGMan exits
+
+        Parameters
+        ----------
+        parent : `EventLogWorkflowMonitor`
+            the monitor this thread works for
+        condorDagId : `str`
+            job id of submitted HTCondor dag
+        monitorConfig : `Config`
+            configuration file for monitor information
+        """
+        def __init__(self, parent, condorDagId, monitorConfig):
+            threading.Thread.__init__(self)
+            self.setDaemon(True)
+            self._parent = parent
+
+            # the dag id assigned to this workflow
+            self.condorDagId = str(condorDagId)
+
+            # monitor configuration
+            self.monitorConfig = monitorConfig
+
+        def run(self):
+            """Follow the DAG's logs, shutting down when DAGMan exits
+            """
+            log.debug("EventLogWorkflowMonitor Thread started")
+            dagFile = self._parent.dagFile
+            offsets = self._parent.logOffsets
+            nodesLog = EventLogReader(dagFile + ".nodes.log", offsets.get(".nodes.log", 0))
+            dagmanLog = EventLogReader(dagFile + ".dagman.log", offsets.get(".dagman.log", 0))
+            dagmanOut = DagmanOutReader(dagFile + ".dagman.out", offsets.get(".dagman.out", 0),
+                                        self.condorDagId)
+
+            # the interval is only a safety net when inotify is available
+            statusCheckInterval = int(self.monitorConfig.statusCheckInterval)
+            watcher = FileWatcher(os.path.dirname(dagFile))
+            try:
+                while True:
+                    events = nodesLog.readEvents()
+                    for event in events:
+                        self._parent.handleJobEvent(event)
+                    if events and events[-1].time() is not None:
+                        # how far behind the log the monitor is
+                        Metrics.getInstance().gauge(MONITOR_LAG).set(time.time() - events[-1].time(),
+                                                                     *self._parent.getMetricLabels())
+                    self._parent.updateProgress()
+
+                    finished = False
+                    exitStatus = None
+                    for event in dagmanLog.readEvents():
+                        if event.cluster == self.condorDagId and event.code in (TERMINATED, ABORTED):
+                            log.debug("EventLogWorkflowMonitor: DAGMan job %s", event)
+                            finished = True
+                            exitStatus = event.returnValue
+                    if dagmanOut.readExitStatus() is not None:
+                        exitStatus = dagmanOut.exitStatus
+                        log.debug("EventLogWorkflowMonitor: DAGMan exited with status %d", exitStatus)
+                        finished = True
+
+                    if finished:
+                        # pick up the node events logged just before DAGMan exited
+                        for event in nodesLog.readEvents():
+                            self._parent.handleJobEvent(event)
+                        self._parent.updateProgress()
+                        print("work complete.")
+                        self._parent.handleCompletion(exitStatus)
+                        return
+                    watcher.wait(statusCheckInterval)
+            finally:
+                watcher.close()
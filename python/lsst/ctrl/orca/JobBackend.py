@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+import os
+import re
+import subprocess
+import threading
+import lsst.log as log
+from lsst.ctrl.orca.NamedClassFactory import NamedClassFactory
+
+try:
+    import htcondor
+except ImportError:
+    htcondor = None
+
+# output of condor_submit and condor_submit_dag naming the new cluster
+_SUBMITTED = re.compile(r"1 job\(s\) submitted to cluster (\d+).")
+
+# backend instances, shared by everything in the process, by name
+_backends = {}
+_backendsLock = threading.Lock()
+
+
+class JobBackend:
+    """Submits, queries and removes HTCondor jobs.
+
+    Notes
+    -----
+    CondorJobs delegates every interaction with the schedd to a backend, so
+    that the way HTCondor is talked to can be chosen in MonitorConfig.
+    """
+
+    def submit(self, condorFile):
+        """Submit a condor submit file
+
+        Parameters
+        ----------
+        condorFile : `str`
+            condor submit file
+
+        Returns
+        -------
+        clusterId : `str`
+            cluster id of the submitted job, or None if it wasn't submitted
+        """
+        log.debug("JobBackend:submit")
+        return None
+
+    def submitDag(self, dagFile, cwd=None):
+        """Submit a DAG to be run by DAGMan
+
+        Parameters
+        ----------
+        dagFile : `str`
+            DAG file, relative to cwd
+        cwd : `str`, optional
+            directory DAGMan runs in, which the paths in the DAG are relative
+            to; defaults to the current directory
+
+        Returns
+        -------
+        clusterId : `str`
+            cluster id of the DAGMan job, or None if it wasn't submitted
+        """
+        log.debug("JobBackend:submitDag")
+        return None
+
+    def query(self, clusterIds):
+        """Query the queue for the jobs of a set of clusters
+
+        Parameters
+        ----------
+        clusterIds : `list` of `int`
+            condor cluster ids
+
+        Returns
+        -------
+        states : `list` of (`str`, `str`, `int`)
+            cluster id, process id and JobStatus of each job of the clusters
+            that is still in the queue; None if the queue couldn't be queried
+        """
+        log.debug("JobBackend:query")
+        return None
+
+    def remove(self, clusterId):
+        """Remove the jobs of a cluster from the queue
+
+        Parameters
+        ----------
+        clusterId : `str`
+            condor cluster id
+        """
+        log.debug("JobBackend:remove")
+
+
+class CliJobBackend(JobBackend):
+    """Job backend that runs the HTCondor command line tools
+
+    Notes
+    -----
+    Every call forks condor_submit, condor_submit_dag, condor_q or condor_rm,
+    and the cluster ids are read from their output.  Works wherever the
+    tools are on the PATH.
+    """
+
+    def submit(self, condorFile):
+        log.debug("CliJobBackend:submit %s", condorFile)
+        return self._submit(["condor_submit", condorFile])
+
+    def submitDag(self, dagFile, cwd=None):
+        log.debug("CliJobBackend:submitDag %s", dagFile)
+        # condor_submit_dag prints the "1 job(s) submitted" line near the end
+        # of its output on a terminal, but near the start when redirected, so
+        # every line is matched against it
+        return self._submit(["condor_submit_dag", dagFile], cwd)
+
+    def _submit(self, cmd, cwd=None):
+        log.debug(" ".join(cmd))
+        try:
+            process = subprocess.run(cmd, cwd=cwd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                     universal_newlines=True)
+        except OSError as error:
+            log.warn("CliJobBackend: couldn't run %s: %s", cmd[0], error)
+            return None
+        for line in process.stdout.splitlines():
+            num = _SUBMITTED.findall(line)
+            if len(num) != 0:
+                return num[0]
+        return None
+
+    def query(self, clusterIds):
+        if not clusterIds:
+            return []
+        constraint = " || ".join("ClusterId == %d" % cid for cid in clusterIds)
+        cmd = ["condor_q", "-af", "ClusterId", "ProcId", "JobStatus", "-constraint", constraint]
+        try:
+            process = subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                     stderr=subprocess.PIPE, universal_newlines=True)
+        except OSError as error:
+            log.warn("CliJobBackend:query: couldn't run condor_q: %s", error)
+            return None
+        if process.returncode != 0:
+            log.warn("CliJobBackend:query: condor_q failed: %s", process.stderr.strip())
+            return None
+
+        jobs = []
+        for line in process.stdout.splitlines():
+            values = line.split()
+            if len(values) != 3:
+                continue
+            cluster, proc, status = values
+            try:
+                jobs.append((cluster, proc, int(status)))
+            except ValueError:
+                continue
+        return jobs
+
+    def remove(self, clusterId):
+        log.debug("CliJobBackend:remove %s", clusterId)
+        try:
+            subprocess.run(["condor_rm", str(clusterId)], stdin=subprocess.DEVNULL,
+                           stdout=subprocess.PIPE)
+        except OSError as error:
+            log.warn("CliJobBackend:remove: couldn't run condor_rm: %s", error)
+
+
+class HTCondorJobBackend(JobBackend):
+    """Job backend that uses the htcondor Python bindings
+
+    Notes
+    -----
+    One Schedd handle is located the first time it's needed, and used for
+    every submit, query and remove after that, so no process is forked and
+    no output is parsed.  If a call fails, the handle is dropped and located
+    again on the next call, in case the schedd was restarted.
+    """
+
+    def __init__(self):
+        if htcondor is None:
+            raise RuntimeError("the htcondor Python bindings are not installed")
+        self._schedd = None
+        self._lock = threading.Lock()
+
+    def _getSchedd(self):
+        if self._schedd is None:
+            log.debug("HTCondorJobBackend: locating the schedd")
+            self._schedd = htcondor.Schedd()
+        return self._schedd
+
+    def submit(self, condorFile):
+        log.debug("HTCondorJobBackend:submit %s", condorFile)
+        with open(condorFile) as fp:
+            description = htcondor.Submit(fp.read())
+        return self._submit(description)
+
+    def submitDag(self, dagFile, cwd=None):
+        log.debug("HTCondorJobBackend:submitDag %s", dagFile)
+        if cwd is None:
+            return self._submit(htcondor.Submit.from_dag(dagFile, {"force": True}))
+        description = htcondor.Submit.from_dag(os.path.join(cwd, dagFile), {"force": True})
+        # DAGMan runs in its job's initial directory
+        description["initialdir"] = cwd
+        return self._submit(description)
+
+    def _submit(self, description):
+        with self._lock:
+            try:
+                result = self._getSchedd().submit(description)
+            except (RuntimeError, OSError) as error:
+                log.warn("HTCondorJobBackend: submit failed: %s", error)
+                self._schedd = None
+                return None
+        return str(result.cluster())
+
+    def query(self, clusterIds):
+        if not clusterIds:
+            return []
+        constraint = " || ".join("ClusterId == %d" % cid for cid in clusterIds)
+        with self._lock:
+            try:
+                ads = self._getSchedd().query(constraint=constraint,
+                                              projection=["ClusterId", "ProcId", "JobStatus"])
+            except (RuntimeError, OSError) as error:
+                log.warn("HTCondorJobBackend:query: query failed: %s", error)
+                self._schedd = None
+                return None
+        return [(str(ad["ClusterId"]), str(ad["ProcId"]), int(ad["JobStatus"])) for ad in ads]
+
+    def remove(self, clusterId):
+        log.debug("HTCondorJobBackend:remove %s", clusterId)
+        with self._lock:
+            try:
+                self._getSchedd().act(htcondor.JobAction.Remove, "ClusterId == %d" % int(clusterId))
+            except (RuntimeError, OSError) as error:
+                log.warn("HTCondorJobBackend:remove: remove failed: %s", error)
+                self._schedd = None
+
+
+# job backends by the name MonitorConfig.jobBackend selects them with; a
+# backend outside this module is given by its fully qualified name
+JOB_BACKENDS = {"cli": CliJobBackend,
+                "htcondor": HTCondorJobBackend,
+                "fake": "lsst.ctrl.orca.fakecondor.FakeJobBackend"}
+
+
+def getJobBackend(name="cli"):
+    """Return the job backend of this process with the given name
+
+    Parameters
+    ----------
+    name : `str`, optional
+        "cli", "htcondor" or "fake"
+
+    Returns
+    -------
+    backend : `JobBackend`
+        the backend; the command line backend if the htcondor bindings were
+        asked for but can't be used
+
+    Raises
+    ------
+    KeyError
+        if there is no backend with that name
+    """
+    backendClass = JOB_BACKENDS[name]
+    if isinstance(backendClass, str):
+        backendClass = NamedClassFactory().createClass(backendClass)
+    with _backendsLock:
+        backend = _backends.get(name)
+        if backend is None:
+            try:
+                backend = backendClass()
+            except RuntimeError as error:
+                log.warn("getJobBackend: using the condor command line tools instead of %s: %s",
+                         name, error)
+                backend = _backends.get("cli")
+                if backend is None:
+                    backend = _backends["cli"] = CliJobBackend()
+            _backends[name] = backend
+        return backend
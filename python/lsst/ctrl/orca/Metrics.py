@@ -0,0 +1,340 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+import bisect
+import math
+import threading
+
+from lsst.ctrl.orca.EventBus import EventBus
+
+# upper bounds, in seconds, of the histogram buckets for node latencies and runtimes
+NODE_TIME_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 14400, 43200, 86400)
+
+# upper bounds, in seconds, of the histogram buckets for condor queries
+QUERY_TIME_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# names of the metrics orca reports; the node submit-to-run and runtime
+# histograms are only observed by the eventlog monitor backend, as the
+# node status file condor_q monitors read doesn't tell a node's job
+# waiting in the queue from one running
+DAG_NODES = "orca_dag_nodes"
+NODE_SUBMIT_TO_RUN = "orca_node_submit_to_run_seconds"
+NODE_RUNTIME = "orca_node_runtime_seconds"
+CONDOR_QUERY = "orca_condor_query_seconds"
+MONITOR_LAG = "orca_monitor_lag_seconds"
+LISTENER_LAG = "orca_listener_lag_seconds"
+LISTENER_PENDING = "orca_listener_pending_events"
+LISTENER_DROPPED = "orca_listener_dropped_events_total"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = ['%s="%s"' % (name, _escape(value)) for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _matcher(names, labels):
+    # a function telling whether the label values of a series have the values in labels
+    positions = [(names.index(name), value) for name, value in labels.items() if name in names]
+    if len(positions) < len(labels):
+        return lambda labelValues: False
+    return lambda labelValues: all(labelValues[index] == value for index, value in positions)
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Gauge:
+    """A metric whose value is set to the latest measurement.
+
+    Parameters
+    ----------
+    name : `str`
+        name of the metric
+    documentation : `str`
+        the metric's HELP text
+    labelNames : `tuple` of `str`, optional
+        names of the labels that tell the metric's series apart
+    """
+
+    # Prometheus type of the metric
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelNames=()):
+        # name of the metric
+        self.name = name
+
+        # the metric's HELP text
+        self.documentation = documentation
+
+        # names of the labels
+        self.labelNames = tuple(labelNames)
+
+        # label values -> value
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, *labelValues):
+        """Set the value of the series with these label values
+        """
+        with self._lock:
+            self._values[tuple(labelValues)] = value
+
+    def remove(self, *labelValues):
+        """Forget the series with these label values
+        """
+        with self._lock:
+            self._values.pop(tuple(labelValues), None)
+
+    def removeMatching(self, labels):
+        """Forget every series whose labels have these values
+
+        Parameters
+        ----------
+        labels : `dict`
+            label name -> value; the other labels may have any value
+        """
+        match = _matcher(self.labelNames, labels)
+        with self._lock:
+            for labelValues in [values for values in self._values if match(values)]:
+                del self._values[labelValues]
+
+    def get(self, *labelValues):
+        """Return the value of the series with these label values, or None
+        """
+        with self._lock:
+            return self._values.get(tuple(labelValues))
+
+    def samples(self):
+        """Return the lines of the metric's series, in Prometheus text format
+        """
+        with self._lock:
+            values = sorted(self._values.items())
+        return ["%s%s %s" % (self.name, _labels(self.labelNames, labelValues), _number(value))
+                for labelValues, value in values]
+
+
+class Histogram:
+    """A metric counting measurements into buckets.
+
+    Parameters
+    ----------
+    name : `str`
+        name of the metric
+    documentation : `str`
+        the metric's HELP text
+    buckets : `tuple` of `float`
+        upper bounds of the buckets, in increasing order
+    labelNames : `tuple` of `str`, optional
+        names of the labels that tell the metric's series apart
+    """
+
+    # Prometheus type of the metric
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets, labelNames=()):
+        # name of the metric
+        self.name = name
+
+        # the metric's HELP text
+        self.documentation = documentation
+
+        # upper bounds of the buckets
+        self.buckets = tuple(buckets)
+
+        # names of the labels
+        self.labelNames = tuple(labelNames)
+
+        # label values -> [ count in each bucket, and above the last, sum ]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelValues):
+        """Count a measurement in the series with these label values
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(tuple(labelValues))
+            if series is None:
+                series = self._series[tuple(labelValues)] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def removeMatching(self, labels):
+        """Forget every series whose labels have these values
+
+        Parameters
+        ----------
+        labels : `dict`
+            label name -> value; the other labels may have any value
+        """
+        match = _matcher(self.labelNames, labels)
+        with self._lock:
+            for labelValues in [values for values in self._series if match(values)]:
+                del self._series[labelValues]
+
+    def count(self, *labelValues):
+        """Return the number of measurements in the series with these label values
+        """
+        with self._lock:
+            series = self._series.get(tuple(labelValues))
+            return 0 if series is None else sum(series[:-1])
+
+    def samples(self):
+        """Return the lines of the metric's series, in Prometheus text format
+        """
+        with self._lock:
+            series = sorted((labelValues, list(counts)) for labelValues, counts in self._series.items())
+        lines = []
+        for labelValues, counts in series:
+            total = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                total += count
+                labels = _labels(self.labelNames, labelValues, 'le="%s"' % _number(float(bound)))
+                lines.append("%s_bucket%s %d" % (self.name, labels, total))
+            labels = _labels(self.labelNames, labelValues)
+            lines.append("%s_sum%s %s" % (self.name, labels, _number(counts[-1])))
+            lines.append("%s_count%s %d" % (self.name, labels, total))
+        return lines
+
+
+class Metrics:
+    """The metrics of this process, rendered for Prometheus.
+
+    Notes
+    -----
+    The monitors record into the metrics as they work, so rendering them
+    only reads what was recorded, and never queries the schedd.  The event
+    bus listener metrics are read from the EventBus when rendered.
+
+    Use getInstance() to get the metrics shared by the whole process.
+    """
+
+    _instance = None
+    _instanceLock = threading.Lock()
+
+    def __init__(self):
+        # name -> Gauge or Histogram, in the order they were created
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+        # the workflow metrics are labelled by run id too, as productions may share workflow names
+        self.gauge(DAG_NODES, "Number of DAG nodes in each state", ("runid", "workflow", "state"))
+        self.histogram(NODE_SUBMIT_TO_RUN, "Seconds from the submission of a node's job to its execution; "
+                       "eventlog monitor backend only", NODE_TIME_BUCKETS, ("runid", "workflow"))
+        self.histogram(NODE_RUNTIME, "Seconds from the execution of a node's job to its termination; "
+                       "eventlog monitor backend only", NODE_TIME_BUCKETS, ("runid", "workflow"))
+        self.histogram(CONDOR_QUERY, "Seconds taken by a query of the condor queue", QUERY_TIME_BUCKETS,
+                       ("backend",))
+        self.gauge(MONITOR_LAG, "Seconds the workflow monitor's view of a workflow is behind",
+                   ("runid", "workflow"))
+
+    @staticmethod
+    def getInstance():
+        """Return the metrics shared by the whole process
+
+        Returns
+        -------
+        metrics : `Metrics`
+        """
+        with Metrics._instanceLock:
+            if Metrics._instance is None:
+                Metrics._instance = Metrics()
+            return Metrics._instance
+
+    def gauge(self, name, documentation="", labelNames=()):
+        """Return the gauge with this name, creating it if needed
+
+        Returns
+        -------
+        gauge : `Gauge`
+        """
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Gauge(name, documentation, labelNames)
+            return metric
+
+    def histogram(self, name, documentation="", buckets=NODE_TIME_BUCKETS, labelNames=()):
+        """Return the histogram with this name, creating it if needed
+
+        Returns
+        -------
+        histogram : `Histogram`
+        """
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Histogram(name, documentation, buckets, labelNames)
+            return metric
+
+    def removeRun(self, runid):
+        """Forget the series of every workflow of a production
+
+        Parameters
+        ----------
+        runid : `str`
+            run id of the production
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            if "runid" in metric.labelNames:
+                metric.removeMatching({"runid": runid})
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format
+
+        Returns
+        -------
+        text : `str`
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        # the listener metrics are only known to the event bus
+        lag = Gauge(LISTENER_LAG, "Seconds from the publication of the last event delivered to a "
+                    "listener to its delivery", ("listener",))
+        pending = Gauge(LISTENER_PENDING, "Number of events waiting for a listener", ("listener",))
+        dropped = Gauge(LISTENER_DROPPED, "Number of events dropped because a listener fell behind",
+                        ("listener",))
+        dropped.kind = "counter"
+        for i, listener in enumerate(EventBus.getInstance().metrics()["listeners"]):
+            name = "%s-%d" % (listener["listener"], i)
+            lag.set(listener["lastLag"], name)
+            pending.set(listener["pending"], name)
+            dropped.set(listener["dropped"], name)
+
+        lines = []
+        for metric in metrics + [lag, pending, dropped]:
+            lines.append("# HELP %s %s" % (metric.name, metric.documentation))
+            lines.append("# TYPE %s %s" % (metric.name, metric.kind))
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
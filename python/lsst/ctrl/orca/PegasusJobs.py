@@ -29,19 +29,26 @@ from lsst.ctrl.orca.CondorJobs import CondorJobs
 class PegasusJobs(CondorJobs):
     """Handles interaction with Pegasus
     This class is highly dependent on the output of the pegasus commands
+
+    Parameters
+    ----------
+    backend : `JobBackend`, optional
+        talks to the schedd; defaults to the process' command line backend
     """
 
-    def __init__(self):
+    def __init__(self, backend=None):
         log.debug("PegasusJobs:__init__")
-        return
+        CondorJobs.__init__(self, backend)
 
-    def pegasusSubmitDax(self, sitesFile, transformationFile, daxFile):
+    def pegasusSubmitDax(self, sitesFile, transformationFile, daxFile, cwd=None):
         """Submit a pegagus dax and return its cluster number
 
         Parameters
         ----------
         daxFile : `str`
             name of pegasus DAX file
+        cwd : `str`, optional
+            directory pegasus-plan runs in; defaults to the current directory
         """
         log.debug("PegasusJobs: pegasusSubmitDax %s", daxFile)
         """
@@ -92,7 +99,7 @@ class PegasusJobs(CondorJobs):
                % (sitesFile, transformationFile, daxFile))
         print(cmd)
         log.debug(cmd)
-        process = subprocess.Popen(cmd.split(), shell=False, stdout=subprocess.PIPE)
+        process = subprocess.Popen(cmd.split(), shell=False, cwd=cwd, stdout=subprocess.PIPE)
         output = []
         line = process.stdout.readline()
         line = line.decode()
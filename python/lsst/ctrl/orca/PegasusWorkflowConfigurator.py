@@ -20,9 +20,9 @@
 # see <http://www.lsstcorp.org/LegalNotices/>.
 #
 
-import sys
 import os
 import os.path
+import subprocess
 from shutil import copy
 
 import lsst.log as log
@@ -31,6 +31,8 @@ from lsst.ctrl.orca.EnvString import EnvString
 from lsst.ctrl.orca.WorkflowConfigurator import WorkflowConfigurator
 from lsst.ctrl.orca.PegasusWorkflowLauncher import PegasusWorkflowLauncher
 from lsst.ctrl.orca.TemplateWriter import TemplateWriter
+from lsst.ctrl.orca.StagingArea import StagingArea
+from lsst.ctrl.orca.exceptions import ConfigurationError
 
 ##
 #
@@ -97,6 +99,11 @@ class PegasusWorkflowConfigurator(WorkflowConfigurator):
         # default root for the production
         self.defaultRoot = wfConfig.platform.dir.defaultRoot
 
+        # local staging area, and the writer shared by all the files
+        # generated from templates into it; set up by configure()
+        self.stagingArea = None
+        self.templateWriter = None
+
     def configure(self, provSetup, wfVerbosity):
         """Setup as much as possible in preparation to execute the workflow
            and return a WorkflowLauncher object that will launch the
@@ -131,17 +138,16 @@ class PegasusWorkflowConfigurator(WorkflowConfigurator):
 
         # local staging directory
         self.localStagingDir = os.path.join(self.localScratch, self.runid)
-        os.makedirs(self.localStagingDir)
-
-        # write the glidein file
-        startDir = os.getcwd()
-        os.chdir(self.localStagingDir)
+        os.makedirs(self.localStagingDir, exist_ok=True)
+        self.stagingArea = StagingArea(self.localStagingDir)
+        self.templateWriter = TemplateWriter(self.stagingArea.manifest)
 
+        # write the glidein file; relative paths are in the staging directory,
+        # which is never made the working directory of the process
         if localConfig.glidein.template.inputFile is not None:
             self.writeGlideinFile(localConfig.glidein)
         else:
             log.debug("PegasusWorkflowConfigurator: not writing glidein file")
-        os.chdir(startDir)
 
         # TODO - fix this loop for multiple condor submits; still working
         # out what this might mean.
@@ -151,63 +157,42 @@ class PegasusWorkflowConfigurator(WorkflowConfigurator):
             # script directory
             self.scriptDir = task.scriptDir
 
-            # save initial directory we were called from so we can get back
-            # to it
-            startDir = os.getcwd()
-
-            # switch to staging directory
-            os.chdir(self.localStagingDir)
-
-            # switch to tasks directory in staging directory
-            scriptDir = os.path.join(self.localStagingDir, task.scriptDir)
-            os.makedirs(scriptDir)
-            os.chdir(scriptDir)
+            # tasks directory in staging directory; the generator's files are relative to it
+            scriptDir = self.stagingArea.path(task.scriptDir)
+            os.makedirs(scriptDir, exist_ok=True)
 
             # set configuration
             task.generator.name = "dax"
             generatorConfig = task.generator.active
 
+            # resolve all of the task's paths at once
+            sitesTemplate, sitesOutputFile, transform, daxScript, daxGeneratorInput = \
+                EnvString.resolve_many([generatorConfig.sites.inputFile, generatorConfig.sites.outputFile,
+                                        generatorConfig.transformFile, generatorConfig.script,
+                                        generatorConfig.inputFile])
+
             # generate sites file
 
-            sitesTemplate = EnvString.resolve(generatorConfig.sites.inputFile)
-            sitesOutputFile = EnvString.resolve(generatorConfig.sites.outputFile)
             keywords = generatorConfig.sites.keywords
-            self.writeSitesXML(sitesOutputFile, sitesTemplate, keywords)
             sitesXMLFile = os.path.join(scriptDir, sitesOutputFile)
+            self.writeSitesXML(sitesXMLFile, os.path.join(scriptDir, sitesTemplate), keywords)
 
             # copy transform file
-            transform = EnvString.resolve(generatorConfig.transformFile)
-            copy(transform, scriptDir)
-            transformFile = os.path.join(scriptDir, transform)
+            transformFile = copy(os.path.join(scriptDir, transform), scriptDir)
 
             # generate dax
-            daxScript = EnvString.resolve(generatorConfig.script)
-            copy(daxScript, scriptDir)
-            daxGenerator = os.path.join(scriptDir, os.path.basename(generatorConfig.script))
+            daxGenerator = copy(os.path.join(scriptDir, daxScript), scriptDir)
 
             log.debug("PegasusWorkflowConfigurator:configure: generate dax")
-            daxGeneratorInput = EnvString.resolve(generatorConfig.inputFile)
 
-            # change into the local staging area to create the DAX file, and its output
-            os.chdir(self.localStagingDir)
+            # create the DAX file, and its output, in the local staging area
             daxCreatorCmd = [daxGenerator, "-i", daxGeneratorInput, "-o", "output.dax"]
-
-            pid = os.fork()
-            if not pid:
-                # turn off all output from this command
-                sys.stdin.close()
-                sys.stdout.close()
-                sys.stderr.close()
-                os.close(0)
-                os.close(1)
-                os.close(2)
-                os.execvp(daxCreatorCmd[0], daxCreatorCmd)
-            os.wait()[0]
+            self.runDaxGenerator(daxCreatorCmd)
 
             # create dax log directories ?
 
-            # change back to initial directory
-            os.chdir(startDir)
+        # record what was staged, for later stages and remote syncs
+        self.stagingArea.manifest.save()
 
         # create the Launcher
 
@@ -216,9 +201,33 @@ class PegasusWorkflowConfigurator(WorkflowConfigurator):
                                                    sitesXMLFile,
                                                    transformFile,
                                                    "output.dax",
-                                                   wfConfig.monitor)
+                                                   wfConfig.monitor, self.wfName)
         return workflowLauncher
 
+    def runDaxGenerator(self, daxCreatorCmd):
+        """Run the DAX generator in the local staging directory, with its standard output turned off
+
+        Parameters
+        ----------
+        daxCreatorCmd : `list` of `str`
+            the generator and its arguments
+
+        Raises
+        ------
+        `ConfigurationError`
+            if the generator can't be run or exits with a non-zero status
+        """
+        log.debug("PegasusWorkflowConfigurator:runDaxGenerator: %s", " ".join(daxCreatorCmd))
+        try:
+            process = subprocess.run(daxCreatorCmd, cwd=self.localStagingDir, stdin=subprocess.DEVNULL,
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except OSError as error:
+            raise ConfigurationError("couldn't run DAX generator %s: %s" % (daxCreatorCmd[0], error))
+        if process.returncode != 0:
+            errmsg = process.stderr.decode(errors="replace").strip()
+            raise ConfigurationError("DAX generator %s failed with exit status %d: %s" %
+                                     (daxCreatorCmd[0], process.returncode, errmsg))
+
     def writeSitesXML(self, outputFile, template, keywords):
         """Write the prescript script
 
@@ -237,8 +246,7 @@ class PegasusWorkflowConfigurator(WorkflowConfigurator):
             pairs[value] = val
         pairs["ORCA_RUNID"] = self.runid
         pairs["ORCA_DEFAULTROOT"] = self.defaultRoot
-        writer = TemplateWriter()
-        writer.rewrite(template, outputFile, pairs)
+        self.templateWriter.rewrite(template, outputFile, pairs)
 
     def getWorkflowName(self):
         """get the workflow name
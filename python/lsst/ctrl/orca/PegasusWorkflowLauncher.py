@@ -24,6 +24,7 @@ import os
 import lsst.log as log
 from lsst.ctrl.orca.WorkflowLauncher import WorkflowLauncher
 from lsst.ctrl.orca.PegasusJobs import PegasusJobs
+from lsst.ctrl.orca.JobBackend import getJobBackend
 from lsst.ctrl.orca.CondorWorkflowMonitor import CondorWorkflowMonitor
 
 
@@ -44,10 +45,12 @@ class PegasusWorkflowLauncher(WorkflowLauncher):
         DAGman file
     monitorConfig : Config
         monitor Config
+    wfName : str, optional
+        name of the workflow
     """
 
     def __init__(self, prodConfig, wfConfig, runid, localStagingDir, sitesXMLFile, transformFile,
-                 daxFile, monitorConfig):
+                 daxFile, monitorConfig, wfName=None):
         log.debug("PegasusWorkflowLauncher:__init__")
 
         self.prodConfig = prodConfig
@@ -58,6 +61,32 @@ class PegasusWorkflowLauncher(WorkflowLauncher):
         self.transformFile = transformFile
         self.daxFile = daxFile
         self.monitorConfig = monitorConfig
+        self.wfName = wfName
+
+    @classmethod
+    def fromRunState(cls, prodConfig, wfConfig, runid, wfName, runState):
+        """Create the launcher of a workflow another process launched
+
+        Parameters
+        ----------
+        prodConfig : Config
+            production Config
+        wfConfig : Config
+            workflow Config
+        runid : str
+            run id
+        wfName : str
+            name of the workflow
+        runState : dict
+            what getRunState() reported when the workflow was launched
+
+        Returns
+        -------
+        launcher : `PegasusWorkflowLauncher`
+            a launcher that can reattach to the workflow, but not plan it again
+        """
+        return cls(prodConfig, wfConfig, runid, runState["stagingDir"], None, None, None,
+                   wfConfig.monitor, wfName)
 
     def cleanUp(self):
         """Perform cleanup after workflow has ended.
@@ -71,25 +100,61 @@ class PegasusWorkflowLauncher(WorkflowLauncher):
         ----------
         statusListener : StatusListener
             status listener object
+
+        Raises
+        ------
+        RuntimeError
+            if the dax couldn't be planned and submitted
         """
         log.debug("PegasusWorkflowLauncher:launch")
 
-        # start the monitor
-
-        # Launch process
-        startDir = os.getcwd()
-        os.chdir(self.localStagingDir)
-
-        pj = PegasusJobs()
+        # plan and submit from the staging directory; the process's working directory is left alone
+        pj = PegasusJobs(getJobBackend(self.monitorConfig.jobBackend))
         condorDagId, statusInfo, removeInfo = pj.pegasusSubmitDax(self.sitesXMLFile, self.transformFile,
-                                                                  self.daxFile)
+                                                                  self.daxFile, cwd=self.localStagingDir)
+        if condorDagId == -1:
+            raise RuntimeError("dax %s of workflow %s wasn't submitted" % (self.daxFile, self.wfName))
         if statusInfo is not None:
             print("Pegasus workspace: %s" % statusInfo[0])
 
-        os.chdir(startDir)
+        return self._startMonitor(condorDagId, statusListener)
+
+    def getRunState(self):
+        """Report what a new process needs to monitor the launched workflow again
+
+        Returns
+        -------
+        runState : `dict`
+            this launcher's module, the condorDagId of the Pegasus dag and
+            the staging directory
+        """
+        return {"launcher": type(self).__module__,
+                "condorDagId": str(self.workflowMonitor.condorDagId),
+                "stagingDir": os.path.abspath(self.localStagingDir),
+                "dagFile": None,
+                "nodeStatusFile": None}
+
+    def reattach(self, condorDagId, statusListener):
+        """Monitor a workflow submitted by another process, without planning or submitting anything
+
+        Parameters
+        ----------
+        condorDagId : `str`
+            job id of the Pegasus dag
+        statusListener : StatusListener
+            status listener object
+
+        Returns
+        -------
+        workflowMonitor : `CondorWorkflowMonitor`
+        """
+        log.debug("PegasusWorkflowLauncher:reattach: dag %s", condorDagId)
+        return self._startMonitor(condorDagId, statusListener)
 
+    def _startMonitor(self, condorDagId, statusListener):
         # workflow monitor for HTCondor jobs
-        self.workflowMonitor = CondorWorkflowMonitor(condorDagId, self.monitorConfig)
+        self.workflowMonitor = CondorWorkflowMonitor(condorDagId, self.monitorConfig, name=self.wfName,
+                                                     runid=self.runid)
 
         if statusListener is not None:
             self.workflowMonitor.addStatusListener(statusListener)
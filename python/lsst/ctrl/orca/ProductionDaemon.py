@@ -0,0 +1,312 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+
+import socket
+import threading
+import lsst.log as log
+
+from .DaemonServiceHandler import DaemonServiceHandler
+from .ProductionRunManager import ProductionRunManager
+from .RunStateStore import RunStateStore
+from .multithreading import SharedData
+
+# most productions the daemon keeps at once, running or finished
+MAX_PRODUCTIONS = 100
+
+# states of a production run by the daemon
+LAUNCHING = "launching"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+STOPPED = "stopped"
+
+
+def MakeDaemonHandlerClass(daemon):
+    class CustomHandler(DaemonServiceHandler, object):
+        def __init__(self, *args, **kwargs):
+            self.setParent(daemon, None)
+            super(CustomHandler, self).__init__(*args, **kwargs)
+    return CustomHandler
+
+
+class ProductionDaemon:
+    """Runs many productions in one long-lived process, served from one service endpoint.
+
+    Parameters
+    ----------
+    port : `int`, optional
+        port the service endpoint listens at; any free port if 0
+    runStateStore : `RunStateStore`, optional
+        where the state of the runs is recorded; the default RunStateStore if None
+    maxProductions : `int`, optional
+        most productions kept at once, running or finished
+
+    Notes
+    -----
+    Productions are submitted with POST /api/v1/productions, and each is
+    configured, staged and launched by a ProductionRunManager in a thread of
+    its own, without a service endpoint of its own.  The modules are only
+    imported once, the monitors of every production share the process's
+    QueuePoller and EventBus, and a production's status and events are
+    served under /api/v1/productions/<runid>.  A finished production is
+    kept until it is deleted, so that its final status can still be read.
+    """
+
+    def __init__(self, port=0, runStateStore=None, maxProductions=MAX_PRODUCTIONS):
+
+        # _locked: a container for data to be shared across threads that
+        # have access to this object.
+        # productions: run id -> _ProductionThread, in the order they were submitted
+        self._locked = SharedData.SharedData(False, {"productions": {}})
+
+        # where the state of the runs is recorded
+        self.runStateStore = runStateStore if runStateStore is not None else RunStateStore()
+
+        # most productions kept at once, running or finished
+        self.maxProductions = maxProductions
+
+        # the service endpoint
+        self.server = ProductionRunManager.ThreadedServer(('0.0.0.0', port), MakeDaemonHandlerClass(self))
+        self.server.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.setManager(self)
+
+    def getPort(self):
+        """Accessor to the port the service endpoint listens at
+        """
+        return self.server.server_port
+
+    def serveForever(self):
+        """Serve requests until shutdown() is called
+        """
+        print('server socket listening at %d' % self.getPort())
+        self.server.serve_forever()
+        self.server.server_close()
+
+    def shutdown(self):
+        """Stop serving requests; the productions still running are left running
+        """
+        self.server.shutdown()
+
+    def submit(self, runid, configFile, repository=None, skipConfigCheck=False, workflowVerbosity=None):
+        """Start running a production
+
+        Parameters
+        ----------
+        runid : `str`
+            run id of the production
+        configFile : `str`
+            production run config file
+        repository : `str`, optional
+            the config repository to assume; this will override the value in the config file
+        skipConfigCheck : `bool`, optional
+            skips configuration checks, if True
+        workflowVerbosity : `int`, optional
+            overrides the config-specified logger verbosity
+
+        Raises
+        ------
+        `ValueError`
+            if the run id is already in use, or the daemon has as many productions as it keeps
+
+        Notes
+        -----
+        The production is configured and launched in a thread of its own,
+        so this returns at once; its state tells whether it was launched.
+        """
+        log.debug("ProductionDaemon:submit: %s", runid)
+        production = self._ProductionThread(self, runid, configFile, repository, skipConfigCheck,
+                                            workflowVerbosity)
+        with self._locked:
+            if runid in self._locked.productions:
+                raise ValueError("run id %s is already in use" % runid)
+            if len(self._locked.productions) >= self.maxProductions:
+                raise ValueError("already keeping %d productions; delete finished ones first" %
+                                 self.maxProductions)
+            self._locked.productions[runid] = production
+        production.start()
+
+    def getProduction(self, runid):
+        """Accessor to the ProductionRunManager of a production
+
+        Returns
+        -------
+        manager : `ProductionRunManager`
+            the production; None if there is no such production, or it
+            couldn't be configured
+        """
+        with self._locked:
+            production = self._locked.productions.get(runid)
+        return production.manager if production is not None else None
+
+    def getProductions(self):
+        """Report the state of every production
+
+        Returns
+        -------
+        productions : `list` of `dict`
+            the run id, config file and state of each production, with the
+            error that made it fail, in the order they were submitted
+        """
+        with self._locked:
+            productions = list(self._locked.productions.values())
+        return [production.getStatus() for production in productions]
+
+    def getProductionState(self, runid):
+        """Report the state of one production
+
+        Returns
+        -------
+        status : `dict`
+            what getProductions() reports for it; None if there is no such production
+        """
+        with self._locked:
+            production = self._locked.productions.get(runid)
+        return production.getStatus() if production is not None else None
+
+    def stopProduction(self, runid, urgency):
+        """Stop a production, or forget it once it has finished
+
+        Notes
+        -----
+        A production still launching is stopped as soon as its launch
+        allows: before it is launched if its config is still being loaded
+        or checked, or right after its first workflows are submitted.
+
+        Parameters
+        ----------
+        runid : `str`
+            run id of the production
+        urgency : `int`
+            an indicator of how urgently to carry out the shutdown
+
+        Returns
+        -------
+        found : `bool`
+            False if there is no such production
+        """
+        with self._locked:
+            production = self._locked.productions.get(runid)
+            if production is None:
+                return False
+            if production.state in (DONE, FAILED, STOPPED):
+                del self._locked.productions[runid]
+                return True
+            if production.state == LAUNCHING:
+                production.stopUrgency = urgency
+                return True
+        production.manager.stopProduction(urgency)
+        return True
+
+    class _ProductionThread(threading.Thread):
+        """Configures, launches and waits for one production of the daemon
+
+        Parameters
+        ----------
+        parent : `ProductionDaemon`
+            the daemon
+        runid : `str`
+            run id of the production
+        configFile : `str`
+            production run config file
+        repository : `str`
+            the config repository to assume, or None
+        skipConfigCheck : `bool`
+            skips configuration checks, if True
+        workflowVerbosity : `int`
+            overrides the config-specified logger verbosity, if not None
+        """
+        def __init__(self, parent, runid, configFile, repository, skipConfigCheck, workflowVerbosity):
+            threading.Thread.__init__(self, name="Production %s" % runid)
+            self.setDaemon(True)
+            self._parent = parent
+
+            # run id of the production
+            self.runid = runid
+
+            # production run config file
+            self.configFile = configFile
+
+            self.repository = repository
+            self.skipConfigCheck = skipConfigCheck
+            self.workflowVerbosity = workflowVerbosity
+
+            # the production, once its config is loaded
+            self.manager = None
+
+            # LAUNCHING, RUNNING, DONE, FAILED or STOPPED; changed with the daemon locked
+            self.state = LAUNCHING
+
+            # why the production failed to launch
+            self.error = None
+
+            # urgency of a stop requested while the production was launching, if one was
+            self.stopUrgency = None
+
+        def run(self):
+            """Launch the production, and wait for it to complete
+            """
+            try:
+                self.manager = ProductionRunManager(self.runid, self.configFile, self.repository,
+                                                    self._parent.runStateStore)
+                self._setState(LAUNCHING)
+                if self._stopRequested():
+                    log.info("ProductionDaemon: production %s stopped before its launch", self.runid)
+                    self._setState(STOPPED)
+                    self.manager.releaseListeners()
+                    return
+                self.manager.runProduction(skipConfigCheck=self.skipConfigCheck,
+                                           workflowVerbosity=self.workflowVerbosity, serve=False)
+            except Exception as error:
+                log.warn("ProductionDaemon: production %s failed to launch: %s", self.runid, error)
+                self._setState(FAILED, str(error))
+                if self.manager is not None:
+                    self.manager.stopProduction(0)
+                    self.manager.releaseListeners()
+                return
+            self._setState(RUNNING)
+            urgency = self._stopRequested()
+            if urgency is not None:
+                self.manager.stopProduction(urgency)
+            self.manager.waitForCompletion()
+            self.manager.releaseListeners()
+            self._setState(DONE)
+            log.info("ProductionDaemon: production %s is done", self.runid)
+
+        def _stopRequested(self):
+            # the urgency of the stop requested while launching, or None
+            with self._parent._locked:
+                return self.stopUrgency
+
+        def _setState(self, state, error=None):
+            # record the state, and show it in the production's status snapshots
+            with self._parent._locked:
+                self.state = state
+                self.error = error
+            if self.manager is not None:
+                self.manager.getProductionStatus().setAnnotation({"state": state, "error": error})
+
+        def getStatus(self):
+            """Report the run id, config file and state of the production, with its error if it failed
+            """
+            return {"runid": self.runid, "configFile": self.configFile, "state": self.state,
+                    "error": self.error}
@@ -20,8 +20,11 @@
 # see <http://www.lsstcorp.org/LegalNotices/>.
 #
 
+import concurrent.futures
+
 from lsst.ctrl.orca.NamedClassFactory import NamedClassFactory
 from lsst.ctrl.orca.WorkflowManager import WorkflowManager
+from lsst.ctrl.orca.WorkflowScheduler import checkDependencies
 from lsst.ctrl.orca.config.ProductionConfig import ProductionConfig
 from lsst.ctrl.orca.exceptions import MultiIssueConfigurationError
 import lsst.log as log
@@ -147,21 +150,76 @@ class ProductionRunConfigurator:
             # XXX - specialConfigurationConfig maybe?
             self.specializedConfigure(specialConfigurationConfig)
 
-        workflowConfigs = self.prodConfig.workflow
-        workflowManagers = []
-        for wfName in workflowConfigs:
-            wfConfig = workflowConfigs[wfName]
-            # copy in appropriate production level info into workflow Node  -- ?
+        wfNames = list(self.prodConfig.workflow)
+
+        # refuse dependencies that can't be scheduled before staging anything
+        checkDependencies(wfNames, {wfName: list(self.prodConfig.workflow[wfName].dependsOn or [])
+                                    for wfName in wfNames})
 
-            workflowManager = self.createWorkflowManager(self.prodConfig, wfName, wfConfig)
-            workflowLauncher = workflowManager.configure(self._provSetup, workflowVerbosity)
-            if workflowLauncher is None:
-                raise MultiIssueConfigurationError("error configuring workflowLauncher")
+        workers = min(self.prodConfig.production.configurationWorkers or 1, len(wfNames))
 
-            workflowManagers.append(workflowManager)
+        # configure the workflows on a pool of threads, keeping them in the configured order
+        if workers > 1:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(self.configureWorkflow, wfName, workflowVerbosity)
+                           for wfName in wfNames]
+                outcomes = [self._outcome(future.result) for future in futures]
+        else:
+            outcomes = [self._outcome(self.configureWorkflow, wfName, workflowVerbosity)
+                        for wfName in wfNames]
+
+        workflowManagers = []
+        problems = MultiIssueConfigurationError("problems encountered while configuring workflows")
+        for wfName, (workflowManager, error) in zip(wfNames, outcomes):
+            if error is None:
+                workflowManagers.append(workflowManager)
+            elif isinstance(error, MultiIssueConfigurationError) and error.hasProblems():
+                for problem in error.getProblems():
+                    problems.addProblem("workflow %s: %s" % (wfName, problem))
+            else:
+                problems.addProblem("workflow %s: %s" % (wfName, error))
+        if problems.hasProblems():
+            raise problems
 
         return workflowManagers
 
+    def configureWorkflow(self, wfName, workflowVerbosity):
+        """Create and configure the WorkflowManager of one workflow
+
+        Parameters
+        ----------
+        wfName : `str`
+            name of the workflow
+        workflowVerbosity : `int`
+            verbosity level of the workflow
+
+        Returns
+        -------
+        wfManager : `WorkflowManager`
+            the configured workflow manager
+
+        Notes
+        -----
+        This may be called from several threads at once, one per workflow.
+        """
+        log.debug("ProductionRunConfigurator:configureWorkflow: %s", wfName)
+        wfConfig = self.prodConfig.workflow[wfName]
+
+        workflowManager = self.createWorkflowManager(self.prodConfig, wfName, wfConfig)
+        workflowLauncher = workflowManager.configure(self._provSetup, workflowVerbosity)
+        if workflowLauncher is None:
+            raise MultiIssueConfigurationError("error configuring workflowLauncher")
+        return workflowManager
+
+    @staticmethod
+    def _outcome(function, *args):
+        # (result, None) if the function returned, or (None, exception) if it raised one
+        try:
+            return function(*args), None
+        except Exception as error:
+            log.warn("ProductionRunConfigurator: %s", error)
+            return None, error
+
     def checkConfiguration(self, care=1, issueExc=None):
         """Carry out production-wide configuration checks.
 
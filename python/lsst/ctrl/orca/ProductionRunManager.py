@@ -27,11 +27,15 @@ import threading
 import time
 from lsst.ctrl.orca.config.ProductionConfig import ProductionConfig
 from lsst.ctrl.orca.NamedClassFactory import NamedClassFactory
-from lsst.ctrl.orca.StatusListener import StatusListener
 import lsst.log as log
 from http.server import HTTPServer
 from socketserver import ThreadingMixIn
 from .ServiceHandler import ServiceHandler
+from .EventBus import EventBus
+from .Metrics import Metrics
+from .ProductionStatus import ProductionStatus
+from .RunStateStore import RunStateStore, RunStateRecorder, DONE
+from .WorkflowScheduler import WorkflowScheduler
 
 from .EnvString import EnvString
 from .exceptions import ConfigurationError
@@ -59,9 +63,11 @@ class ProductionRunManager:
          production run config file
     repository : `str`, optional
          the config repository to assume; this will override the value in the config file
+    runStateStore : `RunStateStore`, optional
+         where the state of the run is recorded; the default RunStateStore if None
     """
 
-    def __init__(self, runid, configFileName, repository=None):
+    def __init__(self, runid, configFileName, repository=None, runStateStore=None):
 
         # _locked: a container for data to be shared across threads that
         # have access to this object.
@@ -106,6 +112,18 @@ class ProductionRunManager:
         # shutdown thread
         self._sdthread = None
 
+        # launches the workflows as their dependencies allow, once the production runs
+        self._scheduler = None
+
+        # snapshots of the production's status served by the service endpoint
+        self._productionStatus = ProductionStatus(self)
+
+        # where the run is recorded, so that another process can reattach to it
+        self._runStateStore = runStateStore if runStateStore is not None else RunStateStore()
+
+        # records the node counts of the launched workflows in the run state store
+        self._runStateRecorder = RunStateRecorder(self._runStateStore, self.runid)
+
     def getRunId(self):
         """Accessor to return the run id for this production run
 
@@ -154,7 +172,7 @@ class ProductionRunManager:
         finally:
             self._locked.release()
 
-    def runProduction(self, skipConfigCheck=False, workflowVerbosity=None):
+    def runProduction(self, skipConfigCheck=False, workflowVerbosity=None, serve=True):
         """Run the entire production
 
         Parameters
@@ -163,6 +181,9 @@ class ProductionRunManager:
             Skips configuration checks, if True
         workflowVerbosity: `int`, optional
             overrides the config-specified logger verbosity
+        serve : `bool`, optional
+            start this production's own service endpoint; a ProductionDaemon
+            serves its productions from one endpoint instead
 
         Raises
         ------
@@ -215,22 +236,153 @@ class ProductionRunManager:
             #
             # provSetup.recordProduction()
 
-            for workflow in self._workflowManagers["__order"]:
-                mgr = self._workflowManagers[workflow.getName()]
+            # follow every monitor's events, starting with the launch of its workflow
+            EventBus.getInstance().subscribe(self._productionStatus)
 
-                statusListener = StatusListener()
-                # this will block until the monitor is created.
-                monitor = mgr.runWorkflow(statusListener)
-                self._workflowMonitors.append(monitor)
+            managers = [self._workflowManagers[workflow.getName()]
+                        for workflow in self._workflowManagers["__order"]]
+            self._runStateStore.recordRun(self.runid, self.fullConfigFilePath, self.repository,
+                                          [mgr.getName() for mgr in managers])
+
+            # submit every workflow that depends on no other at once, and each of the others as
+            # soon as its upstream workflows are done; this blocks until the first ones are submitted.
+            self._scheduler = WorkflowScheduler(managers, self.getWorkflowDependencies(),
+                                                self._workflowLaunched, self._runStateRecorder)
+            self._scheduler.start()
+            errors = self._scheduler.waitForInitialLaunch()
+            if errors:
+                raise errors[0]
 
         finally:
             self._locked.release()
 
-        self._startServiceThread()
+        if serve:
+            self._startServiceThread()
 
         print("Production launched.")
         print("Waiting for shutdown request.")
 
+    def _workflowLaunched(self, monitor):
+        """Record the launch of a workflow
+
+        Parameters
+        ----------
+        monitor : `WorkflowMonitor`
+            the monitor of the workflow just launched
+        """
+        self._workflowMonitors.append(monitor)
+        for workflow in self._workflowManagers["__order"]:
+            workflowMgr = self._workflowManagers[workflow.getName()]
+            if workflowMgr.getMonitor() is not monitor:
+                continue
+            runState = workflowMgr.getRunState()
+            if runState is None:
+                log.info("workflow %s can't be reattached to; its launch isn't recorded",
+                         workflowMgr.getName())
+                return
+            self._runStateStore.recordLaunch(self.runid, workflowMgr.getName(), runState)
+            return
+
+    @staticmethod
+    def reattach(runid, runStateStore=None):
+        """Monitor a production run again, from what its orca process recorded
+
+        Parameters
+        ----------
+        runid : `str`
+            the run id of the production
+        runStateStore : `RunStateStore`, optional
+            where the run was recorded; the default RunStateStore if None
+
+        Returns
+        -------
+        manager : `ProductionRunManager`
+            the production, with a monitor for each workflow that was launched,
+            and its service endpoint started
+
+        Raises
+        ------
+        `ConfigurationError`
+            if the run wasn't recorded
+
+        Notes
+        -----
+        Nothing is staged or submitted again: the config file recorded for
+        the run is loaded, and each launched workflow gets a monitor for the
+        dag id recorded at its launch.  Workflows that weren't launched yet
+        are not launched.
+        """
+        if runStateStore is None:
+            runStateStore = RunStateStore()
+        run = runStateStore.getRun(runid)
+        if run is None:
+            raise ConfigurationError("no state recorded for run %s in %s" % (runid, runStateStore.fileName))
+        manager = ProductionRunManager(runid, run["configFile"], run["repository"], runStateStore)
+        manager.reattachWorkflows()
+        return manager
+
+    def reattachWorkflows(self):
+        """Create a monitor for each workflow of this run that was launched, as recorded
+
+        Raises
+        ------
+        `ConfigurationError`
+            if the production is already running, or no workflow can be monitored
+        """
+        log.debug("Reattaching to production: %s", self.runid)
+
+        if not self.isRunnable():
+            raise ConfigurationError("Production Run %s is already running or done" % self.runid)
+
+        try:
+            self._locked.acquire()
+            self._locked.running = True
+
+            # the managers, without configuring the workflows again
+            self._productionRunConfigurator = self.createConfigurator(self.runid, self.fullConfigFilePath)
+            self._workflowManagers = {"__order": []}
+            for wfName in self.config.workflow:
+                wfm = self._productionRunConfigurator.createWorkflowManager(self.config, wfName,
+                                                                            self.config.workflow[wfName])
+                self._workflowManagers["__order"].append(wfm)
+                self._workflowManagers[wfm.getName()] = wfm
+
+            EventBus.getInstance().subscribe(self._productionStatus)
+
+            for record in self._runStateStore.getWorkflows(self.runid):
+                workflowMgr = self._workflowManagers.get(record["name"])
+                if workflowMgr is None or record["condorDagId"] is None:
+                    log.warn("workflow %s of run %s was never launched; it won't be", record["name"],
+                             self.runid)
+                    continue
+                # the recorder listens before the monitor starts, in case the DAG has already completed
+                monitor = workflowMgr.reattach(record, self._runStateRecorder)
+                if monitor is None:
+                    log.warn("workflow %s of run %s can't be reattached to; it won't be monitored",
+                             record["name"], self.runid)
+                    continue
+                self._workflowMonitors.append(monitor)
+            if not self._workflowMonitors:
+                raise ConfigurationError("no workflow of run %s was launched" % self.runid)
+        finally:
+            self._locked.release()
+
+        self._startServiceThread()
+
+        print("Production reattached.")
+        print("Waiting for shutdown request.")
+
+    def getWorkflowDependencies(self):
+        """Return the workflows each workflow of the production depends on
+
+        Returns
+        -------
+        dependencies : `dict`
+            workflow name -> names of the workflows that must finish before it starts
+        """
+        return {name: list(self.config.workflow[name].dependsOn or [])
+                for name in self.config.workflow}
+
     def isRunning(self):
         """Determine whether production is currently running
 
@@ -247,6 +399,10 @@ class ProductionRunManager:
             if monitor.isRunning():
                 return True
 
+        # workflows still waiting for their upstream workflows
+        if self._scheduler is not None and not self._scheduler.isFinished():
+            return True
+
         with self._locked:
             self._locked.running = False
 
@@ -379,30 +535,118 @@ class ProductionRunManager:
 
         log.info("Shutting down production (urgency=%s)" % urgency)
 
+        # launch nothing more, then stop what was launched
+        if self._scheduler is not None:
+            self._scheduler.stop()
         for workflow in self._workflowManagers["__order"]:
             workflowMgr = self._workflowManagers[workflow.getName()]
             workflowMgr.stopWorkflow(urgency)
 
-        pollintv = 0.2
-        running = self.isRunning()
-        lasttime = time.time()
-        while running and timeout > 0:
-            time.sleep(pollintv)
-            for workflow in self._workflowManagers["__order"]:
-                running = self._workflowManagers[workflow.getName()].isRunning()
-                if running:
-                    break
-            timeout -= time.time() - lasttime
-        if not running:
-            with self._locked:
-                self._locked.running = False
-                self._locked.done = True
-        else:
+        if not self.waitForCompletion(timeout):
             log.debug("Failed to shutdown pipelines within timeout: %ss" % timeout)
             return False
 
         return True
 
+    def waitForCompletion(self, timeout=None):
+        """Wait for every workflow of this production to complete
+
+        Parameters
+        ----------
+        timeout : `float`, optional
+            most seconds to wait; forever if None
+
+        Returns
+        -------
+        done : `bool`
+            True if all the workflows have completed
+
+        Notes
+        -----
+        This waits for the schedule to launch the workflows that depend on
+        others, then blocks on each workflow monitor in turn until it reports
+        its completion, rather than polling them.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        # every workflow is launched or skipped before the schedule finishes
+        if self._scheduler is not None and not self._scheduler.wait(timeout):
+            return False
+        for monitor in list(self._workflowMonitors):
+            if not monitor:
+                continue
+            remaining = None if deadline is None else max(deadline - time.time(), 0)
+            if not monitor.wait(remaining):
+                return False
+        with self._locked:
+            self._locked.running = False
+            self._locked.done = True
+            self._locked.notifyAll()
+        self._runStateStore.recordRunState(self.runid, DONE)
+        return True
+
+    def getStatus(self):
+        """Report the status of the production and of each of its workflows
+
+        Returns
+        -------
+        status : `dict`
+            the run id, whether the production is running or done, and the
+            status of each workflow, in the configured order, without the
+            states of their nodes
+        """
+        workflows = []
+        if self._workflowManagers:
+            for workflow in self._workflowManagers["__order"]:
+                workflows.append(self._workflowManagers[workflow.getName()].getStatus())
+                if self._scheduler is not None:
+                    workflows[-1]["schedule"] = self._scheduler.getState(workflow.getName())
+        return {"runid": self.runid, "running": self.isRunning(), "done": self.isDone(),
+                "workflows": workflows}
+
+    def getWorkflowStatus(self, name):
+        """Report the status of one workflow, with the states of its nodes
+
+        Parameters
+        ----------
+        name : `str`
+            the name of the workflow
+
+        Returns
+        -------
+        status : `dict`
+            the workflow's status, or None if there is no such workflow
+        """
+        workflowMgr = self.getWorkflowManager(name)
+        if workflowMgr is None or name == "__order":
+            return None
+        status = workflowMgr.getStatus(nodes=True)
+        if self._scheduler is not None:
+            status["schedule"] = self._scheduler.getState(name)
+        return status
+
+    def getProductionStatus(self):
+        """Accessor to the cached snapshots of the production's status
+
+        Returns
+        -------
+        status : `ProductionStatus`
+        """
+        return self._productionStatus
+
+    def releaseListeners(self, timeout=10):
+        """Stop delivering the events of the bus to this production's listeners, and drop its metrics
+
+        Parameters
+        ----------
+        timeout : `float`, optional
+            most seconds to wait for each listener's queued events to be delivered
+        """
+        EventBus.getInstance().unsubscribe(self._productionStatus, timeout)
+        EventBus.getInstance().unsubscribe(self._runStateRecorder, timeout)
+
+        # the production is over, so its series would only pile up in the metrics
+        Metrics.getInstance().removeRun(self.runid)
+
     def getWorkflowNames(self):
         """Accessor to return the "short" name for each workflow in this production.
 
@@ -445,16 +689,14 @@ class ProductionRunManager:
 
     class ThreadedServer(ThreadingMixIn, HTTPServer):
         """ threaded server """
+        # don't wait for the clients of the event stream when closing
+        daemon_threads = True
+
         def server_bind(self):
             HTTPServer.server_bind(self)
 
         def setManager(self, manager):
             self.manager = manager
-            self.socket.settimeout(1)
-
-        def serve(self):
-            while self.manager.isRunning():
-                self.handle_request()
 
     class _ServiceEndpoint(threading.Thread):
         """This thread deals with incoming requests, and if one is received during production, we
@@ -493,13 +735,21 @@ class ProductionRunManager:
             """
             self.server.setManager(self._parent)
 
-            self.server.serve()
+            # serve from another thread, and shut the server down once the production completes
+            serveThread = threading.Thread(target=self.server.serve_forever, name="ServiceEndpoint",
+                                           daemon=True)
+            serveThread.start()
+            self._parent.waitForCompletion()
+            self.server.shutdown()
+            self.server.server_close()
+            self._parent.releaseListeners()
             log.debug("Everything shutdown - All finished")
 
     def _startServiceThread(self):
         """Create a shutdown thread, and start it
         """
         self._sdthread = ProductionRunManager._ServiceEndpoint(self, self.runid)
+        self._runStateStore.recordService(self.runid, self._sdthread.server.server_port)
         self._sdthread.start()
 
     def getShutdownThread(self):
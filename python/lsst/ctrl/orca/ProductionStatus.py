@@ -0,0 +1,208 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+
+import hashlib
+import json
+import queue
+import time
+
+from lsst.ctrl.orca.multithreading import SharedData
+from lsst.ctrl.orca.StatusListener import StatusListener
+
+# seconds a snapshot is served before it is built again, even if no event was published,
+# so that the throughput and ETA in it stay current
+SNAPSHOT_MAX_AGE = 5.0
+
+# most events waiting to be written to an event stream; more are dropped
+MAX_STREAM_EVENTS = 1000
+
+
+class ProductionStatus(StatusListener):
+    """Caches JSON snapshots of the status of a production for the service endpoint.
+
+    Parameters
+    ----------
+    manager : `ProductionRunManager`
+        the production; its getStatus() and getWorkflowStatus() build the snapshots
+    maxAge : `float`, optional
+        seconds a snapshot is served before it is built again without a new event
+
+    Notes
+    -----
+    The status is subscribed to the EventBus for every monitor's events, and
+    each event of the production makes the cached snapshots stale; the
+    events of the other productions run by the same process are ignored.  The snapshots are built
+    from what the monitors already know, so serving one never queries the
+    schedd, and clients polling a production that isn't changing get the
+    same ETag back.
+    """
+
+    def __init__(self, manager, maxAge=SNAPSHOT_MAX_AGE):
+        StatusListener.__init__(self)
+
+        # the production
+        self.manager = manager
+
+        # seconds a snapshot is served before it is built again without a new event
+        self.maxAge = maxAge
+
+        # generation: number of events seen
+        # snapshots: workflow name, or None for the production -> (generation, time, body, etag)
+        # annotation: entries added to the production's status by whoever runs the production
+        self._locked = SharedData.SharedData(False, {"generation": 0, "snapshots": {}, "annotation": {}})
+
+    def handleEvent(self, event):
+        """Make the cached snapshots stale, and wake up the clients waiting for a change
+        """
+        if event.runid is not None and event.runid != self.manager.getRunId():
+            return
+        with self._locked:
+            self._locked.generation += 1
+            self._locked.notifyAll()
+
+    def setAnnotation(self, annotation):
+        """Add entries to the snapshots of the production's status, making the cached ones stale
+
+        Parameters
+        ----------
+        annotation : `dict`
+            the entries, e.g. the state a ProductionDaemon keeps for the production
+        """
+        with self._locked:
+            self._locked.annotation = dict(annotation)
+            self._locked.generation += 1
+            self._locked.notifyAll()
+
+    def getSnapshot(self, name=None):
+        """Return a snapshot of the status of the production, or of one of its workflows
+
+        Parameters
+        ----------
+        name : `str`, optional
+            the workflow; the whole production if None
+
+        Returns
+        -------
+        snapshot : (`bytes`, `str`)
+            the JSON document and its ETag; None if there is no such workflow
+        """
+        now = time.time()
+        with self._locked:
+            generation = self._locked.generation
+            cached = self._locked.snapshots.get(name)
+            annotation = self._locked.annotation
+        if cached is not None and cached[0] == generation and now - cached[1] < self.maxAge:
+            return cached[2], cached[3]
+
+        if name is None:
+            status = self.manager.getStatus()
+            status.update(annotation)
+        else:
+            status = self.manager.getWorkflowStatus(name)
+            if status is None:
+                return None
+        body = json.dumps(status, sort_keys=True).encode("utf-8")
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        with self._locked:
+            self._locked.snapshots[name] = (generation, now, body, etag)
+        return body, etag
+
+    def waitForChange(self, etag, name=None, timeout=None):
+        """Wait for the snapshot to differ from the one a client has
+
+        Parameters
+        ----------
+        etag : `str`
+            ETag of the snapshot the client has
+        name : `str`, optional
+            the workflow; the whole production if None
+        timeout : `float`, optional
+            most seconds to wait
+
+        Returns
+        -------
+        snapshot : (`bytes`, `str`)
+            the JSON document and its ETag, which is etag if nothing changed
+            within the timeout; None if there is no such workflow
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            with self._locked:
+                generation = self._locked.generation
+            snapshot = self.getSnapshot(name)
+            if snapshot is None or snapshot[1] != etag:
+                return snapshot
+            remaining = self.maxAge if deadline is None else min(deadline - time.time(), self.maxAge)
+            if remaining <= 0:
+                return snapshot
+            with self._locked:
+                if self._locked.generation == generation:
+                    self._locked.wait(remaining)
+
+
+class EventStream(StatusListener):
+    """Queues the events of the EventBus for one client of the event stream.
+
+    Parameters
+    ----------
+    maxEvents : `int`, optional
+        most events waiting to be written; more are dropped
+    runid : `str`, optional
+        only queue the events of this production, and those of no known
+        production; every event if None
+
+    Notes
+    -----
+    The listener is called from its EventBus channel thread, and the
+    request handler takes the events from the other end of the queue, so a
+    client reading slowly only loses its own events.
+    """
+
+    def __init__(self, maxEvents=MAX_STREAM_EVENTS, runid=None):
+        StatusListener.__init__(self)
+
+        # only the events of this production are queued, if not None
+        self.runid = runid
+
+        # number of events dropped because the client fell behind
+        self.dropped = 0
+
+        self._queue = queue.Queue(maxEvents)
+
+    def handleEvent(self, event):
+        """Queue an event for the client, without blocking
+        """
+        if self.runid is not None and event.runid is not None and event.runid != self.runid:
+            return
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def nextEvent(self, timeout=None):
+        """Return the next event, or None if there was none within the timeout
+        """
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
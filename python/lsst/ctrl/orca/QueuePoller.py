@@ -0,0 +1,245 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+import threading
+import time
+import lsst.log as log
+
+from lsst.ctrl.orca.multithreading import SharedData
+from lsst.ctrl.orca.CondorJobs import CondorJobs
+from lsst.ctrl.orca.JobBackend import getJobBackend
+
+# seconds between queue queries when no monitor asks for a shorter interval
+DEFAULT_INTERVAL = 5.0
+
+
+class QueuePoller:
+    """Polls the HTCondor queue on behalf of every workflow monitor in the process.
+
+    Parameters
+    ----------
+    condorJobs : `CondorJobs`, optional
+        used to query the queue; defaults to a new CondorJobs
+
+    Notes
+    -----
+    Monitors register the cluster ids they watch, and read the state of
+    their jobs from the snapshot published after each poll.  A single
+    thread runs one condor_q per interval, constrained to all the registered
+    clusters, so the load on the schedd is the same however many workflows
+    are being monitored.  The interval is the shortest one asked for by the
+    registered monitors.
+
+    Use getInstance() to get the poller of a job backend shared by the
+    whole process.
+    """
+
+    # job backend name -> poller
+    _instances = {}
+    _instanceLock = threading.Lock()
+
+    def __init__(self, condorJobs=None):
+        # used to query the queue
+        self.condorJobs = condorJobs if condorJobs is not None else CondorJobs()
+
+        # clusters: registered cluster id -> [ requested intervals ]
+        # snapshot: polled cluster id -> { job id : state letter }
+        # generation: number of snapshots published so far
+        # pollTime: time the latest snapshot was taken
+        self._locked = SharedData.SharedData(False, {"clusters": {}, "snapshot": {},
+                                                     "generation": 0, "pollTime": None,
+                                                     "stopped": False})
+        self._thread = None
+
+    @staticmethod
+    def getInstance(jobBackend="cli", condorJobs=None):
+        """Return the poller shared by all the monitors of this process that use a job backend
+
+        Parameters
+        ----------
+        jobBackend : `str`, optional
+            name of the job backend the queue is queried through, as
+            MonitorConfig.jobBackend gives it
+        condorJobs : `CondorJobs`, optional
+            used to query the queue if the backend's poller doesn't exist yet;
+            defaults to a CondorJobs using the named backend
+
+        Returns
+        -------
+        poller : `QueuePoller`
+
+        Notes
+        -----
+        The productions of a daemon may use different backends, and a DAG
+        submitted through one isn't in the queue of another, so each
+        backend has a poller of its own.
+        """
+        with QueuePoller._instanceLock:
+            poller = QueuePoller._instances.get(jobBackend)
+            if poller is None:
+                if condorJobs is None:
+                    condorJobs = CondorJobs(getJobBackend(jobBackend))
+                poller = QueuePoller(condorJobs)
+                QueuePoller._instances[jobBackend] = poller
+            return poller
+
+    def register(self, clusterId, interval=DEFAULT_INTERVAL):
+        """Start polling for the jobs of a cluster
+
+        Parameters
+        ----------
+        clusterId : `str`
+            condor cluster id
+        interval : `float`, optional
+            longest time, in seconds, the caller wants between two polls
+        """
+        clusterId = str(clusterId)
+        with self._locked:
+            self._locked.clusters.setdefault(clusterId, []).append(float(interval))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="QueuePoller", daemon=True)
+                self._thread.start()
+            self._locked.notifyAll()
+        log.debug("QueuePoller:register: %s", clusterId)
+
+    def unregister(self, clusterId):
+        """Stop polling for the jobs of a cluster, once every registration of it is removed
+
+        Parameters
+        ----------
+        clusterId : `str`
+            condor cluster id
+        """
+        clusterId = str(clusterId)
+        with self._locked:
+            intervals = self._locked.clusters.get(clusterId)
+            if not intervals:
+                return
+            intervals.pop()
+            if not intervals:
+                del self._locked.clusters[clusterId]
+                snapshot = dict(self._locked.snapshot)
+                snapshot.pop(clusterId, None)
+                self._locked.snapshot = snapshot
+        log.debug("QueuePoller:unregister: %s", clusterId)
+
+    def snapshot(self):
+        """Return the result of the latest poll
+
+        Returns
+        -------
+        snapshot : { '1016' : { '1016.0' : 'R' } }
+            the jobs in the queue of each cluster polled so far, keyed by
+            cluster id; a cluster with no jobs left maps to an empty dict
+        """
+        with self._locked:
+            return self._locked.snapshot
+
+    def getPollTime(self):
+        """Return the time the latest snapshot was taken, or None before the first poll
+        """
+        with self._locked:
+            return self._locked.pollTime
+
+    def isJobAlive(self, clusterId):
+        """Check to see if a registered cluster still has jobs in the queue
+
+        Parameters
+        ----------
+        clusterId : `str`
+            condor cluster id
+
+        Returns
+        -------
+        alive : `bool`
+            False once a poll found no jobs left in the cluster; True until then
+        """
+        jobs = self.snapshot().get(str(clusterId))
+        return jobs is None or len(jobs) > 0
+
+    def waitForPoll(self, generation=None, timeout=None):
+        """Wait for the next snapshot to be published
+
+        Parameters
+        ----------
+        generation : `int`, optional
+            wait for a snapshot newer than this one; defaults to the current one
+        timeout : `float`, optional
+            most seconds to wait
+
+        Returns
+        -------
+        generation : `int`
+            the number of the latest snapshot
+        """
+        with self._locked:
+            if generation is None:
+                generation = self._locked.generation
+            deadline = None if timeout is None else time.time() + timeout
+            while self._locked.generation <= generation and not self._locked.stopped:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._locked.wait(remaining)
+            return self._locked.generation
+
+    def stop(self):
+        """Stop polling; the poller can't be used afterwards
+        """
+        with self._locked:
+            self._locked.stopped = True
+            self._locked.notifyAll()
+
+    def _run(self):
+        log.debug("QueuePoller thread started")
+        while True:
+            with self._locked:
+                while not self._locked.clusters and not self._locked.stopped:
+                    self._locked.wait()
+                if self._locked.stopped:
+                    return
+                clusters = list(self._locked.clusters)
+
+            pollTime = time.time()
+            states = self.condorJobs.queryJobs(clusters)
+            with self._locked:
+                if states is not None:
+                    # publish a new snapshot, rather than update the one readers may hold
+                    snapshot = dict((clusterId, {}) for clusterId in clusters
+                                    if clusterId in self._locked.clusters)
+                    for jobId, state in states.items():
+                        clusterId = jobId.split(".")[0]
+                        if clusterId in snapshot:
+                            snapshot[clusterId][jobId] = state
+                    self._locked.snapshot = snapshot
+                    self._locked.generation += 1
+                    self._locked.pollTime = pollTime
+                    self._locked.notifyAll()
+
+                if self._locked.clusters:
+                    interval = min(min(intervals) for intervals in self._locked.clusters.values())
+                else:
+                    interval = DEFAULT_INTERVAL
+                # a newly registered cluster wakes the poller up early
+                self._locked.wait(interval)
+                if self._locked.stopped:
+                    return
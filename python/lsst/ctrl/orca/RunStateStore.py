@@ -0,0 +1,319 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+
+import os
+import sqlite3
+import threading
+import time
+import lsst.log as log
+
+from lsst.ctrl.orca import EventBus
+from lsst.ctrl.orca.StatusListener import StatusListener
+
+# environment variable naming the run state database, and the database used without it
+STORE_ENV = "ORCA_RUN_STATE"
+DEFAULT_STORE = os.path.join("~", ".orca", "runstate.sqlite3")
+
+# least seconds between two records of the node counts of a workflow while it runs
+RECORD_INTERVAL = 30.0
+
+# states of a run and of its workflows
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    runid TEXT PRIMARY KEY,
+    configFile TEXT NOT NULL,
+    repository TEXT,
+    state TEXT NOT NULL,
+    port INTEGER,
+    pid INTEGER,
+    startTime REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS workflows (
+    runid TEXT NOT NULL,
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    launcher TEXT,
+    condorDagId TEXT,
+    stagingDir TEXT,
+    dagFile TEXT,
+    nodeStatusFile TEXT,
+    launchTime REAL,
+    idle INTEGER,
+    running INTEGER,
+    done INTEGER,
+    failed INTEGER,
+    updateTime REAL,
+    exitStatus INTEGER,
+    PRIMARY KEY (runid, name)
+);
+"""
+
+
+class RunStateStore:
+    """Keeps the state of production runs in a local SQLite database.
+
+    Parameters
+    ----------
+    fileName : `str`, optional
+        the database; defaults to $ORCA_RUN_STATE, or ~/.orca/runstate.sqlite3
+
+    Notes
+    -----
+    A run is recorded with its config file, and each of its workflows with
+    what is needed to monitor it again once it is launched: the cluster id
+    of its DAG, its staging directory and the launcher that submitted it.
+    With that, a new orca process can reattach to a run whose orca process
+    died, without staging or submitting anything.
+
+    Each call opens a connection of its own, so the store can be used from
+    any thread.  Failing to record something is logged, and never stops a
+    production.
+    """
+
+    def __init__(self, fileName=None):
+        if fileName is None:
+            fileName = os.environ.get(STORE_ENV, DEFAULT_STORE)
+
+        # the database
+        self.fileName = os.path.abspath(os.path.expanduser(fileName))
+
+        self._schemaLock = threading.Lock()
+        self._schemaCreated = False
+
+    def _connect(self):
+        with self._schemaLock:
+            if not self._schemaCreated:
+                os.makedirs(os.path.dirname(self.fileName), exist_ok=True)
+                connection = sqlite3.connect(self.fileName, timeout=30)
+                with connection:
+                    connection.executescript(_SCHEMA)
+                connection.close()
+                self._schemaCreated = True
+        connection = sqlite3.connect(self.fileName, timeout=30)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _execute(self, statements):
+        """Run statements in one transaction, logging any failure
+
+        Parameters
+        ----------
+        statements : `list` of (`str`, `tuple`)
+            SQL statements and their parameters
+
+        Returns
+        -------
+        recorded : `bool`
+            False if the database couldn't be written
+        """
+        try:
+            connection = self._connect()
+            try:
+                with connection:
+                    for sql, parameters in statements:
+                        connection.execute(sql, parameters)
+            finally:
+                connection.close()
+        except (sqlite3.Error, OSError) as error:
+            log.warn("RunStateStore: couldn't record the run state in %s: %s", self.fileName, error)
+            return False
+        return True
+
+    def recordRun(self, runid, configFile, repository, workflowNames):
+        """Record a new run, replacing whatever was recorded under its run id
+
+        Parameters
+        ----------
+        runid : `str`
+            run id
+        configFile : `str`
+            the production config file
+        repository : `str`
+            the config repository
+        workflowNames : `list` of `str`
+            names of the run's workflows, in the configured order
+        """
+        statements = [("DELETE FROM workflows WHERE runid = ?", (runid,)),
+                      ("INSERT OR REPLACE INTO runs (runid, configFile, repository, state, pid, startTime) "
+                       "VALUES (?, ?, ?, ?, ?, ?)",
+                       (runid, os.path.abspath(configFile), repository, RUNNING, os.getpid(), time.time()))]
+        for position, name in enumerate(workflowNames):
+            statements.append(("INSERT INTO workflows (runid, name, position, state) VALUES (?, ?, ?, ?)",
+                               (runid, name, position, PENDING)))
+        return self._execute(statements)
+
+    def recordService(self, runid, port):
+        """Record the port the run's service endpoint listens at, and the process serving it
+        """
+        return self._execute([("UPDATE runs SET port = ?, pid = ? WHERE runid = ?",
+                               (port, os.getpid(), runid))])
+
+    def recordRunState(self, runid, state):
+        """Record the state of a run, e.g. DONE
+        """
+        return self._execute([("UPDATE runs SET state = ? WHERE runid = ?", (state, runid))])
+
+    def recordLaunch(self, runid, name, launchState):
+        """Record the launch of a workflow
+
+        Parameters
+        ----------
+        runid : `str`
+            run id
+        name : `str`
+            name of the workflow
+        launchState : `dict`
+            what its launcher's getRunState() reports: the launcher class,
+            condorDagId, stagingDir, dagFile and nodeStatusFile
+
+        Notes
+        -----
+        A workflow may complete, and its completion be recorded, before its
+        launch is; it is left DONE then.
+        """
+        return self._execute([("UPDATE workflows SET state = CASE state WHEN ? THEN state ELSE ? END, "
+                               "launcher = ?, condorDagId = ?, "
+                               "stagingDir = ?, dagFile = ?, nodeStatusFile = ?, launchTime = ? "
+                               "WHERE runid = ? AND name = ?",
+                               (DONE, RUNNING, launchState.get("launcher"), launchState.get("condorDagId"),
+                                launchState.get("stagingDir"), launchState.get("dagFile"),
+                                launchState.get("nodeStatusFile"), time.time(), runid, name))])
+
+    def recordProgress(self, runid, name, counts, state=RUNNING, exitStatus=None):
+        """Record the last known node counts of a workflow
+
+        Parameters
+        ----------
+        runid : `str`
+            run id
+        name : `str`
+            name of the workflow
+        counts : `dict`
+            number of idle, running, done and failed nodes; None if unknown
+        state : `str`, optional
+            RUNNING, or DONE once the workflow has completed
+        exitStatus : `int`, optional
+            the workflow's exit status, once it has completed
+        """
+        counts = counts or {}
+        return self._execute([("UPDATE workflows SET state = ?, idle = ?, running = ?, done = ?, failed = ?, "
+                               "updateTime = ?, exitStatus = ? WHERE runid = ? AND name = ?",
+                               (state, counts.get("idle"), counts.get("running"), counts.get("done"),
+                                counts.get("failed"), time.time(), exitStatus, runid, name))])
+
+    def getRun(self, runid):
+        """Return what was recorded of a run
+
+        Returns
+        -------
+        run : `dict`
+            the columns of the run's row; None if the run wasn't recorded
+        """
+        with self._open() as connection:
+            row = connection.execute("SELECT * FROM runs WHERE runid = ?", (runid,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def getWorkflows(self, runid):
+        """Return what was recorded of each workflow of a run, in the configured order
+
+        Returns
+        -------
+        workflows : `list` of `dict`
+            the columns of each workflow's row
+        """
+        with self._open() as connection:
+            rows = connection.execute("SELECT * FROM workflows WHERE runid = ? ORDER BY position",
+                                      (runid,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def _open(self):
+        return _Connection(self._connect())
+
+
+class _Connection:
+    # closes a connection at the end of a with block; sqlite3's own only ends the transaction
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self.connection
+
+    def __exit__(self, excType, excValue, traceback):
+        self.connection.close()
+
+
+class RunStateRecorder(StatusListener):
+    """Records the node counts of a run's workflows in a RunStateStore as their monitors report progress.
+
+    Parameters
+    ----------
+    store : `RunStateStore`
+        the store
+    runid : `str`
+        run id
+    interval : `float`, optional
+        least seconds between two records of a running workflow's node counts
+
+    Notes
+    -----
+    Node events come by the thousand for large DAGs, so the counts of a
+    running workflow are recorded at most once per interval; they are
+    always recorded when the workflow completes.
+    """
+
+    def __init__(self, store, runid, interval=RECORD_INTERVAL):
+        StatusListener.__init__(self)
+
+        # the store
+        self.store = store
+
+        # run id
+        self.runid = runid
+
+        # least seconds between two records of a running workflow's node counts
+        self.interval = interval
+
+        # workflow name -> time its counts were last recorded
+        self._recorded = {}
+
+    def handleEvent(self, event):
+        """Record the node counts of the event's workflow, if it is time to
+        """
+        monitor = event.source
+        if monitor is None:
+            return
+        now = time.time()
+        completed = event.kind == EventBus.WORKFLOW_DONE
+        if not completed and now - self._recorded.get(event.workflow, 0) < self.interval:
+            return
+        self._recorded[event.workflow] = now
+        counts = monitor.getStatus().get("progress")
+        if completed:
+            self.store.recordProgress(self.runid, event.workflow, counts, DONE, event.returnValue)
+        else:
+            self.store.recordProgress(self.runid, event.workflow, counts)
@@ -22,12 +22,30 @@
 
 from http.server import BaseHTTPRequestHandler
 import json
+import time
+import urllib.parse
+
+from lsst.ctrl.orca.EventBus import EventBus
+from lsst.ctrl.orca.Metrics import Metrics
+from lsst.ctrl.orca.ProductionStatus import EventStream
 
 
 class ServiceHandler(BaseHTTPRequestHandler):
 
     version = "v1"
     production = "/api/%s/production" % version
+    metrics = "/api/%s/metrics" % version
+    workflows = "/api/%s/workflows" % version
+    events = "/api/%s/events" % version
+
+    # content type of the Prometheus text exposition format
+    metricsContentType = "text/plain; version=0.0.4; charset=utf-8"
+
+    # most seconds a GET with ?wait= is held waiting for the status to change
+    maxWait = 60.0
+
+    # seconds between the comments that keep an idle event stream open
+    keepAliveInterval = 15.0
 
     def setParent(self, parent, runid):
         """Set the parent object and runid of this handler
@@ -42,6 +60,136 @@ class ServiceHandler(BaseHTTPRequestHandler):
         self.parent = parent
         self.runid = runid
 
+    def do_GET(self):
+        """handle a HTTP GET request
+        """
+        url = urllib.parse.urlsplit(self.path)
+        if url.path == self.metrics:
+            # only the values cached by the monitors are rendered; nothing is queried here
+            body = Metrics.getInstance().render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", self.metricsContentType)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if url.path == self.production:
+            self.writeStatus(None, urllib.parse.parse_qs(url.query))
+            return
+        if url.path.startswith(self.workflows + "/"):
+            name = urllib.parse.unquote(url.path[len(self.workflows) + 1:])
+            self.writeStatus(name, urllib.parse.parse_qs(url.query))
+            return
+        if url.path == self.events:
+            self.writeEvents()
+            return
+        self.send_response(404)
+        self.end_headers()
+        self.writeError("Not Found", "Resource %s is unknown" % self.path)
+
+    def writeStatus(self, name, query, production=None):
+        """Respond with a cached JSON snapshot of the status of the production or of a workflow
+
+        Parameters
+        ----------
+        name : `str`
+            the workflow; the whole production if None
+        query : `dict`
+            the parsed query string
+        production : `ProductionRunManager`, optional
+            the production; this handler's parent if None
+
+        Notes
+        -----
+        The response carries the snapshot's ETag, and is 304 Not Modified
+        when it matches the request's If-None-Match.  With ?wait=<seconds>
+        and If-None-Match, the request is held until the snapshot changes
+        or the time is up, so clients can long-poll instead of polling.
+        """
+        etag = self.headers.get("If-None-Match")
+        try:
+            wait = min(float(query.get("wait", ["0"])[0]), self.maxWait)
+        except ValueError:
+            self.send_response(400)
+            self.end_headers()
+            self.writeError("Bad Request", "wait must be a number of seconds")
+            return
+
+        if production is None:
+            production = self.parent
+        status = production.getProductionStatus()
+        if etag is not None and wait > 0:
+            snapshot = status.waitForChange(etag, name, wait)
+        else:
+            snapshot = status.getSnapshot(name)
+        if snapshot is None:
+            self.send_response(404)
+            self.end_headers()
+            self.writeError("Not Found", "Workflow %s is unknown" % name)
+            return
+
+        body, newEtag = snapshot
+        if etag == newEtag:
+            self.send_response(304)
+            self.send_header("ETag", newEtag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", newEtag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def writeEvents(self, production=None):
+        """Stream the events of the workflow monitors as Server-Sent Events
+
+        Parameters
+        ----------
+        production : `ProductionRunManager`, optional
+            the production whose events are streamed; this handler's parent if None
+
+        Notes
+        -----
+        The stream ends when the production is done, or when the client
+        goes away.  A comment is sent when there has been no event for a
+        while, so that idle connections aren't closed by proxies.
+        """
+        if production is None:
+            production = self.parent
+        stream = EventStream(runid=production.getRunId())
+        bus = EventBus.getInstance()
+        bus.subscribe(stream)
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            self.wfile.flush()
+
+            eventId = 0
+            lastWrite = time.time()
+            while True:
+                event = stream.nextEvent(timeout=1.0)
+                if event is not None:
+                    eventId += 1
+                    message = "id: %d\nevent: %s\ndata: %s\n\n" % (eventId, event.kind,
+                                                                   json.dumps(event.toDict()))
+                elif production.isDone():
+                    return
+                elif time.time() - lastWrite >= self.keepAliveInterval:
+                    message = ": keep-alive\n\n"
+                else:
+                    continue
+                self.wfile.write(message.encode("utf-8"))
+                self.wfile.flush()
+                lastWrite = time.time()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            bus.unsubscribe(stream, 1.0)
+
     def do_DELETE(self):
         """handle a HTTP DELETE request
         """
@@ -66,8 +214,8 @@ class ServiceHandler(BaseHTTPRequestHandler):
                 self.writeError("Unprocessable entity", "Error in syntax of message")
             return
         self.send_response(400)
-        self.writeError("Bad Request", "Request is unsupported")
         self.end_headers()
+        self.writeError("Bad Request", "Request is unsupported")
 
     def writeError(self, status, message):
         """emit an error message as a response to remote client
@@ -81,4 +229,4 @@ class ServiceHandler(BaseHTTPRequestHandler):
         """
         err = {"status": status, "message": message}
         message = json.dumps(err)
-        self.wfile.write(message)
+        self.wfile.write(message.encode("utf-8"))
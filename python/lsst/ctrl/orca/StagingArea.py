@@ -0,0 +1,338 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsstcorp.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+import hashlib
+import json
+import os
+import stat
+import threading
+
+import lsst.log as log
+
+# name of the manifest file, in the staging directory
+MANIFEST_NAME = "staging.manifest"
+
+# size of the blocks files are hashed in
+BLOCK_SIZE = 1 << 20
+
+
+def fileDigest(fileName):
+    """Return the SHA-256 hex digest of a file's contents
+
+    Parameters
+    ----------
+    fileName : `str`
+        file to hash
+
+    Returns
+    -------
+    digest : `str`
+        hex digest of the file
+    """
+    digest = hashlib.sha256()
+    with open(fileName, "rb") as fp:
+        while True:
+            block = fp.read(BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class StagingManifest:
+    """Record of the hash of every file staged into a directory.
+
+    Parameters
+    ----------
+    fileName : `str`
+        the manifest file; it is read if it already exists
+
+    Notes
+    -----
+    The manifest is a JSON object mapping each staged file, relative to the
+    directory the manifest is in, to the SHA-256 hex digest of its contents.
+    Later stages, and anything syncing the staging directory to a remote
+    site, can compare hashes instead of file contents or modification times.
+    """
+
+    def __init__(self, fileName):
+        # the manifest file
+        self.fileName = os.path.abspath(fileName)
+
+        # directory the paths in the manifest are relative to
+        self.root = os.path.dirname(self.fileName)
+
+        # staged file -> hex digest
+        self.files = {}
+
+        self._lock = threading.Lock()
+        if os.path.exists(self.fileName):
+            with open(self.fileName, "r") as fp:
+                self.files = json.load(fp)
+
+    def key(self, fileName):
+        """Return the name a file is recorded under
+
+        Parameters
+        ----------
+        fileName : `str`
+            staged file
+
+        Returns
+        -------
+        key : `str`
+            the path relative to the manifest's directory, or the absolute path
+            of files outside of it
+        """
+        path = os.path.abspath(fileName)
+        if path.startswith(self.root + os.sep):
+            return os.path.relpath(path, self.root)
+        return path
+
+    def get(self, fileName):
+        """Return the recorded digest of a file, or None if it isn't recorded
+        """
+        with self._lock:
+            return self.files.get(self.key(fileName))
+
+    def record(self, fileName, digest):
+        """Record the digest of a staged file
+        """
+        with self._lock:
+            self.files[self.key(fileName)] = digest
+
+    def save(self):
+        """Write the manifest file, replacing the previous one atomically
+        """
+        with self._lock:
+            data = json.dumps(self.files, indent=1, sort_keys=True) + "\n"
+        tempName = _tempName(self.fileName)
+        with open(tempName, "w") as fp:
+            fp.write(data)
+        os.replace(tempName, self.fileName)
+        log.debug("StagingManifest:save: %d files recorded in %s", len(self.files), self.fileName)
+
+
+def _tempName(fileName):
+    """Name of a temporary file, next to fileName, private to this thread
+    """
+    return "%s.%d.%d.tmp" % (fileName, os.getpid(), threading.get_ident())
+
+
+class StagedFile:
+    """A file that replaces its target only if its contents changed.
+
+    Text written to a StagedFile goes to a temporary file next to the target,
+    and is hashed as it is written.  When the StagedFile is closed, the
+    temporary file is renamed over the target if the contents differ, or
+    removed if they are the same, so an unchanged target keeps its
+    modification time.  Either way, the target is never seen half written.
+
+    Parameters
+    ----------
+    fileName : `str`
+        the file to write
+    manifest : `StagingManifest`, optional
+        manifest the file's digest is checked against and recorded in
+    buffering : `int`, optional
+        buffer size of the temporary file
+
+    Notes
+    -----
+    Used as a context manager, the temporary file is removed and the target
+    left alone if the block raises.
+    """
+
+    def __init__(self, fileName, manifest=None, buffering=-1):
+        # the file to write
+        self.fileName = fileName
+
+        # manifest the file is recorded in
+        self.manifest = manifest
+
+        # whether the target was replaced; set on close()
+        self.changed = None
+
+        self._tempName = _tempName(fileName)
+        fd = os.open(self._tempName, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        self._fp = os.fdopen(fd, "wb", buffering=buffering)
+        self._digest = hashlib.sha256()
+        self._size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if excType is None:
+            self.close()
+        else:
+            self.discard()
+
+    def write(self, text):
+        """Write text to the file
+        """
+        data = text.encode()
+        self._digest.update(data)
+        self._size += len(data)
+        self._fp.write(data)
+
+    def discard(self):
+        """Remove the temporary file, leaving the target as it was
+        """
+        if not self._fp.closed:
+            self._fp.close()
+            os.unlink(self._tempName)
+
+    def close(self):
+        """Close the file, replacing the target if its contents changed
+
+        Returns
+        -------
+        changed : `bool`
+            True if the target was written, False if it was already up to date
+        """
+        if self._fp.closed:
+            return self.changed
+        self._fp.close()
+        digest = self._digest.hexdigest()
+        try:
+            self.changed = not _unchanged(self.fileName, digest, self._size, self.manifest)
+            if self.changed:
+                if os.path.exists(self.fileName):
+                    os.chmod(self._tempName, stat.S_IMODE(os.stat(self.fileName).st_mode))
+                os.replace(self._tempName, self.fileName)
+            else:
+                os.unlink(self._tempName)
+        except BaseException:
+            if os.path.exists(self._tempName):
+                os.unlink(self._tempName)
+            raise
+        if self.manifest is not None:
+            self.manifest.record(self.fileName, digest)
+        return self.changed
+
+
+def _unchanged(fileName, digest, size, manifest):
+    """Whether fileName already holds size bytes with the given digest
+    """
+    try:
+        if os.stat(fileName).st_size != size:
+            return False
+    except FileNotFoundError:
+        return False
+    if manifest is not None and manifest.get(fileName) == digest:
+        return True
+    return fileDigest(fileName) == digest
+
+
+def writeIfChanged(fileName, text, manifest=None):
+    """Write text to a file, unless the file already holds exactly that text
+
+    Parameters
+    ----------
+    fileName : `str`
+        the file to write
+    text : `str`
+        the contents of the file
+    manifest : `StagingManifest`, optional
+        manifest the file's digest is checked against and recorded in
+
+    Returns
+    -------
+    changed : `bool`
+        True if the file was written, False if it was already up to date
+    """
+    with StagedFile(fileName, manifest) as fp:
+        fp.write(text)
+    return fp.changed
+
+
+class StagingArea:
+    """The local directory a workflow's files are staged into before submission.
+
+    Parameters
+    ----------
+    root : `str`
+        the local staging directory
+    """
+
+    def __init__(self, root):
+        # the local staging directory
+        self.root = os.path.abspath(root)
+
+        # hashes of the files staged so far
+        self.manifest = StagingManifest(self.path(MANIFEST_NAME))
+
+    def path(self, *names):
+        """Return the absolute path of a file or directory in the staging area
+
+        Parameters
+        ----------
+        names : `str`
+            path components, relative to the staging directory
+
+        Returns
+        -------
+        path : `str`
+            the absolute path
+        """
+        return os.path.join(self.root, *names)
+
+    def makeDirs(self, parent, names):
+        """Create a set of sibling directories in one sweep
+
+        Parameters
+        ----------
+        parent : `str`
+            directory, relative to the staging directory, to create the directories in;
+            it is created if it doesn't exist yet
+        names : iterable of `str`
+            names of the directories to create in parent
+
+        Returns
+        -------
+        created : `int`
+            the number of directories created; directories that already exist are skipped
+
+        Notes
+        -----
+        The parent directory is listed once, and only the missing directories
+        are created, so re-staging a run with many directories doesn't cost
+        a failed mkdir per existing directory.
+        """
+        parentDir = self.path(parent)
+        os.makedirs(parentDir, exist_ok=True)
+        with os.scandir(parentDir) as entries:
+            existing = {entry.name for entry in entries if entry.is_dir()}
+
+        created = 0
+        for name in names:
+            if name in existing:
+                continue
+            try:
+                os.mkdir(os.path.join(parentDir, name))
+            except FileExistsError:
+                continue
+            existing.add(name)
+            created += 1
+        log.debug("StagingArea:makeDirs: created %d directories in %s", created, parentDir)
+        return created
@@ -21,16 +21,48 @@
 #
 
 import lsst.log as log
+from lsst.ctrl.orca import EventBus
 
 
 class StatusListener:
     """Used receive messages about changes in a workflow
+
+    Notes
+    -----
+    A listener added to a workflow monitor is called from a thread of its
+    own, with the events the monitor publishes on the EventBus.
     """
 
     # initializer
     def __init__(self):
         log.debug("StatusListener:__init__")
 
+    def handleEvent(self, event):
+        """Called with each event published by the monitors this listener was added to
+
+        Parameters
+        ----------
+        event : `StatusEvent`
+            the event
+
+        Notes
+        -----
+        This calls the method for the kind of event; a listener can override
+        it to handle every event itself.
+        """
+        if event.kind == EventBus.WORKFLOW_STARTED:
+            self.workflowStarted(event.workflow)
+        elif event.kind == EventBus.NODE_STARTED:
+            self.nodeStarted(event.workflow, event.node, event.jobId)
+        elif event.kind == EventBus.NODE_FINISHED:
+            self.nodeFinished(event.workflow, event.node, event.jobId, event.returnValue)
+        elif event.kind == EventBus.NODE_HELD:
+            self.nodeHeld(event.workflow, event.node, event.jobId)
+        elif event.kind == EventBus.WORKFLOW_FAILED:
+            self.workflowFailed(event.workflow, "DagFailed", event.message, None, None)
+        elif event.kind == EventBus.WORKFLOW_DONE:
+            self.workflowShutdown(event.workflow)
+
     def workflowFailed(self, name, errorName, errmsg, response, pipelineName):
         """Indicate that a workflow has experienced an as-yet unhandled
         failure and can't process further
@@ -85,3 +117,47 @@ class StatusListener:
             name of the workflow
         """
         return
+
+    def nodeStarted(self, name, node, jobId):
+        """Called when a node of a workflow starts running
+
+        Parameters
+        ----------
+        name : `str`
+            name of the workflow
+        node : `str`
+            name of the DAG node
+        jobId : `str`
+            condor job id of the node, if known
+        """
+        return
+
+    def nodeFinished(self, name, node, jobId, returnValue):
+        """Called when a node of a workflow finishes, successfully or not
+
+        Parameters
+        ----------
+        name : `str`
+            name of the workflow
+        node : `str`
+            name of the DAG node
+        jobId : `str`
+            condor job id of the node, if known
+        returnValue : `int`
+            the node's exit code; None if it didn't exit normally, or isn't known
+        """
+        return
+
+    def nodeHeld(self, name, node, jobId):
+        """Called when the job of a node of a workflow is held
+
+        Parameters
+        ----------
+        name : `str`
+            name of the workflow
+        node : `str`
+            name of the DAG node
+        jobId : `str`
+            condor job id of the node
+        """
+        return
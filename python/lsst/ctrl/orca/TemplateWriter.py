@@ -20,7 +20,119 @@
 # see <http://www.lsstcorp.org/LegalNotices/>.
 #
 
+import os
+import re
 import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from lsst.ctrl.orca.StagingArea import writeIfChanged
+
+# host name substituted for $ORCA_LOCAL_HOSTNAME; it doesn't change while we run
+_LOCAL_HOSTNAME = socket.gethostname()
+
+# a "$" followed by the longest run of characters a key can be made of
+_PLACEHOLDER = re.compile(r"\$(\w+)")
+
+# compiled templates, keyed by path, with the (mtime, size) they were read at
+_cache = {}
+_cacheLock = threading.Lock()
+
+# most threads render_many() writes files with
+MAX_WRITERS = 4
+
+
+class CompiledTemplate:
+    """A template split once into literal text and "$NAME" placeholders.
+
+    Parameters
+    ----------
+    text : `str`
+        the template text
+
+    Notes
+    -----
+    A placeholder is replaced by the value of the longest key that is a
+    prefix of the name following the "$", so "$ORCA_RUNID" is never
+    clobbered by a shorter "$ORCA_RUN" key, and text after the key, as in
+    "$NAMEsuffix", is kept as it was.  Placeholders without a matching key
+    are left untouched.
+    """
+
+    def __init__(self, text):
+        # literal text with the placeholders in between; placeholders are
+        # filled in by render()
+        self.parts = []
+
+        # (index in parts, name) of each placeholder
+        self.slots = []
+
+        last = 0
+        for match in _PLACEHOLDER.finditer(text):
+            self.parts.append(text[last:match.start()])
+            self.slots.append((len(self.parts), match.group(1)))
+            self.parts.append(match.group(0))
+            last = match.end()
+        self.parts.append(text[last:])
+
+    @staticmethod
+    def load(inputFile):
+        """Return the compiled template for a file, reusing a cached copy
+        as long as the file's modification time and size are unchanged
+
+        Parameters
+        ----------
+        inputFile : `str`
+            template input file
+
+        Returns
+        -------
+        template : `CompiledTemplate`
+            the compiled template
+        """
+        path = os.path.abspath(inputFile)
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        with _cacheLock:
+            entry = _cache.get(path)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+
+        with open(path, 'r') as fp:
+            template = CompiledTemplate(fp.read())
+        with _cacheLock:
+            _cache[path] = (stamp, template)
+        return template
+
+    def render(self, values):
+        """Substitute values into the template
+
+        Parameters
+        ----------
+        values : `dict`
+            dictionary containing key/value pairs
+
+        Returns
+        -------
+        text : `str`
+            the template text with the placeholders replaced
+        """
+        parts = list(self.parts)
+        resolved = {}
+        for index, name in self.slots:
+            text = resolved.get(name)
+            if text is None:
+                text = resolved[name] = self._resolve(name, values)
+            parts[index] = text
+        return "".join(parts)
+
+    @staticmethod
+    def _resolve(name, values):
+        for end in range(len(name), 0, -1):
+            key = name[:end]
+            if key in values:
+                return str(values[key]) + name[end:]
+        return "$" + name
 
 ##
 # This class takes template files and substitutes the values for the given
@@ -31,12 +143,25 @@ import socket
 class TemplateWriter:
     """Takes templates and subtitutes the values for the given keys,
        writing a new file generated from the template.
+
+    Parameters
+    ----------
+    manifest : `StagingManifest`, optional
+        staging manifest the files written are recorded in
+
+    Notes
+    -----
+    A file is only replaced if its rendered contents changed, so re-staging
+    a run leaves the files that are already up to date untouched.
     """
 
-    def __init__(self):
+    def __init__(self, manifest=None):
         # local values that are always set
         self.orcaValues = dict()
-        self.orcaValues["ORCA_LOCAL_HOSTNAME"] = socket.gethostname()
+        self.orcaValues["ORCA_LOCAL_HOSTNAME"] = _LOCAL_HOSTNAME
+
+        # staging manifest the files written are recorded in
+        self.manifest = manifest
         return
 
     def rewrite(self, inputFile, outputFile, pairs):
@@ -49,27 +174,52 @@ class TemplateWriter:
         outputFile : `str`
             resulting output file
         pairs : `dict`
-            dictionary containing key/value pairs
+            dictionary containing key/value pairs; the "standard" orca
+            values take precedence over these
+        """
+        self._write(CompiledTemplate.load(inputFile), outputFile, pairs)
+
+    def render_many(self, jobs, workers=MAX_WRITERS):
+        """Write a batch of files from templates
+
+        Parameters
+        ----------
+        jobs : `list` of (`str`, `str`, `dict`)
+            (template input file, resulting output file, key/value pairs) of
+            each file to write
+        workers : `int`, optional
+            most threads to write the files with
+
+        Returns
+        -------
+        outputFiles : `list` of `str`
+            the files written, in the order of jobs
+
+        Notes
+        -----
+        Each distinct template is compiled once for the whole batch, and the
+        files are rendered and written on a small thread pool.  The first
+        error raised while writing a file is raised again here, once all the
+        writes have finished.
         """
-        fpInput = open(inputFile, 'r')
-        fpOutput = open(outputFile, 'w')
-
-        while True:
-            line = fpInput.readline()
-            if len(line) == 0:
-                break
-
-            # replace the "standard" orca names first
-            for name in self.orcaValues:
-                key = "$"+name
-                val = str(self.orcaValues[name])
-                line = line.replace(key, val)
-
-            # replace the user defined names
-            for name in pairs:
-                key = "$"+name
-                val = str(pairs[name])
-                line = line.replace(key, val)
-            fpOutput.write(line)
-        fpInput.close()
-        fpOutput.close()
+        jobs = list(jobs)
+        templates = {}
+        for inputFile, outputFile, pairs in jobs:
+            if inputFile not in templates:
+                templates[inputFile] = CompiledTemplate.load(inputFile)
+
+        if len(jobs) <= 1 or workers <= 1:
+            for inputFile, outputFile, pairs in jobs:
+                self._write(templates[inputFile], outputFile, pairs)
+        else:
+            with ThreadPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+                futures = [pool.submit(self._write, templates[inputFile], outputFile, pairs)
+                           for inputFile, outputFile, pairs in jobs]
+            for future in futures:
+                future.result()
+        return [outputFile for inputFile, outputFile, pairs in jobs]
+
+    def _write(self, template, outputFile, pairs):
+        values = dict(pairs)
+        values.update(self.orcaValues)
+        return writeIfChanged(outputFile, template.render(values), self.manifest)
@@ -20,6 +20,7 @@
 # see <http://www.lsstcorp.org/LegalNotices/>.
 #
 
+import asyncio
 import lsst.log as log
 from lsst.ctrl.orca.WorkflowMonitor import WorkflowMonitor
 
@@ -67,3 +68,36 @@ class WorkflowLauncher:
 
         # returns WorkflowMonitor
         return self.workflowMonitor
+
+    ##
+    # @brief launch this workflow from asyncio code
+    #
+    # This runs launch() on the event loop's default executor, so other
+    # workflows can be launched meanwhile; launchers never change the
+    # working directory, so their launch() can run in any thread.
+    #
+    async def launchAsync(self, statusListener):
+        log.debug("WorkflowLauncher:launchAsync")
+        return await asyncio.get_event_loop().run_in_executor(None, self.launch, statusListener)
+
+    ##
+    # @brief report what a new process needs to monitor the launched workflow again
+    #
+    # @return a dict with the launcher's module, the condorDagId of the
+    #         workflow and where it was staged, or None if the workflow can't
+    #         be reattached to
+    #
+    def getRunState(self):
+        return None
+
+    ##
+    # @brief monitor a workflow launched by another process
+    #
+    # @param condorDagId     job id of the workflow, as recorded by getRunState()
+    # @param statusListener  status listener object
+    # @return the workflow's monitor, or None if this launcher can't reattach
+    #         to a workflow
+    #
+    def reattach(self, condorDagId, statusListener):
+        log.debug("WorkflowLauncher:reattach")
+        return None
@@ -51,7 +51,8 @@ class WorkflowManager:
 
         # _locked: a container for data to be shared across threads that
         # have access to this object.
-        self._locked = SharedData.SharedData(False)
+        # launching: whether runWorkflowAsync() is submitting the workflow
+        self._locked = SharedData.SharedData(False, {"launching": False})
 
         #  workflow name
         self.name = "unnamed"
@@ -112,6 +113,108 @@ class WorkflowManager:
             self._locked.release()
         return self._monitor
 
+    async def runWorkflowAsync(self, statusListener):
+        """Setup and launch a workflow from asyncio code
+
+        Parameters
+        ----------
+        statusListener : `StatusListener`
+            status listener for the workflow's monitor
+
+        Returns
+        -------
+        monitor : `WorkflowMonitor`
+            the workflow's monitor, or False if the workflow can't be run
+
+        Notes
+        -----
+        This is runWorkflow(), with the workflow submitted by the launcher's
+        launchAsync(), so that many workflows can be submitted concurrently.
+        The lock is only held to check and record the state of the workflow,
+        never while the submission is awaited.
+        """
+        log.debug("WorkflowManager:runWorkflowAsync")
+
+        try:
+            self._locked.acquire()
+
+            if not self.isRunnable() or self._locked.launching:
+                if self.isRunning() or self._locked.launching:
+                    log.info("Workflow %s is already running" % self.runid)
+                if self.isDone():
+                    log.info("Workflow %s has already run; start with new runid" % self.runid)
+                return False
+            self._locked.launching = True
+
+            if self._workflowConfigurator is None:
+                self._workflowLauncher = self.configure()
+            launcher = self._workflowLauncher
+        finally:
+            self._locked.release()
+
+        monitor = None
+        try:
+            monitor = await launcher.launchAsync(statusListener)
+        finally:
+            with self._locked:
+                self._monitor = monitor
+                self._locked.launching = False
+
+        self.cleanUp()
+        return monitor
+
+    def reattach(self, runState, statusListener):
+        """Monitor this workflow, launched by another process, again
+
+        Parameters
+        ----------
+        runState : `dict`
+            what the workflow's launcher reported with getRunState() when it
+            launched the workflow
+        statusListener : `StatusListener`
+            status listener for the workflow's monitor
+
+        Returns
+        -------
+        monitor : `WorkflowMonitor`
+            the workflow's monitor, or None if its launcher can't reattach to it
+
+        Notes
+        -----
+        Nothing is configured, staged or submitted: the launcher is created
+        from the recorded state, and only starts a monitor.
+        """
+        log.debug("WorkflowManager:reattach")
+
+        try:
+            self._locked.acquire()
+
+            launcherClass = NamedClassFactory().createClass(runState["launcher"])
+            self._workflowLauncher = launcherClass.fromRunState(self.prodConfig, self.wfConfig, self.runid,
+                                                                self.name, runState)
+            self._monitor = self._workflowLauncher.reattach(runState["condorDagId"], statusListener)
+        finally:
+            self._locked.release()
+        return self._monitor
+
+    def getRunState(self):
+        """Report what a new process needs to monitor this workflow again
+
+        Returns
+        -------
+        runState : `dict`
+            what the workflow's launcher reports; None if the workflow wasn't
+            launched, or can't be reattached to
+        """
+        if not self._monitor:
+            return None
+        return self._workflowLauncher.getRunState()
+
+    def getMonitor(self):
+        """Accessor to the workflow's monitor, once it has been launched
+        """
+        return self._monitor
+
     def stopWorkflow(self, urgency):
         """Stop the workflow
 
@@ -263,6 +366,26 @@ class WorkflowManager:
         if not issueExc and myProblems.hasProblems():
             raise myProblems
 
+    def getStatus(self, nodes=False):
+        """Report the status of the workflow
+
+        Parameters
+        ----------
+        nodes : `bool`, optional
+            include the state of each node, if the monitor knows it
+
+        Returns
+        -------
+        status : `dict`
+            the workflow's name and whether it is running or done, with what
+            its monitor reports once it has been launched
+        """
+        status = {"name": self.name, "running": False, "done": False}
+        if self._monitor:
+            status.update(self._monitor.getStatus(nodes))
+            status["name"] = self.name
+        return status
+
     def getWorkflowName(self):
         """Accessor to workflow name
 
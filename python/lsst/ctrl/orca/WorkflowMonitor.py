@@ -20,8 +20,10 @@
 # see <http://www.lsstcorp.org/LegalNotices/>.
 #
 
+import time
 import lsst.log as log
 from lsst.ctrl.orca.multithreading import SharedData
+from lsst.ctrl.orca import EventBus
 
 
 class WorkflowMonitor:
@@ -36,6 +38,15 @@ class WorkflowMonitor:
         log.debug("WorkflowMonitor:__init__")
         self._statusListeners = []
 
+        # name of the workflow, used in the events this monitor publishes
+        self.name = None
+
+        # run id of the production the workflow belongs to, used in the events this monitor publishes
+        self.runid = None
+
+        # the workflow's exit status, once it has completed, if known
+        self.exitStatus = None
+
     def addStatusListener(self, statusListener):
         """Add a status listener to this monitor
 
@@ -46,6 +57,25 @@ class WorkflowMonitor:
         """
         log.debug("WorkflowMonitor:addStatusListener")
         self._statusListeners.append(statusListener)
+        EventBus.EventBus.getInstance().subscribe(statusListener, self)
+
+    def getName(self):
+        """Accessor to the name of the workflow, as given in its events
+        """
+        return self.name if self.name is not None else "unnamed"
+
+    def publishEvent(self, kind, **kwargs):
+        """Publish an event of this workflow to its status listeners, without blocking
+
+        Parameters
+        ----------
+        kind : `str`
+            one of EventBus.EVENT_KINDS
+        **kwargs
+            the other arguments of StatusEvent
+        """
+        event = EventBus.StatusEvent(kind, self.getName(), self, runid=self.runid, **kwargs)
+        EventBus.EventBus.getInstance().publish(event)
 
     def handleRequest(self, request):
         """Act on a request
@@ -83,6 +113,70 @@ class WorkflowMonitor:
         log.debug("WorkflowMonitor:isDone")
         return self._locked.done
 
+    def handleCompletion(self, exitStatus=None):
+        """Record that the workflow has completed, waking up everything waiting for it
+
+        Parameters
+        ----------
+        exitStatus : `int`, optional
+            the workflow's exit status, if known; the workflow failed if it isn't 0
+        """
+        log.debug("WorkflowMonitor:handleCompletion")
+        self.exitStatus = exitStatus
+        if exitStatus:
+            self.publishEvent(EventBus.WORKFLOW_FAILED, returnValue=exitStatus,
+                              message="workflow exited with status %d" % exitStatus)
+        self.publishEvent(EventBus.WORKFLOW_DONE, returnValue=exitStatus)
+        with self._locked:
+            self._locked.running = False
+            self._locked.done = True
+            self._locked.notifyAll()
+
+        # this monitor publishes nothing more, so its listeners' channels can go
+        EventBus.EventBus.getInstance().unsubscribeSource(self, EventBus.RELEASE_TIMEOUT)
+        self._statusListeners = []
+
+    def wait(self, timeout=None):
+        """Wait for the workflow to complete
+
+        Parameters
+        ----------
+        timeout : `float`, optional
+            most seconds to wait; forever if None
+
+        Returns
+        -------
+        done : `bool`
+            True if the workflow has completed
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._locked:
+            while not self._locked.done:
+                if deadline is None:
+                    self._locked.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self._locked.wait(remaining)
+            return self._locked.done
+
+    def getStatus(self, nodes=False):
+        """Report the status of the workflow, from what the monitor already knows
+
+        Parameters
+        ----------
+        nodes : `bool`, optional
+            include the state of each node, if the monitor knows it
+
+        Returns
+        -------
+        status : `dict`
+            the workflow's name, whether it is running or done, and its exit status
+        """
+        return {"name": self.getName(), "running": self.isRunning(), "done": self._locked.done,
+                "exitStatus": self.exitStatus}
+
     def stopWorkflow(self, urgency):
         """Stop the workflow
 
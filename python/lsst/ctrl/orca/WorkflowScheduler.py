@@ -0,0 +1,326 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+
+import asyncio
+import threading
+import time
+import lsst.log as log
+
+from lsst.ctrl.orca.exceptions import MultiIssueConfigurationError
+from lsst.ctrl.orca.multithreading import SharedData
+
+# states of a workflow in the schedule
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+UNKNOWN = "unknown"
+
+
+def checkDependencies(names, dependencies):
+    """Check that the dependencies between workflows can be scheduled
+
+    Parameters
+    ----------
+    names : `list` of `str`
+        names of the workflows
+    dependencies : `dict`
+        workflow name -> names of the workflows that must finish before it starts
+
+    Raises
+    ------
+    `MultiIssueConfigurationError`
+        if a workflow depends on one that doesn't exist, or the dependencies form a cycle
+    """
+    problems = MultiIssueConfigurationError("problems encountered in the workflow dependencies")
+    known = set(names)
+    for name in names:
+        for upstream in dependencies.get(name, ()):
+            if upstream not in known:
+                problems.addProblem("workflow %s depends on unknown workflow %s" % (name, upstream))
+            elif upstream == name:
+                problems.addProblem("workflow %s depends on itself" % name)
+
+    # depth first search, reporting each cycle found by the path that closes it
+    visiting, visited = [], set()
+
+    def visit(name):
+        visiting.append(name)
+        for upstream in dependencies.get(name, ()):
+            if upstream not in known or upstream == name:
+                continue
+            if upstream in visiting:
+                cycle = visiting[visiting.index(upstream):] + [upstream]
+                problems.addProblem("workflow dependency cycle: %s" % " -> ".join(cycle))
+            elif upstream not in visited:
+                visit(upstream)
+        visiting.pop()
+        visited.add(name)
+
+    for name in names:
+        if name not in visited:
+            visit(name)
+    if problems.hasProblems():
+        raise problems
+
+
+class WorkflowScheduler:
+    """Launches the workflows of a production as soon as their dependencies allow.
+
+    Parameters
+    ----------
+    managers : `list` of `WorkflowManager`
+        the workflows, in the configured order
+    dependencies : `dict`, optional
+        workflow name -> names of the workflows that must finish before it starts
+    onLaunch : callable, optional
+        called with the monitor of each workflow as it is launched
+    statusListener : `StatusListener`, optional
+        listener added to the monitor of each workflow before it starts, so
+        that it hears every event of even a workflow that completes at once
+
+    Notes
+    -----
+    The schedule runs on an asyncio event loop in a thread of its own.  The
+    workflows that depend on no other are launched at once; each of the
+    others is launched the moment the monitors of all of its upstream
+    workflows report them done.  A workflow whose upstream workflow failed,
+    or couldn't be launched, is skipped, and so are its own dependents.  A
+    workflow that completed without a known exit status, as when the queue
+    is polled without a node status file, is UNKNOWN, and its dependents
+    are skipped too, since it may have failed or been removed.
+    The dependencies are assumed to have passed checkDependencies().
+    """
+
+    def __init__(self, managers, dependencies=None, onLaunch=None, statusListener=None):
+        # the workflows, in the configured order
+        self.managers = list(managers)
+
+        # workflow name -> names of its upstream workflows
+        self.dependencies = dependencies if dependencies is not None else {}
+
+        # called with the monitor of each workflow as it is launched
+        self.onLaunch = onLaunch
+
+        # listener added to the monitor of each workflow
+        self.statusListener = statusListener
+
+        # states: workflow name -> PENDING, RUNNING, DONE, FAILED, UNKNOWN or SKIPPED
+        # monitors: workflow name -> monitor, for the workflows launched
+        # errors: exceptions raised while launching workflows
+        # initialLaunch: whether the workflows without dependencies have been launched
+        # finished: whether every workflow has completed or been skipped
+        # stopped: whether no more workflows may be launched
+        self._locked = SharedData.SharedData(False, {"states": {mgr.getName(): PENDING
+                                                                for mgr in self.managers},
+                                                     "monitors": {}, "errors": [], "initialLaunch": False,
+                                                     "finished": False, "stopped": False})
+        self._thread = None
+
+    def start(self):
+        """Start the schedule in a thread of its own
+        """
+        self._thread = threading.Thread(target=asyncio.run, args=(self.run(),), name="WorkflowScheduler",
+                                        daemon=True)
+        self._thread.start()
+
+    async def run(self):
+        """Launch every workflow once its upstream workflows are done
+        """
+        tasks = []
+        try:
+            while True:
+                ready = self._takeReady()
+                launched = [asyncio.Event() for mgr in ready]
+                tasks += [asyncio.ensure_future(self._runWorkflow(mgr, event))
+                          for mgr, event in zip(ready, launched)]
+                if not self._locked.initialLaunch:
+                    # let runProduction() know the first workflows are submitted
+                    for event in launched:
+                        await event.wait()
+                    with self._locked:
+                        self._locked.initialLaunch = True
+                        self._locked.notifyAll()
+
+                if not tasks:
+                    return
+                finished, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                tasks = list(pending)
+        finally:
+            with self._locked:
+                self._locked.initialLaunch = True
+                self._locked.finished = True
+                self._locked.notifyAll()
+
+    def _takeReady(self):
+        """Mark the workflows whose upstream workflows are all done as running, and return them
+
+        Returns
+        -------
+        ready : `list` of `WorkflowManager`
+            the workflows to launch now; those that can never run are marked SKIPPED
+        """
+        ready = []
+        with self._locked:
+            states = self._locked.states
+            for mgr in self.managers:
+                name = mgr.getName()
+                if states[name] != PENDING:
+                    continue
+                upstreamStates = [states[upstream] for upstream in self.dependencies.get(name, ())]
+                blocked = any(state in (FAILED, UNKNOWN, SKIPPED) for state in upstreamStates)
+                if self._locked.stopped or blocked:
+                    log.warn("WorkflowScheduler: skipping workflow %s", name)
+                    states[name] = SKIPPED
+                elif all(state == DONE for state in upstreamStates):
+                    states[name] = RUNNING
+                    ready.append(mgr)
+        return ready
+
+    async def _runWorkflow(self, mgr, launched):
+        """Launch one workflow, and wait for it to complete
+
+        Parameters
+        ----------
+        mgr : `WorkflowManager`
+            the workflow
+        launched : `asyncio.Event`
+            set once the workflow has been submitted, or has failed to be
+        """
+        name = mgr.getName()
+        try:
+            # the production follows the monitors' other events through the EventBus
+            monitor = await mgr.runWorkflowAsync(self.statusListener)
+        except Exception as error:
+            log.warn("workflow %s failed to launch: %s", name, error)
+            monitor = None
+            with self._locked:
+                self._locked.errors.append(error)
+        if not monitor:
+            self._setState(name, FAILED)
+            launched.set()
+            return
+        with self._locked:
+            self._locked.monitors[name] = monitor
+        if self.onLaunch is not None:
+            self.onLaunch(monitor)
+        launched.set()
+
+        # wait for the monitor in a thread, so that the event loop isn't blocked
+        loop = asyncio.get_event_loop()
+        completed = loop.create_future()
+
+        def waitForMonitor():
+            monitor.wait()
+            loop.call_soon_threadsafe(completed.set_result, None)
+        threading.Thread(target=waitForMonitor, name="WorkflowScheduler", daemon=True).start()
+        await completed
+        if monitor.exitStatus is None:
+            log.warn("WorkflowScheduler: workflow %s completed with an unknown exit status; "
+                     "the workflows depending on it won't be launched", name)
+            self._setState(name, UNKNOWN)
+        else:
+            self._setState(name, FAILED if monitor.exitStatus else DONE)
+
+    def _setState(self, name, state):
+        with self._locked:
+            self._locked.states[name] = state
+            self._locked.notifyAll()
+        log.debug("WorkflowScheduler: workflow %s %s", name, state)
+
+    def waitForInitialLaunch(self, timeout=None):
+        """Wait for the workflows that depend on no other to be launched
+
+        Parameters
+        ----------
+        timeout : `float`, optional
+            most seconds to wait; forever if None
+
+        Returns
+        -------
+        errors : `list` of `Exception`
+            the errors raised while launching workflows so far
+        """
+        self._waitFor("initialLaunch", timeout)
+        with self._locked:
+            return list(self._locked.errors)
+
+    def wait(self, timeout=None):
+        """Wait for every workflow to complete or be skipped
+
+        Parameters
+        ----------
+        timeout : `float`, optional
+            most seconds to wait; forever if None
+
+        Returns
+        -------
+        finished : `bool`
+            True if the schedule has finished
+        """
+        return self._waitFor("finished", timeout)
+
+    def _waitFor(self, flag, timeout):
+        deadline = None if timeout is None else time.time() + timeout
+        with self._locked:
+            while not getattr(self._locked, flag):
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._locked.wait(remaining)
+            return getattr(self._locked, flag)
+
+    def isFinished(self):
+        """Report whether every workflow has completed or been skipped
+        """
+        return self._locked.finished
+
+    def stop(self):
+        """Launch no more workflows; those not launched yet are skipped
+        """
+        with self._locked:
+            self._locked.stopped = True
+
+    def getState(self, name):
+        """Return the state of a workflow in the schedule
+
+        Parameters
+        ----------
+        name : `str`
+            name of the workflow
+
+        Returns
+        -------
+        state : `str`
+            PENDING, RUNNING, DONE, FAILED, UNKNOWN or SKIPPED; None for an unknown workflow
+        """
+        with self._locked:
+            return self._locked.states.get(name)
+
+    def getMonitors(self):
+        """Return the monitors of the workflows launched so far, in the configured order
+        """
+        with self._locked:
+            return [self._locked.monitors[mgr.getName()] for mgr in self.managers
+                    if mgr.getName() in self._locked.monitors]
@@ -6,3 +6,18 @@ import lsst.pex.config as pexConfig
 class MonitorConfig(pexConfig.Config):
     # number of seconds to wait between status checks
     statusCheckInterval = pexConfig.Field("interval to wait for condor_q status checks", int, default=5)
+    # how the end of a workflow is detected
+    backend = pexConfig.ChoiceField("how workflows are monitored", str,
+                                    allowed={"condor_q": "poll the schedd queue every statusCheckInterval; "
+                                                         "the orca_node_submit_to_run_seconds and "
+                                                         "orca_node_runtime_seconds metrics stay empty",
+                                             "eventlog": "follow the DAG's nodes.log and dagman.out files, "
+                                                         "timing each node's job from its events"},
+                                    default="condor_q")
+    # how jobs are submitted, queried and removed
+    jobBackend = pexConfig.ChoiceField("how orca talks to the HTCondor schedd", str,
+                                       allowed={"cli": "run condor_submit, condor_q and condor_rm",
+                                                "htcondor": "use the htcondor Python bindings, falling back "
+                                                            "to cli if they aren't installed",
+                                                "fake": "run the jobs locally with the fakecondor simulator"},
+                                       default="cli")
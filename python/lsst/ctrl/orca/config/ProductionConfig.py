@@ -29,6 +29,9 @@ class Production(pexConfig.Config):
     # production configuration class
     configuration = pexConfig.ConfigField("production level config", ProductionLevelConfig)
 
+    # number of workflows configured at once
+    configurationWorkers = pexConfig.Field("number of workflows configured at once", int, default=1)
+
 # production configuration
 
 
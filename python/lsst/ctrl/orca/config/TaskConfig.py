@@ -32,12 +32,34 @@ class ScriptConfig(pexConfig.Config):
 class DagGeneratorConfig(pexConfig.Config):
     # DAG name
     dagName = pexConfig.Field("dag name", str)
-    # script name
-    script = pexConfig.Field("script", str)
+    # external generator script; if None, the DAG is built in-process by lsst.ctrl.orca.dag.DagBuilder
+    script = pexConfig.Field("external DAG generator script", str, default=None, optional=True)
     # input file
     inputFile = pexConfig.Field("input", str)
     # number of ids per job given to execute
-    idsPerJob = pexConfig.Field("the number of ids that will be handled per job", int)
+    idsPerJob = pexConfig.Field("the number of ids that will be handled per job", int, default=1)
+    # split the worker nodes into SPLICE or SUBDAG EXTERNAL files; None writes a single flat DAG
+    subDagType = pexConfig.ChoiceField("kind of sub-DAG to split the worker nodes into", str,
+                                       allowed={"SPLICE": "DAG splices",
+                                                "SUBDAG": "external sub-DAGs, each run by its own DAGMan"},
+                                       default=None, optional=True)
+    # number of worker nodes in each sub-DAG
+    nodesPerSubDag = pexConfig.Field("maximum number of worker nodes per sub-DAG; 0 for no limit", int,
+                                     default=1000)
+    # start a new sub-DAG every time the visit changes
+    subDagByVisit = pexConfig.Field("start a new sub-DAG for every visit", bool, default=False)
+    # throttle on the worker jobs of each sub-DAG
+    maxJobsPerSubDag = pexConfig.Field("maximum number of worker jobs submitted at once by each sub-DAG; "
+                                       "0 for no limit", int, default=0)
+    # number of ids per log directory
+    logBucketSize = pexConfig.Field("number of ids whose worker logs share a logs/<bucket> directory", int,
+                                    default=100)
+    # how often DAGMan updates the <dagName>.status node status file
+    nodeStatusUpdate = pexConfig.Field("minimum seconds between updates of the DAG's node status file; "
+                                       "0 to not write one", int, default=60)
+    # add the NODE_STATUS_FILE line to the DAG an external generator script writes
+    scriptNodeStatusFile = pexConfig.Field("add a NODE_STATUS_FILE line to the DAG written by an external "
+                                           "generator script, if it has none", bool, default=False)
 
 
 class SitesConfig(pexConfig.Config):
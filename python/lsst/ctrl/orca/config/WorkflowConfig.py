@@ -39,3 +39,7 @@ class WorkflowConfig(pexConfig.Config):
 
     # monitor configuration
     monitor = pexConfig.ConfigField("monitor configuration", mon.MonitorConfig)
+
+    # workflows of the production that must finish before this one starts
+    dependsOn = pexConfig.ListField("names of the workflows that must finish before this one starts", str,
+                                    default=[])
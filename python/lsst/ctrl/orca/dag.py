@@ -0,0 +1,473 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+import os
+import shutil
+import tempfile
+import time
+
+import lsst.log as log
+
+from lsst.ctrl.orca.StagingArea import StagedFile
+
+# size of the buffers used for reading the input and writing the DAG files
+BLOCK_SIZE = 1 << 20
+
+# number of input ids whose DAG lines are gathered before being written out
+LINES_PER_CHUNK = 10000
+
+# separator placed between the ids handed to a single worker job
+ID_SEPARATOR = ";"
+
+# node category given to worker nodes in sub-DAGs, used to throttle them
+WORKER_CATEGORY = "worker"
+
+# DAG file keywords for each kind of sub-DAG
+SUBDAG_TYPES = {"SPLICE": "SPLICE", "SUBDAG": "SUBDAG EXTERNAL"}
+
+# characters of an extended id that are rewritten for use in file names
+_MANGLE_TABLE = str.maketrans(" =,", ":-_")
+
+
+def mangleId(myData):
+    """Derive the file-name-safe form of an input id and the visit it belongs to.
+
+    Parameters
+    ----------
+    myData : `str`
+        one line of the input id list
+
+    Returns
+    -------
+    newData, visit : `str`, `str`
+        the mangled id and its visit
+
+    Notes
+    -----
+    Searching for a space detects extended input like
+    ``visit=887136081 raft=2,2 sensor=0,1``, which becomes
+    ``visit-887136081:raft-2_2:sensor-0_1`` with a visit of ``887136081``.
+    No space is something simple like a skytile id, which is used as is.
+    """
+    if " " in myData:
+        return myData.translate(_MANGLE_TABLE), myData.split(" ", 1)[0].partition("=")[2]
+    return myData, myData
+
+
+class DagBuildResult:
+    """Summary of a DAG written by DagBuilder.
+
+    Parameters
+    ----------
+    dagFile : `str`
+        path of the top level DAG file
+    """
+
+    def __init__(self, dagFile):
+        # path of the top level DAG file
+        self.dagFile = dagFile
+
+        # number of ids read from the input
+        self.ids = 0
+
+        # number of worker nodes written
+        self.nodes = 0
+
+        # number of sub-DAG files written
+        self.subDags = 0
+
+        # names of the log bucket directories the worker nodes write to
+        self.buckets = []
+
+        # seconds taken to write the DAG
+        self.elapsed = 0.0
+
+    def __str__(self):
+        return ("%s: %d ids in %d worker nodes, %d sub-DAGs, written in %.3f seconds" %
+                (self.dagFile, self.ids, self.nodes, self.subDags, self.elapsed))
+
+
+class DagBuilder:
+    """Write the diamond shaped HTCondor DAG for a task from its input id list.
+
+    Parameters
+    ----------
+    dagName : `str`
+        name of the DAG; the DAG is written to <dagName>.diamond.dag
+    workerDir : `str`
+        directory, relative to the staging directory, holding the condor job files
+    template : `str`
+        name of the worker job condor file
+    runid : `str`
+        run id
+    prescript : `str`, optional
+        script DAGMan runs before the pre job
+    idsPerJob : `int`, optional
+        number of input ids handled by each worker node
+    subDagType : `str`, optional
+        "SPLICE" or "SUBDAG" to split the worker nodes into sub-DAG files;
+        None writes a single flat DAG
+    nodesPerSubDag : `int`, optional
+        maximum number of worker nodes per sub-DAG; 0 for no limit
+    subDagByVisit : `bool`, optional
+        start a new sub-DAG whenever the visit changes
+    maxJobsPerSubDag : `int`, optional
+        maximum number of worker jobs submitted at once by each sub-DAG;
+        0 for no limit
+    logBucketSize : `int`, optional
+        number of ids per log bucket directory
+    nodeStatusUpdate : `int`, optional
+        if positive, DAGMan is told to keep <dagName>.status up to date with
+        the state of every node, at most once every nodeStatusUpdate seconds
+
+    Notes
+    -----
+    The input id list is read exactly once.  JOB lines go straight to the
+    DAG file, while the VARS and PARENT/CHILD sections are spilled to
+    temporary files next to it, which are appended to the DAG file when the
+    input is exhausted.  Lines are gathered into chunks of LINES_PER_CHUNK
+    ids and written as single blocks, so memory use stays bounded no matter
+    how long the input list is.
+
+    The ids of a worker node are passed in its var1 variable, separated by
+    ID_SEPARATOR; var2 and visit are taken from the first id of the node.
+
+    With a sub-DAG type, the worker nodes are written to separate
+    <dagName>.S<n>.dag files, which the top level DAG includes as splices or
+    external sub-DAGs between the pre and post jobs.  If maxJobsPerSubDag is
+    set, each sub-DAG throttles its own worker nodes through a node category.
+
+    The names of the log bucket directories, one per logBucketSize ids, are
+    returned with the result, so the caller doesn't have to read the input
+    again to create them.
+
+    DAG files are written through StagedFile, so a rebuild that produces the
+    same DAG leaves the files already in place untouched.
+    """
+
+    def __init__(self, dagName, workerDir, template, runid, prescript=None, idsPerJob=1,
+                 subDagType=None, nodesPerSubDag=1000, subDagByVisit=False, maxJobsPerSubDag=0,
+                 logBucketSize=100, nodeStatusUpdate=0):
+        if subDagType is not None and subDagType not in SUBDAG_TYPES:
+            raise ValueError("unknown sub-DAG type %s" % subDagType)
+        self.dagName = dagName
+        self.workerDir = workerDir
+        self.template = template
+        self.runid = runid
+        self.prescript = prescript
+        self.idsPerJob = max(int(idsPerJob), 1)
+        self.subDagType = subDagType
+        self.nodesPerSubDag = int(nodesPerSubDag)
+        self.subDagByVisit = subDagByVisit
+        self.maxJobsPerSubDag = int(maxJobsPerSubDag)
+        self.logBucketSize = max(int(logBucketSize), 1)
+        self.nodeStatusUpdate = int(nodeStatusUpdate)
+
+    @staticmethod
+    def fromConfig(generatorConfig, workerDir, template, runid, prescript=None):
+        """Create a DagBuilder from a DagGeneratorConfig
+
+        Parameters
+        ----------
+        generatorConfig : `Config`
+            the "dag" generator configuration of a task
+        workerDir : `str`
+            directory, relative to the staging directory, holding the condor job files
+        template : `str`
+            name of the worker job condor file
+        runid : `str`
+            run id
+        prescript : `str`, optional
+            script DAGMan runs before the pre job
+
+        Returns
+        -------
+        builder : `DagBuilder`
+        """
+        return DagBuilder(generatorConfig.dagName, workerDir, template, runid, prescript,
+                          generatorConfig.idsPerJob, generatorConfig.subDagType,
+                          generatorConfig.nodesPerSubDag, generatorConfig.subDagByVisit,
+                          generatorConfig.maxJobsPerSubDag, generatorConfig.logBucketSize,
+                          generatorConfig.nodeStatusUpdate)
+
+    @staticmethod
+    def logBuckets(idCount, logBucketSize):
+        """Names of the log bucket directories for an input of idCount ids
+
+        Parameters
+        ----------
+        idCount : `int`
+            number of ids in the input
+        logBucketSize : `int`
+            number of ids per bucket
+
+        Returns
+        -------
+        buckets : [ '0', '1' ]
+            one name per bucket; the n-th id (counting from 1) falls into bucket n // logBucketSize
+        """
+        if idCount <= 0:
+            return []
+        return [str(bucket) for bucket in range(idCount // max(int(logBucketSize), 1) + 1)]
+
+    @staticmethod
+    def countIds(inputFile):
+        """Count the ids in an input id list, skipping blank lines
+
+        Parameters
+        ----------
+        inputFile : `str`
+            input id list
+
+        Returns
+        -------
+        count : `int`
+            the number of ids
+        """
+        count = 0
+        with open(inputFile, "r", buffering=BLOCK_SIZE) as fileObj:
+            for aline in fileObj:
+                if aline.strip():
+                    count += 1
+        return count
+
+    def getDagFileName(self):
+        """Accessor to the name of the top level DAG file
+
+        Returns
+        -------
+        name : `str`
+            file name, relative to the output directory
+        """
+        return self.dagName + ".diamond.dag"
+
+    def getNodeStatusFileName(self):
+        """Accessor to the name of the node status file DAGMan writes
+
+        Returns
+        -------
+        name : `str`
+            file name, relative to the output directory; None if no node
+            status file is asked for
+        """
+        if self.nodeStatusUpdate <= 0:
+            return None
+        return self.dagName + ".status"
+
+    @staticmethod
+    def nodeStatusLine(nodeStatusFile, nodeStatusUpdate):
+        """Return the DAG file line asking DAGMan to write a node status file
+
+        Parameters
+        ----------
+        nodeStatusFile : `str`
+            the node status file, relative to the DAG file
+        nodeStatusUpdate : `int`
+            minimum number of seconds between updates of the file
+
+        Returns
+        -------
+        line : `str`
+        """
+        # NODE_STATUS_FILE S2012Pipe.status 60
+        return "NODE_STATUS_FILE " + nodeStatusFile + " " + str(nodeStatusUpdate) + "\n"
+
+    def readIdGroups(self, inputFile, result):
+        """Read the input id list, yielding lists of up to idsPerJob ids.
+
+        Parameters
+        ----------
+        inputFile : `str`
+            input id list, one id per line; blank lines are skipped
+        result : `DagBuildResult`
+            result whose id count is updated as ids are read
+        """
+        group = []
+        with open(inputFile, "r", buffering=BLOCK_SIZE) as fileObj:
+            for aline in fileObj:
+                myData = aline.rstrip()
+                if not myData:
+                    continue
+                result.ids += 1
+                group.append(myData)
+                if len(group) == self.idsPerJob:
+                    yield group
+                    group = []
+        if group:
+            yield group
+
+    def build(self, inputFile, outputDir, manifest=None):
+        """Write the DAG for an input id list
+
+        Parameters
+        ----------
+        inputFile : `str`
+            input id list
+        outputDir : `str`
+            directory the DAG files are written to
+        manifest : `StagingManifest`, optional
+            staging manifest the DAG files are recorded in
+
+        Returns
+        -------
+        result : `DagBuildResult`
+            the DAG file written, with its node counts and timing
+        """
+        startTime = time.time()
+        outname = os.path.join(outputDir, self.getDagFileName())
+        result = DagBuildResult(outname)
+        log.debug("DagBuilder:build: writing %s from %s", outname, inputFile)
+
+        with StagedFile(outname, manifest, BLOCK_SIZE) as outObj, \
+                tempfile.TemporaryFile("w+", buffering=BLOCK_SIZE, dir=outputDir) as varsObj, \
+                tempfile.TemporaryFile("w+", buffering=BLOCK_SIZE, dir=outputDir) as edgesObj:
+
+            outObj.write("JOB A " + self.workerDir + "/" + self.dagName + ".pre\n")
+            outObj.write("JOB B " + self.workerDir + "/" + self.dagName + ".post\n")
+            outObj.write(" \n")
+
+            if self.prescript is not None:
+                outObj.write("SCRIPT PRE A " + self.prescript + "\n")
+
+            groups = self.readIdGroups(inputFile, result)
+            if self.subDagType is None:
+                self._writeFlatNodes(outObj, varsObj, edgesObj, groups, result)
+            else:
+                self._writeSubDagNodes(outObj, edgesObj, groups, outputDir, manifest, result)
+
+            outObj.write(" \n")
+
+            # append the spilled sections in large blocks
+            varsObj.seek(0)
+            shutil.copyfileobj(varsObj, outObj, BLOCK_SIZE)
+            edgesObj.seek(0)
+            shutil.copyfileobj(edgesObj, outObj, BLOCK_SIZE)
+
+            nodeStatusFile = self.getNodeStatusFileName()
+            if nodeStatusFile is not None:
+                outObj.write(self.nodeStatusLine(nodeStatusFile, self.nodeStatusUpdate))
+
+        result.buckets = self.logBuckets(result.ids, self.logBucketSize)
+        result.elapsed = time.time() - startTime
+        log.debug("DagBuilder:build: %s", result)
+        return result
+
+    def _nodeLines(self, count, group):
+        """Return the name, JOB line and VARS lines of one worker node.
+        """
+        node = "A" + str(count)
+        newData, visit = mangleId(group[0])
+        job = "JOB " + node + " " + self.workerDir + "/" + self.template + "\n"
+
+        #  VARS A1 var1="visit=887136081 raft=2,2 sensor=0,1"
+        #  VARS A1 var2="visit-887136081:raft-2_2:sensor-0_1"
+        dagVars = ("VARS " + node + " var1=\"" + ID_SEPARATOR.join(group) + "\" \n" +
+                   "VARS " + node + " var2=\"" + newData + "\" \n" +
+                   "VARS " + node + " visit=\"" + visit + "\" \n" +
+                   "VARS " + node + " runid=\"" + self.runid + "\" \n" +
+                   "VARS " + node + " workerid=\"" + str(count) + "\" \n")
+        return node, visit, job, dagVars
+
+    def _writeFlatNodes(self, outObj, varsObj, edgesObj, groups, result):
+        """Write every worker node into the top level DAG.
+        """
+        jobs = []
+        dagVars = []
+        edges = []
+        for group in groups:
+            result.nodes += 1
+            node, visit, job, nodeVars = self._nodeLines(result.nodes, group)
+            jobs.append(job)
+            dagVars.append(nodeVars)
+
+            # PARENT A CHILD A1
+            # PARENT A1 CHILD B
+            edges.append("PARENT A CHILD " + node + " \nPARENT " + node + " CHILD B \n")
+
+            if len(jobs) == LINES_PER_CHUNK:
+                outObj.write("".join(jobs))
+                varsObj.write("".join(dagVars))
+                edgesObj.write("".join(edges))
+                jobs.clear()
+                dagVars.clear()
+                edges.clear()
+
+        outObj.write("".join(jobs))
+        varsObj.write("".join(dagVars))
+        edgesObj.write("".join(edges))
+
+    def _writeSubDagNodes(self, outObj, edgesObj, groups, outputDir, manifest, result):
+        """Write the worker nodes into sub-DAG files, and reference those from the top level DAG.
+        """
+        keyword = SUBDAG_TYPES[self.subDagType]
+        category = " " + WORKER_CATEGORY + "\n" if self.maxJobsPerSubDag > 0 else None
+        subDagObj = None
+        lines = []
+        nodesInSubDag = 0
+        lastVisit = None
+        try:
+            for group in groups:
+                result.nodes += 1
+                node, visit, job, nodeVars = self._nodeLines(result.nodes, group)
+
+                if (subDagObj is None or nodesInSubDag == self.nodesPerSubDag or
+                        (self.subDagByVisit and visit != lastVisit)):
+                    if subDagObj is not None:
+                        self._closeSubDag(subDagObj, lines)
+                    result.subDags += 1
+                    subDag = "S" + str(result.subDags)
+                    subDagFile = self.dagName + "." + subDag + ".dag"
+                    subDagObj = StagedFile(os.path.join(outputDir, subDagFile), manifest, BLOCK_SIZE)
+                    nodesInSubDag = 0
+                    lastVisit = visit
+
+                    # SPLICE S1 S2012Pipe.S1.dag
+                    # PARENT A CHILD S1
+                    # PARENT S1 CHILD B
+                    outObj.write(keyword + " " + subDag + " " + subDagFile + "\n")
+                    edgesObj.write("PARENT A CHILD " + subDag + " \nPARENT " + subDag + " CHILD B \n")
+
+                nodesInSubDag += 1
+                lines.append(job)
+                lines.append(nodeVars)
+                if category is not None:
+                    lines.append("CATEGORY " + node + category)
+
+                if len(lines) >= LINES_PER_CHUNK:
+                    subDagObj.write("".join(lines))
+                    lines.clear()
+        except BaseException:
+            if subDagObj is not None:
+                subDagObj.discard()
+            raise
+
+        if subDagObj is not None:
+            self._closeSubDag(subDagObj, lines)
+
+    def _closeSubDag(self, subDagObj, lines):
+        """Write out the remaining lines of a sub-DAG, followed by its throttle, and close it.
+        """
+        subDagObj.write("".join(lines))
+        lines.clear()
+        if self.maxJobsPerSubDag > 0:
+            subDagObj.write("MAXJOBS " + WORKER_CATEGORY + " " + str(self.maxJobsPerSubDag) + "\n")
+        subDagObj.close()
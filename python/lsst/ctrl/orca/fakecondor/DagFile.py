@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+import os
+import re
+
+# VARS macro assignments:  var1="visit=887136081 raft=2,2"
+_MACRO = re.compile(r'(\w+)\s*=\s*"((?:[^"\\]|\\.)*)"')
+
+# DAG file keywords naming a DAG whose nodes become part of this one
+_INCLUDED_DAGS = ("SPLICE", "SUBDAG")
+
+
+class DagNode:
+    """One node of a DAG file.
+
+    Parameters
+    ----------
+    name : `str`
+        the node name, prefixed with the splices it's in, e.g. 'S1+A1'
+    submitFile : `str`
+        the node's condor submit file
+    directory : `str`
+        directory the node runs in
+    """
+
+    def __init__(self, name, submitFile, directory):
+        # the node name
+        self.name = name
+
+        # the node's condor submit file
+        self.submitFile = submitFile
+
+        # directory the node runs in
+        self.directory = directory
+
+        # VARS macros given to the node
+        self.vars = {}
+
+        # SCRIPT PRE and POST command lines, if any
+        self.preScript = None
+        self.postScript = None
+
+        # the node's CATEGORY, prefixed like its name
+        self.category = None
+
+        # number of times the node is retried after failing
+        self.retries = 0
+
+        # names of the nodes this one depends on, and of those depending on it
+        self.parents = []
+        self.children = []
+
+
+class DagFile:
+    """A DAGMan input file, with every splice and sub-DAG it uses read in.
+
+    Parameters
+    ----------
+    fileName : `str`
+        the DAG file
+
+    Notes
+    -----
+    The JOB, VARS, PARENT/CHILD, SCRIPT, CATEGORY, MAXJOBS, RETRY and
+    NODE_STATUS_FILE commands are understood, and other commands are
+    ignored.  The nodes of a SPLICE are named and categorized with the
+    splice's name as prefix, as DAGMan does.  A SUBDAG EXTERNAL is read in
+    the same way, as if it were a splice, instead of being run by a DAGMan
+    of its own.
+    """
+
+    def __init__(self, fileName):
+        # the DAG file
+        self.fileName = fileName
+
+        # node name -> DagNode, in the order the nodes are declared
+        self.nodes = {}
+
+        # category -> most nodes of it submitted at once
+        self.maxJobs = {}
+
+        # the NODE_STATUS_FILE, relative to the DAG's directory, and its update interval
+        self.nodeStatusFile = None
+        self.nodeStatusUpdate = 60
+
+        self._read(fileName, "", os.path.dirname(os.path.abspath(fileName)))
+
+    def _read(self, fileName, prefix, directory):
+        """Read a DAG file, naming its nodes with the prefix
+
+        Returns
+        -------
+        initial, final : `list` of `str`
+            names of its nodes without parents, and without children
+        """
+        edges = []
+        splices = {}
+        nodes = []
+        with open(os.path.join(directory, fileName) if prefix else fileName) as fp:
+            for line in fp:
+                words = line.split()
+                if not words or words[0].startswith("#"):
+                    continue
+                keyword = words[0].upper()
+                if keyword == "JOB":
+                    nodeDir = self._option(words, "DIR", directory)
+                    node = DagNode(prefix + words[1], words[2], nodeDir)
+                    self.nodes[node.name] = node
+                    nodes.append(node.name)
+                elif keyword == "VARS":
+                    node = self.nodes[prefix + words[1]]
+                    rest = line.split(None, 2)[2] if len(words) > 2 else ""
+                    for name, value in _MACRO.findall(rest):
+                        node.vars[name] = value.replace('\\"', '"')
+                elif keyword == "PARENT":
+                    split = [word.upper() for word in words].index("CHILD")
+                    edges.append((words[1:split], words[split+1:]))
+                elif keyword == "SCRIPT":
+                    # SCRIPT [DEFER status time] [DEBUG file type] PRE|POST|HOLD node command
+                    args = words[1:]
+                    while args[0].upper() in ("DEFER", "DEBUG"):
+                        args = args[3:]
+                    when, name, command = args[0].upper(), args[1], " ".join(args[2:])
+                    if when == "PRE":
+                        self.nodes[prefix + name].preScript = command
+                    elif when == "POST":
+                        self.nodes[prefix + name].postScript = command
+                elif keyword in _INCLUDED_DAGS:
+                    if keyword == "SUBDAG":
+                        words = words[1:]
+                    subDir = self._option(words, "DIR", directory)
+                    splices[words[1]] = self._read(words[2], prefix + words[1] + "+", subDir)
+                elif keyword == "CATEGORY":
+                    category = words[2] if words[2].startswith("+") else prefix + words[2]
+                    self.nodes[prefix + words[1]].category = category
+                elif keyword == "MAXJOBS":
+                    category = words[1] if words[1].startswith("+") else prefix + words[1]
+                    self.maxJobs[category] = int(words[2])
+                elif keyword == "RETRY":
+                    self.nodes[prefix + words[1]].retries = int(words[2])
+                elif keyword == "NODE_STATUS_FILE" and not prefix:
+                    self.nodeStatusFile = words[1]
+                    if len(words) > 2 and words[2].isdigit():
+                        self.nodeStatusUpdate = int(words[2])
+
+        # an edge to or from a splice is one to its initial or from its final nodes
+        for parents, children in edges:
+            parentNodes = []
+            for name in parents:
+                parentNodes.extend(splices[name][1] if name in splices else [prefix + name])
+            childNodes = []
+            for name in children:
+                childNodes.extend(splices[name][0] if name in splices else [prefix + name])
+            for parent in parentNodes:
+                for child in childNodes:
+                    self.nodes[parent].children.append(child)
+                    self.nodes[child].parents.append(parent)
+
+        for initial, final in splices.values():
+            nodes.extend(initial)
+            nodes.extend(name for name in final if name not in initial)
+        initial = [name for name in nodes if not self._hasParentIn(name, prefix)]
+        final = [name for name in nodes if not self._hasChildIn(name, prefix)]
+        return initial, final
+
+    def _hasParentIn(self, name, prefix):
+        return any(parent.startswith(prefix) for parent in self.nodes[name].parents)
+
+    def _hasChildIn(self, name, prefix):
+        return any(child.startswith(prefix) for child in self.nodes[name].children)
+
+    @staticmethod
+    def _option(words, option, default):
+        """Return the value following an option of a command, e.g. DIR
+        """
+        upper = [word.upper() for word in words]
+        if option in upper[3:]:
+            return os.path.join(default, words[upper.index(option, 3) + 1])
+        return default
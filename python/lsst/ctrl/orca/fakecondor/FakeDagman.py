@@ -0,0 +1,385 @@
+#!/usr/bin/env python
+
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+import collections
+import heapq
+import os
+import subprocess
+import threading
+import time
+
+import lsst.log as log
+
+# DAGMan NodeStatus codes
+STATUS_NOT_READY = 0
+STATUS_READY = 1
+STATUS_PRERUN = 2
+STATUS_SUBMITTED = 3
+STATUS_POSTRUN = 4
+STATUS_DONE = 5
+STATUS_ERROR = 6
+STATUS_FUTILE = 7
+
+# names DAGMan gives the NodeStatus codes in its node status file
+STATUS_NAMES = {STATUS_NOT_READY: "STATUS_NOT_READY",
+                STATUS_READY: "STATUS_READY",
+                STATUS_PRERUN: "STATUS_PRERUN",
+                STATUS_SUBMITTED: "STATUS_SUBMITTED",
+                STATUS_POSTRUN: "STATUS_POSTRUN",
+                STATUS_DONE: "STATUS_DONE",
+                STATUS_ERROR: "STATUS_ERROR",
+                STATUS_FUTILE: "STATUS_FUTILE"}
+
+# exit status of a DAGMan that was removed with condor_rm
+REMOVED_STATUS = 2
+
+# seconds between checks of the node processes that are still running
+PROCESS_POLL_INTERVAL = 0.01
+
+# host the fake jobs are submitted from and run on
+_HOST = "<127.0.0.1:9618?addrs=127.0.0.1-9618>"
+
+
+def _eventTime(now):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))
+
+
+def submitEvent(cluster, now, node=None):
+    """Return the text of a user log submit event
+
+    Parameters
+    ----------
+    cluster : `str`
+        cluster id of the job
+    now : `float`
+        time of the event
+    node : `str`, optional
+        the DAG node the job runs
+    """
+    text = "000 (%s.000.000) %s Job submitted from host: %s\n" % (cluster, _eventTime(now), _HOST)
+    if node is not None:
+        text += "    DAG Node: %s\n" % node
+    return text + "...\n"
+
+
+def executeEvent(cluster, now):
+    """Return the text of a user log execute event
+    """
+    return "001 (%s.000.000) %s Job executing on host: %s\n...\n" % (cluster, _eventTime(now), _HOST)
+
+
+def terminatedEvent(cluster, now, returnValue):
+    """Return the text of a user log terminated event for a job that exited normally
+    """
+    return ("005 (%s.000.000) %s Job terminated.\n"
+            "\t(1) Normal termination (return value %d)\n"
+            "\t\tUsr 0 00:00:00, Sys 0 00:00:00  -  Run Remote Usage\n"
+            "...\n" % (cluster, _eventTime(now), returnValue))
+
+
+def abortedEvent(cluster, now):
+    """Return the text of a user log event for a job removed by condor_rm
+    """
+    return "009 (%s.000.000) %s Job was aborted.\n\tvia condor_rm\n...\n" % (cluster, _eventTime(now))
+
+
+class FakeDagman(threading.Thread):
+    """Runs a DAG the way DAGMan would, writing the files DAGMan writes.
+
+    Parameters
+    ----------
+    backend : `FakeJobBackend`
+        the backend the DAG was submitted to
+    clusterId : `str`
+        cluster id of the DAGMan job
+    dagFileName : `str`
+        the DAG file
+    dag : `DagFile`
+        the DAG, already read
+
+    Notes
+    -----
+    A node is submitted once all its parents are done, as long as its
+    category's MAXJOBS and the backend's maxJobs allow it.  Each node job
+    gets a cluster of its own in the backend's queue while it runs.  A node
+    that fails is retried as many times as its RETRY allows; once it has
+    failed for good, its descendants are futile, and the rest of the DAG
+    still runs.  PRE and POST scripts aren't run.
+
+    Every event is appended to <dag>.nodes.log, the DAGMan job's own submit
+    and termination events to <dag>.dagman.log, and DAGMan's exit status to
+    <dag>.dagman.out.  The NODE_STATUS_FILE, if there is one, is rewritten
+    atomically every update interval and when DAGMan exits.
+    """
+
+    def __init__(self, backend, clusterId, dagFileName, dag):
+        threading.Thread.__init__(self, name="FakeDagman-%s" % clusterId, daemon=True)
+
+        # the backend the DAG was submitted to
+        self.backend = backend
+
+        # cluster id of the DAGMan job
+        self.clusterId = clusterId
+
+        # the DAG file, and the DAG read from it
+        self.dagFileName = os.path.abspath(dagFileName)
+        self.dag = dag
+
+        # DAG node -> NodeStatus code
+        self.nodeStatus = dict.fromkeys(dag.nodes, STATUS_NOT_READY)
+
+        # DAGMan's exit status, once it has exited
+        self.exitStatus = None
+
+        self._removed = threading.Event()
+        self._logs = {}
+
+    def remove(self):
+        """Remove the DAG, as condor_rm of the DAGMan job does
+        """
+        self._removed.set()
+
+    def run(self):
+        try:
+            self._run()
+        except Exception as error:
+            log.warn("FakeDagman: dag %s failed: %s", self.clusterId, error)
+            if self.exitStatus is None:
+                self.exitStatus = 1
+        finally:
+            for fp in self._logs.values():
+                fp.close()
+            self.backend.removeJob(self.clusterId)
+
+    def _log(self, suffix, text):
+        fp = self._logs.get(suffix)
+        if fp is None:
+            fp = self._logs[suffix] = open(self.dagFileName + suffix, "a")
+        fp.write(text)
+
+    def _flush(self):
+        for fp in self._logs.values():
+            fp.flush()
+
+    def _run(self):
+        dag = self.dag
+        now = time.time()
+        self._log(".dagman.out", "%s ** condor_scheduniv_exec.%s.0 (CONDOR_DAGMAN) STARTING UP\n" %
+                  (time.strftime("%m/%d/%y %H:%M:%S", time.localtime(now)), self.clusterId))
+
+        # nodes waiting for their parents, and nodes ready to be submitted, by category
+        waiting = dict((name, len(node.parents)) for name, node in dag.nodes.items())
+        ready = collections.OrderedDict()
+        for name, count in waiting.items():
+            if count == 0:
+                self._makeReady(name, ready)
+        retries = dict((name, node.retries) for name, node in dag.nodes.items())
+
+        # (finish time, sequence, node, cluster, process) of each running node
+        running = []
+        sequence = 0
+        runningByCategory = collections.Counter()
+        statusFile = None
+        nextStatus = None
+        if dag.nodeStatusFile is not None:
+            statusFile = os.path.join(os.path.dirname(self.dagFileName), dag.nodeStatusFile)
+            statusUpdate = self.backend.statusUpdate
+            if statusUpdate is None:
+                statusUpdate = dag.nodeStatusUpdate
+            self._writeStatusFile(statusFile, now, now + statusUpdate, running=True)
+            nextStatus = now + statusUpdate
+
+        while ready or running:
+            if self._removed.is_set():
+                self._abort(running, time.time())
+                return
+
+            # submit the ready nodes their throttles allow
+            now = time.time()
+            for category in list(ready):
+                queue = ready[category]
+                limit = dag.maxJobs.get(category, 0)
+                while queue and (limit <= 0 or runningByCategory[category] < limit):
+                    if 0 < self.backend.maxJobs <= len(running):
+                        break
+                    name = queue.popleft()
+                    cluster = self.backend.newCluster()
+                    seconds, failed = self.backend.nodeRuntime()
+                    process = None
+                    if self.backend.command is not None:
+                        node = dag.nodes[name]
+                        process = subprocess.Popen(list(self.backend.command) + [name], cwd=node.directory,
+                                                   stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                                   stderr=subprocess.DEVNULL)
+                    sequence += 1
+                    heapq.heappush(running, (now + seconds, sequence, name, cluster, process, failed))
+                    runningByCategory[category] += 1
+                    self.nodeStatus[name] = STATUS_SUBMITTED
+                    self._log(".nodes.log", submitEvent(cluster, now, name) + executeEvent(cluster, now))
+                if not queue:
+                    del ready[category]
+
+            # finish the nodes whose time is up
+            now = time.time()
+            while running and running[0][0] <= now:
+                finishTime, seq, name, cluster, process, failed = heapq.heappop(running)
+                returnValue = 1 if failed else 0
+                if process is not None:
+                    code = process.poll()
+                    if code is None:
+                        sequence += 1
+                        heapq.heappush(running, (now + PROCESS_POLL_INTERVAL, sequence, name, cluster,
+                                                 process, failed))
+                        continue
+                    returnValue = returnValue or code
+                runningByCategory[dag.nodes[name].category] -= 1
+                self.backend.removeJob(cluster)
+                self._log(".nodes.log", terminatedEvent(cluster, now, returnValue))
+                if returnValue == 0:
+                    self.nodeStatus[name] = STATUS_DONE
+                    for child in dag.nodes[name].children:
+                        waiting[child] -= 1
+                        if waiting[child] == 0 and self.nodeStatus[child] == STATUS_NOT_READY:
+                            self._makeReady(child, ready)
+                elif retries[name] > 0:
+                    retries[name] -= 1
+                    self._makeReady(name, ready)
+                else:
+                    self.nodeStatus[name] = STATUS_ERROR
+                    self._markFutile(name)
+            self._flush()
+
+            if nextStatus is not None and now >= nextStatus:
+                nextStatus = now + statusUpdate
+                self._writeStatusFile(statusFile, now, nextStatus, running=True)
+
+            if ready and running and not self._canSubmit(ready, runningByCategory, len(running)):
+                timeout = running[0][0] - now
+            elif ready:
+                continue
+            elif running:
+                timeout = running[0][0] - now
+            else:
+                break
+            if nextStatus is not None:
+                timeout = min(timeout, nextStatus - now)
+            self._removed.wait(max(timeout, 0.0))
+
+        now = time.time()
+        failed = sum(1 for status in self.nodeStatus.values() if status != STATUS_DONE)
+        self.exitStatus = 1 if failed else 0
+        if statusFile is not None:
+            self._writeStatusFile(statusFile, now, now, running=False)
+        self._exit(now)
+
+    def _canSubmit(self, ready, runningByCategory, running):
+        """Return whether a ready node can be submitted now
+        """
+        if 0 < self.backend.maxJobs <= running:
+            return False
+        for category in ready:
+            limit = self.dag.maxJobs.get(category, 0)
+            if limit <= 0 or runningByCategory[category] < limit:
+                return True
+        return False
+
+    def _makeReady(self, name, ready):
+        self.nodeStatus[name] = STATUS_READY
+        category = self.dag.nodes[name].category
+        queue = ready.get(category)
+        if queue is None:
+            queue = ready[category] = collections.deque()
+        queue.append(name)
+
+    def _markFutile(self, name):
+        """Mark every descendant of a failed node futile
+        """
+        stack = list(self.dag.nodes[name].children)
+        while stack:
+            child = stack.pop()
+            if self.nodeStatus[child] != STATUS_FUTILE:
+                self.nodeStatus[child] = STATUS_FUTILE
+                stack.extend(self.dag.nodes[child].children)
+
+    def _abort(self, running, now):
+        """Remove the running node jobs, as DAGMan does when it is removed
+        """
+        for finishTime, seq, name, cluster, process, failed in running:
+            if process is not None:
+                process.kill()
+                process.wait()
+            self.backend.removeJob(cluster)
+            self._log(".nodes.log", abortedEvent(cluster, now))
+        self.exitStatus = REMOVED_STATUS
+        self._exit(now)
+
+    def _exit(self, now):
+        """Write DAGMan's exit to its logs
+        """
+        counts = collections.Counter(self.nodeStatus.values())
+        stamp = time.strftime("%m/%d/%y %H:%M:%S", time.localtime(now))
+        self._log(".dagman.out", "%s Of %d nodes total: %d done, %d failed, %d futile\n" %
+                  (stamp, len(self.nodeStatus), counts[STATUS_DONE], counts[STATUS_ERROR],
+                   counts[STATUS_FUTILE]))
+        self._log(".dagman.out", "%s **** condor_scheduniv_exec.%s.0 (condor_DAGMAN) pid %d "
+                  "EXITING WITH STATUS %d\n" % (stamp, self.clusterId, os.getpid(), self.exitStatus))
+        if self.exitStatus == REMOVED_STATUS:
+            self._log(".dagman.log", abortedEvent(self.clusterId, now))
+        else:
+            self._log(".dagman.log", terminatedEvent(self.clusterId, now, self.exitStatus))
+        self._flush()
+        log.debug("FakeDagman: dag %s exited with status %d", self.clusterId, self.exitStatus)
+
+    def _writeStatusFile(self, fileName, now, nextUpdate, running):
+        """Write the node status file, atomically, as DAGMan does
+        """
+        counts = collections.Counter(self.nodeStatus.values())
+        if running:
+            dagStatus = STATUS_SUBMITTED
+        else:
+            dagStatus = STATUS_DONE if self.exitStatus == 0 else STATUS_ERROR
+        lines = ["[\n",
+                 '  Type = "DagStatus";\n',
+                 '  DagFiles = {\n    "%s"\n  };\n' % os.path.basename(self.dagFileName),
+                 '  Timestamp = %d; /* "%s" */\n' % (now, time.ctime(now)),
+                 '  DagStatus = %d; /* "%s" */\n' % (dagStatus, STATUS_NAMES[dagStatus]),
+                 "  NodesTotal = %d;\n" % len(self.nodeStatus),
+                 "  NodesDone = %d;\n" % counts[STATUS_DONE],
+                 "  NodesPre = %d;\n" % counts[STATUS_PRERUN],
+                 "  NodesQueued = %d;\n" % counts[STATUS_SUBMITTED],
+                 "  NodesPost = %d;\n" % counts[STATUS_POSTRUN],
+                 "  NodesReady = %d;\n" % counts[STATUS_READY],
+                 "  NodesUnready = %d;\n" % counts[STATUS_NOT_READY],
+                 "  NodesFutile = %d;\n" % counts[STATUS_FUTILE],
+                 "  NodesFailed = %d;\n" % counts[STATUS_ERROR],
+                 "]\n"]
+        for name, status in self.nodeStatus.items():
+            lines.append('[\n  Type = "NodeStatus";\n  Node = "%s";\n  NodeStatus = %d; /* "%s" */\n'
+                         '  StatusDetails = "";\n  RetryCount = 0;\n]\n' %
+                         (name, status, STATUS_NAMES[status]))
+        lines.append('[\n  Type = "StatusEnd";\n  EndTime = %d; /* "%s" */\n'
+                     '  NextUpdate = %d; /* "%s" */\n]\n' %
+                     (now, time.ctime(now), nextUpdate, time.ctime(nextUpdate)))
+        tempName = fileName + ".tmp"
+        with open(tempName, "w") as fp:
+            fp.write("".join(lines))
+        os.replace(tempName, fileName)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+import os
+import random
+import threading
+import time
+
+import lsst.log as log
+
+from lsst.ctrl.orca.JobBackend import JobBackend
+from lsst.ctrl.orca.fakecondor.DagFile import DagFile
+from lsst.ctrl.orca.fakecondor.FakeDagman import FakeDagman, submitEvent
+
+# JobStatus of the jobs in the fake queue
+RUNNING = 2
+
+
+class FakeJobBackend(JobBackend):
+    """Job backend that runs jobs and DAGs locally instead of in HTCondor.
+
+    Parameters
+    ----------
+    latency : `float`, optional
+        mean number of seconds a job or DAG node runs for
+    jitter : `float`, optional
+        the run time of each job is drawn uniformly within this many
+        seconds of latency
+    failureRate : `float`, optional
+        fraction of the DAG nodes that fail, with return value 1
+    command : `list` of `str`, optional
+        if given, each DAG node runs this command as a local process, with
+        the node name as its last argument and the node's directory as its
+        working directory; the node fails if the command does.  The node
+        runs for at least its drawn run time.
+    maxJobs : `int`, optional
+        most nodes of a DAG running at once, as condor_submit_dag -maxjobs;
+        0 for no limit
+    statusUpdate : `float`, optional
+        seconds between updates of the node status file, instead of the
+        interval in the DAG's NODE_STATUS_FILE command
+    seed : `int`, optional
+        seed for the run times and failures, to make a run repeatable
+
+    Notes
+    -----
+    Submitted DAGs are run by a FakeDagman thread each; see FakeDagman for
+    the DAGMan behavior that is simulated.  Every job in the queue is shown
+    as running, with one process per cluster.  Paths are relative to the
+    current directory, as with the condor tools.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, failureRate=0.0, command=None, maxJobs=0,
+                 statusUpdate=None, seed=None):
+        # mean number of seconds a job runs for, and the spread around it
+        self.latency = latency
+        self.jitter = jitter
+
+        # fraction of the DAG nodes that fail
+        self.failureRate = failureRate
+
+        # command each DAG node runs, if any
+        self.command = command
+
+        # most nodes of a DAG running at once
+        self.maxJobs = maxJobs
+
+        # seconds between updates of the node status file, if overridden
+        self.statusUpdate = statusUpdate
+
+        # cluster id -> JobStatus of the jobs in the queue
+        self.jobs = {}
+
+        # cluster id -> FakeDagman of each submitted DAG
+        self.dagmans = {}
+
+        self._random = random.Random(seed)
+        self._nextCluster = 1
+        self._lock = threading.Lock()
+
+    def newCluster(self):
+        """Add a running job to the queue
+
+        Returns
+        -------
+        clusterId : `str`
+            the job's cluster id
+        """
+        with self._lock:
+            clusterId = str(self._nextCluster)
+            self._nextCluster += 1
+            self.jobs[clusterId] = RUNNING
+        return clusterId
+
+    def removeJob(self, clusterId):
+        """Take a job out of the queue
+
+        Parameters
+        ----------
+        clusterId : `str`
+            the job's cluster id
+        """
+        with self._lock:
+            self.jobs.pop(str(clusterId), None)
+
+    def nodeRuntime(self):
+        """Draw how long a job runs, and whether it fails
+
+        Returns
+        -------
+        seconds : `float`
+            the job's run time
+        failed : `bool`
+            True if the job fails
+        """
+        with self._lock:
+            seconds = self.latency
+            if self.jitter > 0:
+                seconds += self._random.uniform(-self.jitter, self.jitter)
+            failed = self.failureRate > 0 and self._random.random() < self.failureRate
+        return max(seconds, 0.0), failed
+
+    def submit(self, condorFile):
+        log.debug("FakeJobBackend:submit %s", condorFile)
+        if not os.path.exists(condorFile):
+            log.warn("FakeJobBackend:submit: no such file %s", condorFile)
+            return None
+        clusterId = self.newCluster()
+        seconds, failed = self.nodeRuntime()
+        timer = threading.Timer(seconds, self.removeJob, [clusterId])
+        timer.daemon = True
+        timer.start()
+        return clusterId
+
+    def submitDag(self, dagFile, cwd=None):
+        log.debug("FakeJobBackend:submitDag %s", dagFile)
+        if cwd is not None:
+            dagFile = os.path.join(cwd, dagFile)
+        try:
+            dag = DagFile(dagFile)
+        except (OSError, KeyError, IndexError, ValueError) as error:
+            log.warn("FakeJobBackend:submitDag: can't read %s: %s", dagFile, error)
+            return None
+        clusterId = self.newCluster()
+        dagman = FakeDagman(self, clusterId, dagFile, dag)
+        with open(dagFile + ".dagman.log", "a") as fp:
+            fp.write(submitEvent(clusterId, time.time()))
+        with self._lock:
+            self.dagmans[clusterId] = dagman
+        dagman.start()
+        return clusterId
+
+    def query(self, clusterIds):
+        with self._lock:
+            return [(str(cid), "0", self.jobs[str(cid)]) for cid in clusterIds if str(cid) in self.jobs]
+
+    def remove(self, clusterId):
+        log.debug("FakeJobBackend:remove %s", clusterId)
+        clusterId = str(clusterId)
+        with self._lock:
+            dagman = self.dagmans.get(clusterId)
+        if dagman is not None:
+            dagman.remove()
+        else:
+            self.removeJob(clusterId)
+
+    def wait(self, clusterId, timeout=None):
+        """Wait for a submitted DAG to finish
+
+        Parameters
+        ----------
+        clusterId : `str`
+            cluster id of the DAGMan job
+        timeout : `float`, optional
+            most seconds to wait
+
+        Returns
+        -------
+        exitStatus : `int`
+            DAGMan's exit status, or None if it is still running
+        """
+        with self._lock:
+            dagman = self.dagmans[str(clusterId)]
+        dagman.join(timeout)
+        return dagman.exitStatus
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+
+"""A local stand-in for HTCondor, for tests and benchmarks.
+
+FakeJobBackend is a job backend that runs the DAGs orca generates without
+a schedd: each DAG is parsed, its nodes are run in dependency order as
+simulated jobs, or as local processes, and DAGMan's nodes.log, dagman.log,
+dagman.out and node status file are written as DAGMan would.
+"""
+
+from .DagFile import DagFile, DagNode
+from .FakeDagman import FakeDagman
+from .FakeJobBackend import FakeJobBackend
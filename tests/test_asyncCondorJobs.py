@@ -0,0 +1,107 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+"""
+Tests of AsyncCondorJobs, against condor_submit_dag, condor_q and condor_rm scripts
+"""
+import asyncio
+import os
+import shutil
+import stat
+import tempfile
+import time
+import unittest
+import lsst.utils.tests
+
+from lsst.ctrl.orca.AsyncCondorJobs import AsyncCondorJobs
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class AsyncCondorJobsTestCase(lsst.utils.tests.TestCase):
+
+    scripts = {"condor_submit_dag": "sleep 0.2\necho \"1 job(s) submitted to cluster $(basename $PWD).\"\n",
+               "condor_q": "printf '1016 0 2\\n1017 0 1\\n'\n",
+               "condor_rm": "exit 1\n",
+               "condor_hang": "exec sleep 5\n"}
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        for name, text in self.scripts.items():
+            script = os.path.join(self.dir, name)
+            with open(script, "w") as fp:
+                fp.write("#!/bin/sh\n" + text)
+            os.chmod(script, stat.S_IRWXU)
+        self.path = os.environ["PATH"]
+        os.environ["PATH"] = self.dir + os.pathsep + self.path
+
+    def tearDown(self):
+        os.environ["PATH"] = self.path
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def testSubmitDag(self):
+        dirs = []
+        for cid in ("101", "102", "103", "104"):
+            dirs.append(os.path.join(self.dir, cid))
+            os.mkdir(dirs[-1])
+
+        async def submitAll(cj):
+            return await asyncio.gather(*[cj.submit_dag("a.dag", cwd=d) for d in dirs])
+
+        start = time.time()
+        self.assertEqual(asyncio.run(submitAll(AsyncCondorJobs())), ["101", "102", "103", "104"])
+        self.assertLess(time.time() - start, 0.6)
+
+        # two at a time take twice as long
+        start = time.time()
+        asyncio.run(submitAll(AsyncCondorJobs(maxConcurrent=2)))
+        self.assertGreaterEqual(time.time() - start, 0.4)
+
+        # the launchers share one instance, so one limit holds across their submissions
+        self.assertIs(AsyncCondorJobs.getInstance(), AsyncCondorJobs.getInstance())
+
+    def testWaitForState(self):
+        cj = AsyncCondorJobs()
+        self.assertEqual(asyncio.run(cj.wait_for_state(["1016"], ["R"])), {"1016.0": "R"})
+        self.assertEqual(asyncio.run(cj.wait_for_state(["1016", "1017"], ["R", "I"])),
+                         {"1016.0": "R", "1017.0": "I"})
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(cj.wait_for_state(["1017"], ["R"], timeout=0.2))
+        self.assertFalse(asyncio.run(cj.remove("1017")))
+
+    def testTimeout(self):
+        cj = AsyncCondorJobs(timeout=0.2)
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(cj._run(["condor_hang"]))
+
+
+class AsyncCondorJobsMemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+__all__ = "AsyncCondorJobsTestCase".split()
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,117 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+"""
+Tests of the CondorJobs queue queries, against a condor_q script and a job backend
+"""
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+import lsst.utils.tests
+
+from lsst.ctrl.orca.CondorJobs import CondorJobs
+from lsst.ctrl.orca import JobBackend
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class CondorJobsTestCase(lsst.utils.tests.TestCase):
+
+    queue = "1016 0 1\n1017 0 2\n1017 1 5\n"
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.argsFile = os.path.join(self.dir, "args")
+        script = os.path.join(self.dir, "condor_q")
+        with open(script, "w") as fp:
+            fp.write("#!/bin/sh\nprintf '%%s\\n' \"$@\" > %s\nprintf '%s'\n" % (self.argsFile, self.queue))
+        os.chmod(script, stat.S_IRWXU)
+        self.path = os.environ["PATH"]
+        os.environ["PATH"] = self.dir + os.pathsep + self.path
+
+    def tearDown(self):
+        os.environ["PATH"] = self.path
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def testQueryJobs(self):
+        cj = CondorJobs()
+        self.assertEqual(cj.queryJobs(["1017", "1016", "1017"]),
+                         {"1016.0": "I", "1017.0": "R", "1017.1": "H"})
+        with open(self.argsFile) as fp:
+            args = fp.read().splitlines()
+        self.assertEqual(args, ["-af", "ClusterId", "ProcId", "JobStatus", "-constraint",
+                                "ClusterId == 1016 || ClusterId == 1017"])
+        self.assertEqual(cj.queryJobs([]), {})
+
+    def testWait(self):
+        cj = CondorJobs()
+        self.assertEqual(cj.waitForJobToRun("1017"), "R")
+        self.assertTrue(cj.isJobAlive("1016"))
+        cj.waitForAllJobsToRun(["1017"])
+
+    def testBackend(self):
+        class RecordingBackend(JobBackend.JobBackend):
+            def __init__(self):
+                self.calls = []
+
+            def submitDag(self, dagFile, cwd=None):
+                self.calls.append(("submitDag", dagFile, cwd))
+                return None
+
+            def query(self, clusterIds):
+                self.calls.append(("query", clusterIds))
+                return [("1016", "0", 1), ("1017", "0", 7)]
+
+            def remove(self, clusterId):
+                self.calls.append(("remove", clusterId))
+
+        backend = RecordingBackend()
+        cj = CondorJobs(backend)
+        self.assertEqual(cj.queryJobs(["1017", "1016"]), {"1016.0": "I", "1017.0": "S"})
+        self.assertEqual(cj.condorSubmitDag("a.diamond.dag", cwd="/staging"), -1)
+        cj.killCondorId("1016")
+        self.assertEqual(backend.calls, [("query", [1016, 1017]), ("submitDag", "a.diamond.dag", "/staging"),
+                                         ("remove", "1016")])
+
+    def testGetJobBackend(self):
+        backend = JobBackend.getJobBackend("htcondor")
+        self.assertIs(backend, JobBackend.getJobBackend("htcondor"))
+        if JobBackend.htcondor is None:
+            self.assertIs(backend, JobBackend.getJobBackend("cli"))
+        self.assertIsInstance(CondorJobs().backend, JobBackend.CliJobBackend)
+        with self.assertRaises(KeyError):
+            JobBackend.getJobBackend("condor_q")
+
+
+class CondorJobsMemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+__all__ = "CondorJobsTestCase".split()
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
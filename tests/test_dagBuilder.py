@@ -0,0 +1,142 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+"""
+Tests of the DagBuilder class
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import lsst.utils.tests
+
+from lsst.ctrl.orca.dag import DagBuilder, mangleId
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class DagBuilderTestCase(lsst.utils.tests.TestCase):
+
+    ids = ["visit=885335881 raft=2,2 sensor=0,0",
+           "visit=885335881 raft=2,2 sensor=0,1",
+           "",
+           "visit=885335882 raft=2,2 sensor=0,2"]
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.inputFile = os.path.join(self.dir, "ids.input")
+        with open(self.inputFile, "w") as fp:
+            fp.write("\n".join(self.ids) + "\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def readLines(self, name):
+        with open(os.path.join(self.dir, name)) as fp:
+            return fp.read().splitlines()
+
+    def testMangleId(self):
+        self.assertEqual(mangleId("visit=887136081 raft=2,2 sensor=0,1"),
+                         ("visit-887136081:raft-2_2:sensor-0_1", "887136081"))
+        self.assertEqual(mangleId("skytile12"), ("skytile12", "skytile12"))
+
+    def testFlat(self):
+        builder = DagBuilder("S2012Pipe", "workers", "worker.condor", "run1", prescript="pre.sh")
+        result = builder.build(self.inputFile, self.dir)
+        self.assertEqual(result.dagFile, os.path.join(self.dir, "S2012Pipe.diamond.dag"))
+        self.assertEqual(result.ids, 3)
+        self.assertEqual(result.nodes, 3)
+        self.assertEqual(result.subDags, 0)
+        self.assertEqual(result.buckets, ["0"])
+
+        lines = self.readLines("S2012Pipe.diamond.dag")
+        self.assertEqual(lines[:4], ["JOB A workers/S2012Pipe.pre", "JOB B workers/S2012Pipe.post", " ",
+                                     "SCRIPT PRE A pre.sh"])
+        self.assertEqual(lines[4:7], ["JOB A%d workers/worker.condor" % i for i in range(1, 4)])
+        self.assertIn('VARS A3 var1="visit=885335882 raft=2,2 sensor=0,2" ', lines)
+        self.assertIn('VARS A3 var2="visit-885335882:raft-2_2:sensor-0_2" ', lines)
+        self.assertIn('VARS A3 visit="885335882" ', lines)
+        self.assertIn('VARS A3 runid="run1" ', lines)
+        self.assertIn('VARS A3 workerid="3" ', lines)
+        self.assertEqual(lines[-2:], ["PARENT A CHILD A3 ", "PARENT A3 CHILD B "])
+
+    def testIdsPerJob(self):
+        builder = DagBuilder("S2012Pipe", "workers", "worker.condor", "run1", idsPerJob=2)
+        result = builder.build(self.inputFile, self.dir)
+        self.assertEqual(result.ids, 3)
+        self.assertEqual(result.nodes, 2)
+
+        lines = self.readLines("S2012Pipe.diamond.dag")
+        self.assertIn('VARS A1 var1="%s;%s" ' % (self.ids[0], self.ids[1]), lines)
+        self.assertIn('VARS A1 var2="visit-885335881:raft-2_2:sensor-0_0" ', lines)
+        self.assertIn('VARS A2 var1="%s" ' % self.ids[3], lines)
+
+    def testSplices(self):
+        builder = DagBuilder("S2012Pipe", "workers", "worker.condor", "run1", subDagType="SPLICE",
+                             subDagByVisit=True, maxJobsPerSubDag=4)
+        result = builder.build(self.inputFile, self.dir)
+        self.assertEqual(result.nodes, 3)
+        self.assertEqual(result.subDags, 2)
+
+        lines = self.readLines("S2012Pipe.diamond.dag")
+        self.assertIn("SPLICE S1 S2012Pipe.S1.dag", lines)
+        self.assertIn("SPLICE S2 S2012Pipe.S2.dag", lines)
+        self.assertIn("PARENT A CHILD S2 ", lines)
+        self.assertIn("PARENT S2 CHILD B ", lines)
+        self.assertNotIn("JOB A1 workers/worker.condor", lines)
+
+        splice = self.readLines("S2012Pipe.S1.dag")
+        self.assertIn("JOB A1 workers/worker.condor", splice)
+        self.assertIn("JOB A2 workers/worker.condor", splice)
+        self.assertIn("CATEGORY A2 worker", splice)
+        self.assertEqual(splice[-1], "MAXJOBS worker 4")
+        self.assertIn("JOB A3 workers/worker.condor", self.readLines("S2012Pipe.S2.dag"))
+
+    def testNodeStatusFile(self):
+        builder = DagBuilder("S2012Pipe", "workers", "worker.condor", "run1", nodeStatusUpdate=60)
+        builder.build(self.inputFile, self.dir)
+        self.assertEqual(builder.getNodeStatusFileName(), "S2012Pipe.status")
+        self.assertEqual(self.readLines("S2012Pipe.diamond.dag")[-1], "NODE_STATUS_FILE S2012Pipe.status 60")
+
+    def testLogBuckets(self):
+        self.assertEqual(DagBuilder.logBuckets(0, 100), [])
+        self.assertEqual(DagBuilder.logBuckets(99, 100), ["0"])
+        self.assertEqual(DagBuilder.logBuckets(100, 100), ["0", "1"])
+        self.assertEqual(DagBuilder.logBuckets(5, 2), ["0", "1", "2"])
+        self.assertEqual(DagBuilder.countIds(self.inputFile), 3)
+
+    def testBadSubDagType(self):
+        with self.assertRaises(ValueError):
+            DagBuilder("S2012Pipe", "workers", "worker.condor", "run1", subDagType="BOGUS")
+
+
+class DagBuilderMemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+__all__ = "DagBuilderTestCase".split()
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
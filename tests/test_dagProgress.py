@@ -0,0 +1,131 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+"""
+Tests of the DagProgress class
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import lsst.utils.tests
+
+from lsst.ctrl.orca.DagProgress import DagProgress, formatDuration
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+DAG_STATUS = """[
+  Type = "DagStatus";
+  DagFiles = {
+    "S2012Pipe.diamond.dag"
+  };
+  Timestamp = 1490097600; /* "Tue Mar 21 12:00:00 2017" */
+  DagStatus = 3; /* "STATUS_SUBMITTED ()" */
+  NodesTotal = %(total)d;
+]
+"""
+
+NODE_STATUS = """[
+  Type = "NodeStatus";
+  Node = "%s";
+  NodeStatus = %d; /* "STATUS" */
+  StatusDetails = "";
+  RetryCount = 0;
+]
+"""
+
+STATUS_END = """[
+  Type = "StatusEnd";
+  EndTime = 1490097600; /* "Tue Mar 21 12:00:00 2017" */
+  NextUpdate = 1490097660; /* "Tue Mar 21 12:01:00 2017" */
+]
+"""
+
+
+class DagProgressTestCase(lsst.utils.tests.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.fileName = os.path.join(self.dir, "S2012Pipe.status")
+        self.writes = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def writeStatus(self, states, end=True):
+        text = DAG_STATUS % {"total": len(states)}
+        text += "".join(NODE_STATUS % ("A%d" % i, state) for i, state in enumerate(states))
+        if end:
+            text += STATUS_END
+        with open(self.fileName, "w") as fp:
+            fp.write(text)
+
+        # DAGMan rewrites the file less often than the clock ticks
+        self.writes += 1
+        os.utime(self.fileName, (self.writes, self.writes))
+
+    def testProgress(self):
+        progress = DagProgress(self.fileName)
+        self.assertFalse(progress.update(now=0))
+
+        # 10 nodes: 2 done, 1 failed, 3 running, 4 idle
+        self.writeStatus([5, 5, 6, 3, 2, 4, 0, 1, 1, 1])
+        self.assertTrue(progress.update(now=0))
+        self.assertEqual(progress.counts, {"idle": 4, "running": 3, "done": 2, "failed": 1})
+        self.assertIsNone(progress.throughput())
+        self.assertIsNone(progress.eta())
+
+        # 3 more done a minute later
+        self.writeStatus([5, 5, 6, 5, 5, 5, 3, 3, 1, 1])
+        self.assertTrue(progress.update(now=60))
+        self.assertEqual(progress.total(), 10)
+        self.assertAlmostEqual(progress.throughput(), 3.0)
+        self.assertAlmostEqual(progress.eta(), 80.0)
+        self.assertEqual(str(progress), "5/10 nodes done, 1 failed, 2 running, 2 idle; 3.0 nodes/min, ETA 2m")
+
+        # unchanged file, but the throughput goes down
+        self.assertFalse(progress.update(now=120))
+        self.assertAlmostEqual(progress.throughput(), 1.5)
+
+        # a file cut short is ignored
+        self.writeStatus([5] * 10, end=False)
+        self.assertFalse(progress.update(now=180))
+        self.assertEqual(progress.counts["done"], 5)
+
+    def testFormatDuration(self):
+        self.assertEqual(formatDuration(30), "1m")
+        self.assertEqual(formatDuration(3*3600 + 120), "3h02m")
+        self.assertEqual(formatDuration(2*86400 + 3600), "2d01h00m")
+
+
+class DagProgressMemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+__all__ = "DagProgressTestCase".split()
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,74 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+"""
+Tests of the EnvString and EnvResolver classes
+"""
+import os
+import unittest
+import lsst.utils.tests
+
+from lsst.ctrl.orca.EnvString import EnvString, EnvResolver
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class EnvStringTestCase(lsst.utils.tests.TestCase):
+
+    env = {"ORCA_A": "/a", "ORCA_B": "$ORCA_A", "ORCA_C": r"c\1"}
+
+    def testResolve(self):
+        os.environ["ORCA_TEST_DIR"] = "/orca"
+        try:
+            self.assertEqual(EnvString.resolve("$ORCA_TEST_DIR/x/$ORCA_TEST_DIR"), "/orca/x//orca")
+            self.assertEqual(EnvString.resolve("no variables"), "no variables")
+        finally:
+            del os.environ["ORCA_TEST_DIR"]
+        with self.assertRaises(RuntimeError):
+            EnvString.resolve("$ORCA_TEST_DIR/x")
+
+    def testResolveMany(self):
+        # values are substituted once, and taken literally
+        self.assertEqual(EnvString.resolve_many(["$ORCA_A/x", None, "$ORCA_B-$ORCA_C"], self.env),
+                         ["/a/x", None, r"$ORCA_A-c\1"])
+        with self.assertRaises(RuntimeError):
+            EnvString.resolve_many(["$ORCA_UNSET"], self.env)
+
+    def testSnapshot(self):
+        env = dict(self.env)
+        resolver = EnvResolver(env)
+        env["ORCA_A"] = "/changed"
+        self.assertEqual(EnvString.resolve_many(["$ORCA_A"], resolver), ["/a"])
+        self.assertIn("$ORCA_A", resolver.resolved)
+
+
+class EnvStringMemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+__all__ = "EnvStringTestCase".split()
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,127 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+"""
+Tests of the EventBus and the StatusListener callbacks
+"""
+import threading
+import time
+import unittest
+import lsst.utils.tests
+
+from lsst.ctrl.orca import EventBus
+from lsst.ctrl.orca.StatusListener import StatusListener
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class RecordingListener(StatusListener):
+    """Records the callbacks it gets, after waiting for the gate to open
+    """
+
+    def __init__(self, gate=None):
+        StatusListener.__init__(self)
+        self.gate = gate
+        self.calls = []
+
+    def nodeStarted(self, name, node, jobId):
+        if self.gate is not None:
+            self.gate.wait()
+        self.calls.append(("nodeStarted", name, node))
+
+    def nodeFinished(self, name, node, jobId, returnValue):
+        self.calls.append(("nodeFinished", name, node, returnValue))
+
+    def workflowFailed(self, name, errorName, errmsg, response, pipelineName):
+        self.calls.append(("workflowFailed", name, errmsg))
+
+    def workflowShutdown(self, name):
+        self.calls.append(("workflowShutdown", name))
+
+
+class EventBusTestCase(lsst.utils.tests.TestCase):
+
+    def setUp(self):
+        self.bus = EventBus.EventBus(maxEvents=100)
+
+    def testDelivery(self):
+        source = object()
+        listener = RecordingListener()
+        everything = RecordingListener()
+        self.bus.subscribe(listener, source)
+        self.bus.subscribe(everything)
+
+        self.bus.publish(EventBus.StatusEvent(EventBus.NODE_STARTED, "wf", source, node="A1"))
+        self.bus.publish(EventBus.StatusEvent(EventBus.NODE_STARTED, "other", object(), node="A1"))
+        self.bus.publish(EventBus.StatusEvent(EventBus.NODE_FINISHED, "wf", source, node="A1",
+                                              returnValue=3))
+        self.bus.publish(EventBus.StatusEvent(EventBus.WORKFLOW_FAILED, "wf", source, message="oops"))
+        self.bus.publish(EventBus.StatusEvent(EventBus.WORKFLOW_DONE, "wf", source))
+        # the listeners of the source alone go, once its events are delivered
+        self.bus.unsubscribeSource(source, 10)
+        self.assertEqual(len(self.bus.metrics()["listeners"]), 1)
+        self.bus.unsubscribe(everything, 10)
+
+        self.assertEqual(listener.calls, [("nodeStarted", "wf", "A1"), ("nodeFinished", "wf", "A1", 3),
+                                          ("workflowFailed", "wf", "oops"), ("workflowShutdown", "wf")])
+        self.assertEqual(len(everything.calls), 5)
+        self.assertEqual(self.bus.metrics()["published"], 5)
+        self.assertEqual(self.bus.metrics()["listeners"], [])
+
+    def testSlowListener(self):
+        gate = threading.Event()
+        slow = RecordingListener(gate)
+        fast = RecordingListener()
+        slowChannel = self.bus.subscribe(slow, maxEvents=2)
+        fastChannel = self.bus.subscribe(fast)
+
+        # publishing never waits for the slow listener, which drops what it can't queue
+        start = time.time()
+        for i in range(5):
+            self.assertTrue(self.bus.publish(EventBus.StatusEvent(EventBus.NODE_STARTED, "wf",
+                                                                  node="A%d" % i)))
+        self.assertLess(time.time() - start, 1.0)
+        self.bus.flush(10)
+        fastChannel.close(10)
+        self.assertEqual(len(fast.calls), 5)
+
+        time.sleep(0.1)
+        gate.set()
+        slowChannel.close(10)
+        metrics = slowChannel.metrics()
+        self.assertEqual(metrics["delivered"] + metrics["dropped"], 5)
+        self.assertGreater(metrics["dropped"], 0)
+        self.assertGreaterEqual(metrics["maxLag"], 0.1)
+        self.assertEqual(metrics["pending"], 0)
+
+
+class EventBusMemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+__all__ = "EventBusTestCase".split()
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
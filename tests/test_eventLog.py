@@ -0,0 +1,198 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+"""
+Tests of the user log readers and the event log workflow monitor
+"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import lsst.utils.tests
+
+from lsst.ctrl.orca.EventLog import EventLogReader, DagmanOutReader, FileWatcher, SUBMIT, TERMINATED
+from lsst.ctrl.orca.EventLog import logOffsets
+from lsst.ctrl.orca.EventLogWorkflowMonitor import EventLogWorkflowMonitor
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+SUBMIT_EVENT = """000 (1234.000.000) 2017-03-21 12:00:00 Job submitted from host: <10.0.0.1:9618>
+    DAG Node: A1
+...
+"""
+
+TERMINATED_EVENT = """005 (1234.000.000) 2017-03-21 12:00:09 Job terminated.
+\t(1) Normal termination (return value 3)
+\t\tUsr 0 00:00:00, Sys 0 00:00:00  -  Run Remote Usage
+...
+"""
+
+
+EXECUTE_EVENT = """001 (1234.000.000) 2017-03-21 12:00:01 Job executing on host: <10.0.0.2:9618>
+...
+"""
+
+
+def dagmanStart(cluster):
+    return "03/21/17 12:00:00 ** condor_scheduniv_exec.%s.0 (CONDOR_DAGMAN) STARTING UP\n" % cluster
+
+
+def dagmanExit(cluster, status):
+    return ("03/21/17 12:00:10 **** condor_scheduniv_exec.%s.0 (condor_DAGMAN) "
+            "pid 4242 EXITING WITH STATUS %d\n" % (cluster, status))
+
+
+class MonitorConfig:
+    statusCheckInterval = 30
+
+
+class EventLogTestCase(lsst.utils.tests.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.dagFile = os.path.join(self.dir, "S2012Pipe.diamond.dag")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def append(self, fileName, text):
+        with open(fileName, "a") as fp:
+            fp.write(text)
+
+    def testEventLogReader(self):
+        fileName = self.dagFile + ".nodes.log"
+        reader = EventLogReader(fileName)
+        self.assertEqual(reader.readEvents(), [])
+
+        # an event is only returned once it is complete
+        self.append(fileName, SUBMIT_EVENT + TERMINATED_EVENT[:60])
+        events = reader.readEvents()
+        self.assertEqual([(event.code, event.jobId(), event.node) for event in events],
+                         [(SUBMIT, "1234.0", "A1")])
+
+        self.append(fileName, TERMINATED_EVENT[60:])
+        events = reader.readEvents()
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].code, TERMINATED)
+        self.assertEqual(events[0].name, "terminated")
+        self.assertEqual(events[0].node, "A1")
+        self.assertEqual(events[0].returnValue, 3)
+        self.assertEqual(reader.readEvents(), [])
+
+    def testDagmanOutReader(self):
+        fileName = self.dagFile + ".dagman.out"
+        reader = DagmanOutReader(fileName)
+        self.append(fileName, "03/21/17 12:00:10 All jobs Completed!\n")
+        self.assertIsNone(reader.readExitStatus())
+        self.append(fileName, "03/21/17 12:00:10 **** condor_scheduniv_exec.1233.0 (condor_DAGMAN) "
+                              "pid 4242 EXITING WITH STATUS 0\n")
+        self.assertEqual(reader.readExitStatus(), 0)
+
+    def testDagmanOutReaderCluster(self):
+        fileName = self.dagFile + ".dagman.out"
+        self.append(fileName, dagmanStart(1232) + dagmanExit(1232, 1))
+
+        # the exit of an earlier DAGMan job in the same directory doesn't count
+        reader = DagmanOutReader(fileName, condorDagId="1233")
+        self.assertIsNone(reader.readExitStatus())
+        self.append(fileName, dagmanStart(1233) + "03/21/17 12:00:10 All jobs Completed!\n")
+        self.assertIsNone(reader.readExitStatus())
+        self.append(fileName, dagmanExit(1233, 0))
+        self.assertEqual(reader.readExitStatus(), 0)
+
+        # nor is anything before the offset read
+        self.append(fileName, dagmanStart(1234))
+        offset = os.stat(fileName).st_size
+        self.append(fileName, "EXITING WITH STATUS 2\n")
+        reader = DagmanOutReader(fileName, offset)
+        self.assertEqual(reader.readExitStatus(), 2)
+
+    def testFileWatcher(self):
+        watcher = FileWatcher(self.dir, pollInterval=0.01)
+        try:
+            self.append(self.dagFile + ".nodes.log", SUBMIT_EVENT)
+            start = time.time()
+            watcher.wait(5)
+            self.assertLess(time.time() - start, 1)
+        finally:
+            watcher.close()
+
+    def waitForCompletion(self, monitor):
+        for i in range(100):
+            if not monitor.isRunning():
+                break
+            time.sleep(0.05)
+
+    def testMonitor(self):
+        monitor = EventLogWorkflowMonitor("1233", MonitorConfig(), self.dagFile)
+        monitor.startMonitorThread()
+        self.append(self.dagFile + ".nodes.log", SUBMIT_EVENT)
+        self.append(self.dagFile + ".dagman.out", dagmanStart(1233) + dagmanExit(1233, 0))
+        self.waitForCompletion(monitor)
+        self.assertFalse(monitor.isRunning())
+        self.assertEqual(monitor.getNodeStates(), {"A1": "submit"})
+
+    def testResubmittedMonitor(self):
+        # the logs of an earlier run of the DAG in the same directory
+        self.append(self.dagFile + ".nodes.log", SUBMIT_EVENT + TERMINATED_EVENT)
+        self.append(self.dagFile + ".dagman.out", dagmanStart(1232) + dagmanExit(1232, 1))
+
+        monitor = EventLogWorkflowMonitor("1233", MonitorConfig(), self.dagFile,
+                                          logOffsets=logOffsets(self.dagFile))
+        monitor.startMonitorThread()
+        time.sleep(0.2)
+        self.assertTrue(monitor.isRunning())
+        self.assertEqual(monitor.getNodeStates(), {})
+
+        self.append(self.dagFile + ".nodes.log", SUBMIT_EVENT + EXECUTE_EVENT)
+        self.append(self.dagFile + ".dagman.out", dagmanStart(1233) + dagmanExit(1233, 0))
+        self.waitForCompletion(monitor)
+        self.assertFalse(monitor.isRunning())
+        self.assertEqual(monitor.exitStatus, 0)
+        self.assertEqual(monitor.getNodeStates(), {"A1": "execute"})
+
+    def testReattachedMonitor(self):
+        # a reattached monitor reads the logs from their start, skipping earlier DAGMan jobs' exits
+        self.append(self.dagFile + ".nodes.log", SUBMIT_EVENT)
+        self.append(self.dagFile + ".dagman.out", dagmanStart(1232) + dagmanExit(1232, 1) +
+                    dagmanStart(1233) + dagmanExit(1233, 0))
+        monitor = EventLogWorkflowMonitor("1233", MonitorConfig(), self.dagFile)
+        monitor.startMonitorThread()
+        self.waitForCompletion(monitor)
+        self.assertFalse(monitor.isRunning())
+        self.assertEqual(monitor.exitStatus, 0)
+        self.assertEqual(monitor.getNodeStates(), {"A1": "submit"})
+
+
+class EventLogMemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+__all__ = "EventLogTestCase".split()
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
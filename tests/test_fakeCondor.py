@@ -0,0 +1,188 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+"""
+Tests of the fakecondor simulator, driving CondorJobs and the workflow monitors
+"""
+import os
+import shutil
+import stat
+import tempfile
+import time
+import unittest
+import lsst.utils.tests
+
+from lsst.ctrl.orca import EventBus
+from lsst.ctrl.orca.CondorJobs import CondorJobs
+from lsst.ctrl.orca.CondorWorkflowLauncher import CondorWorkflowLauncher
+from lsst.ctrl.orca.CondorWorkflowMonitor import CondorWorkflowMonitor
+from lsst.ctrl.orca.DagProgress import DagProgress, DONE, FAILED
+from lsst.ctrl.orca.EventLogWorkflowMonitor import EventLogWorkflowMonitor
+from lsst.ctrl.orca.JobBackend import getJobBackend
+from lsst.ctrl.orca.StatusListener import StatusListener
+from lsst.ctrl.orca.dag import DagBuilder
+from lsst.ctrl.orca.fakecondor import DagFile, FakeJobBackend
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class MonitorConfig:
+    statusCheckInterval = 30
+    jobBackend = "fake"
+    backend = "eventlog"
+
+
+class CountingListener(StatusListener):
+    """Counts the events of each kind
+    """
+
+    def __init__(self):
+        StatusListener.__init__(self)
+        self.counts = dict.fromkeys(EventBus.EVENT_KINDS, 0)
+
+    def handleEvent(self, event):
+        self.counts[event.kind] += 1
+
+
+class FakeCondorTestCase(lsst.utils.tests.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        inputFile = os.path.join(self.dir, "ids.input")
+        with open(inputFile, "w") as fp:
+            for i in range(40):
+                fp.write("visit=%d ccd=%d\n" % (885335881 + i // 10, i % 10))
+        builder = DagBuilder("S2012Pipe", "workers", "worker.condor", "run1", prescript="pre.sh",
+                             subDagType="SPLICE", nodesPerSubDag=10, maxJobsPerSubDag=2,
+                             nodeStatusUpdate=1)
+        builder.build(inputFile, self.dir)
+        self.dagFile = os.path.join(self.dir, builder.getDagFileName())
+        self.statusFile = os.path.join(self.dir, builder.getNodeStatusFileName())
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def testDagFile(self):
+        dag = DagFile(self.dagFile)
+        self.assertEqual(len(dag.nodes), 42)
+        self.assertEqual(dag.nodeStatusFile, "S2012Pipe.status")
+        self.assertEqual(dag.maxJobs["S1+worker"], 2)
+        self.assertEqual(dag.nodes["A"].preScript, "pre.sh")
+        self.assertEqual(len(dag.nodes["A"].children), 40)
+        self.assertEqual(dag.nodes["S2+A11"].parents, ["A"])
+        self.assertEqual(dag.nodes["S2+A11"].children, ["B"])
+        self.assertEqual(dag.nodes["S2+A11"].vars["var1"], "visit=885335882 ccd=0")
+        self.assertEqual(dag.nodes["S2+A11"].category, "S2+worker")
+
+    def testRunDag(self):
+        backend = FakeJobBackend(latency=0.01, failureRate=0.1, seed=5, statusUpdate=0.05)
+        cj = CondorJobs(backend)
+        dagId = cj.condorSubmitDag(self.dagFile)
+        self.assertTrue(cj.isJobAlive(dagId))
+        self.assertEqual(backend.wait(dagId, 30), 1)
+        self.assertFalse(cj.isJobAlive(dagId))
+
+        # every node either ran or was futile, and the status file agrees
+        dagman = backend.dagmans[dagId]
+        progress = DagProgress(self.statusFile)
+        progress.update()
+        self.assertEqual(progress.total(), 42)
+        self.assertGreater(progress.counts[FAILED], 0)
+        self.assertEqual(progress.counts[DONE] + progress.counts[FAILED], 42)
+        self.assertEqual(progress.counts[DONE], list(dagman.nodeStatus.values()).count(5))
+
+        # a node process that fails fails its node, and every descendant
+        script = os.path.join(self.dir, "node.sh")
+        with open(script, "w") as fp:
+            fp.write('#!/bin/sh\ntest "$1" != A\n')
+        os.chmod(script, stat.S_IRWXU)
+        backend = FakeJobBackend(command=[script])
+        dagId = backend.submitDag(self.dagFile)
+        self.assertEqual(backend.wait(dagId, 30), 1)
+        self.assertEqual(set(backend.dagmans[dagId].nodeStatus.values()), {6, 7})
+
+    def testRemove(self):
+        backend = FakeJobBackend(latency=30)
+        dagId = backend.submitDag(os.path.basename(self.dagFile), cwd=os.path.dirname(self.dagFile))
+        time.sleep(0.1)
+        self.assertEqual(len(backend.query(list(backend.jobs))), 2)
+        backend.remove(dagId)
+        self.assertEqual(backend.wait(dagId, 30), 2)
+        self.assertEqual(backend.jobs, {})
+
+    def testRemovedExitStatus(self):
+        backend = FakeJobBackend(latency=30, statusUpdate=0.05)
+        dagId = backend.submitDag(os.path.basename(self.dagFile), cwd=os.path.dirname(self.dagFile))
+        time.sleep(0.2)
+        backend.remove(dagId)
+        self.assertEqual(backend.wait(dagId, 30), 2)
+
+        # nodes were left idle and running, so the dag didn't succeed
+        monitor = CondorWorkflowMonitor(dagId, MonitorConfig(), self.statusFile)
+        monitor.updateProgress()
+        self.assertGreater(monitor.getProgress()["idle"], 0)
+        self.assertIsNone(monitor.getExitStatus())
+
+    def testLaunchUnsubmitted(self):
+        # a dag that can't be submitted is never monitored
+        launcher = CondorWorkflowLauncher(None, None, "run1", self.dir, "missing.dag", MonitorConfig(),
+                                          wfName="wf")
+        with self.assertRaises(RuntimeError):
+            launcher.launch(None)
+
+    def testEventLogMonitor(self):
+        backend = FakeJobBackend(latency=0.01, seed=5)
+        dagId = backend.submitDag(self.dagFile)
+        monitor = EventLogWorkflowMonitor(dagId, MonitorConfig(), self.dagFile, self.statusFile)
+        listener = CountingListener()
+        monitor.addStatusListener(listener)
+        self.assertFalse(monitor.wait(0.01))
+        monitor.startMonitorThread()
+        self.assertTrue(monitor.wait(30))
+        EventBus.EventBus.getInstance().flush(10)
+        EventBus.EventBus.getInstance().unsubscribe(listener, 10)
+        self.assertEqual(listener.counts[EventBus.NODE_STARTED], 42)
+        self.assertEqual(listener.counts[EventBus.NODE_FINISHED], 42)
+        self.assertEqual(listener.counts[EventBus.WORKFLOW_STARTED], 1)
+        self.assertEqual(listener.counts[EventBus.WORKFLOW_DONE], 1)
+        self.assertTrue(monitor.isDone())
+        self.assertFalse(monitor.isRunning())
+        states = monitor.getNodeStates()
+        self.assertEqual(len(states), 42)
+        self.assertEqual(set(states.values()), {"terminated"})
+        self.assertEqual(monitor.getProgress()[DONE], 42)
+
+    def testGetJobBackend(self):
+        self.assertIsInstance(getJobBackend("fake"), FakeJobBackend)
+
+
+class FakeCondorMemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+__all__ = "FakeCondorTestCase".split()
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,114 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+
+"""
+Tests of the metrics rendered for Prometheus
+"""
+import io
+import time
+import unittest
+import lsst.utils.tests
+
+from lsst.ctrl.orca.EventLog import eventTime
+from lsst.ctrl.orca.Metrics import Metrics, Gauge, Histogram, DAG_NODES, NODE_RUNTIME
+from lsst.ctrl.orca.ServiceHandler import ServiceHandler
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class MetricsTestCase(lsst.utils.tests.TestCase):
+
+    def testGauge(self):
+        gauge = Gauge("orca_test", "a test", ("workflow",))
+        gauge.set(3, 'say "hi"\n')
+        gauge.set(1.5, "b")
+        self.assertEqual(gauge.samples(), ['orca_test{workflow="b"} 1.5',
+                                           'orca_test{workflow="say \\"hi\\"\\n"} 3'])
+        gauge.remove("b")
+        self.assertIsNone(gauge.get("b"))
+
+    def testHistogram(self):
+        histogram = Histogram("orca_wait_seconds", "a test", (1, 10))
+        for value in (0.5, 1, 5, 100):
+            histogram.observe(value)
+        self.assertEqual(histogram.count(), 4)
+        self.assertEqual(histogram.samples(), ['orca_wait_seconds_bucket{le="1.0"} 2',
+                                               'orca_wait_seconds_bucket{le="10.0"} 3',
+                                               'orca_wait_seconds_bucket{le="+Inf"} 4',
+                                               'orca_wait_seconds_sum 106.5',
+                                               'orca_wait_seconds_count 4'])
+
+    def testRender(self):
+        metrics = Metrics.getInstance()
+        metrics.gauge(DAG_NODES).set(7, "run1", "metricsTest", "done")
+        metrics.gauge(DAG_NODES).set(5, "run2", "metricsTest", "done")
+        metrics.histogram(NODE_RUNTIME).observe(42, "run1", "metricsTest")
+        text = metrics.render()
+        self.assertTrue(text.endswith("\n"))
+        self.assertIn("# TYPE %s gauge\n" % DAG_NODES, text)
+        self.assertIn('%s{runid="run1",workflow="metricsTest",state="done"} 7\n' % DAG_NODES, text)
+        self.assertIn('%s{runid="run2",workflow="metricsTest",state="done"} 5\n' % DAG_NODES, text)
+        self.assertIn('%s_bucket{runid="run1",workflow="metricsTest",le="60.0"} 1\n' % NODE_RUNTIME, text)
+        self.assertIn("# TYPE orca_listener_dropped_events_total counter\n", text)
+
+        # the series of a finished production go, those of the others stay
+        metrics.removeRun("run1")
+        text = metrics.render()
+        self.assertNotIn('runid="run1"', text)
+        self.assertIn('%s{runid="run2",workflow="metricsTest",state="done"} 5\n' % DAG_NODES, text)
+        metrics.removeRun("run2")
+
+    def testHandler(self):
+        """Serve the metrics without a socket
+        """
+        handler = ServiceHandler.__new__(ServiceHandler)
+        handler.path = ServiceHandler.metrics
+        handler.request_version = "HTTP/1.1"
+        handler.requestline = "GET %s HTTP/1.1" % handler.path
+        handler.client_address = ("127.0.0.1", 0)
+        handler.wfile = io.BytesIO()
+        handler.log_message = lambda *args: None
+        handler.do_GET()
+        response = handler.wfile.getvalue().decode()
+        self.assertRegex(response, r"^HTTP/1.[01] 200 ")
+        self.assertIn("Content-Type: %s" % ServiceHandler.metricsContentType, response)
+        self.assertIn("# HELP %s " % DAG_NODES, response)
+
+    def testEventTime(self):
+        seconds = eventTime("2017-03-21 12:00:01")
+        self.assertEqual(time.localtime(seconds)[:6], (2017, 3, 21, 12, 0, 1))
+        self.assertEqual(time.localtime(eventTime("03/21 12:00:01")).tm_year, time.localtime().tm_year)
+        self.assertIsNone(eventTime("yesterday"))
+
+
+class MetricsMemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+__all__ = "MetricsTestCase".split()
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,130 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+
+"""
+Tests of the ProductionDaemon REST API
+"""
+import http.client
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import lsst.utils.tests
+
+from lsst.ctrl.orca.DaemonServiceHandler import DaemonServiceHandler
+from lsst.ctrl.orca.ProductionDaemon import ProductionDaemon, FAILED
+from lsst.ctrl.orca.RunStateStore import RunStateStore
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class ProductionDaemonTestCase(lsst.utils.tests.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        store = RunStateStore(os.path.join(self.directory, "runstate.sqlite3"))
+        self.daemon = ProductionDaemon(runStateStore=store)
+        self.thread = threading.Thread(target=self.daemon.serveForever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.daemon.shutdown()
+        self.thread.join(10)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def request(self, method, path, document=None):
+        connection = http.client.HTTPConnection("127.0.0.1", self.daemon.getPort(), timeout=10)
+        body = json.dumps(document) if document is not None else None
+        connection.request(method, path, body)
+        response = connection.getresponse()
+        body = response.read()
+        connection.close()
+        return response, body
+
+    def testSubmit(self):
+        path = DaemonServiceHandler.productions
+        missing = os.path.join(self.directory, "missing.py")
+        response, body = self.request("POST", path, {"runid": "run1", "configFile": missing})
+        self.assertEqual(response.status, 202)
+        self.assertEqual(response.getheader("Location"), path + "/run1")
+
+        response, body = self.request("POST", path, {"runid": "run1", "configFile": missing})
+        self.assertEqual(response.status, 409)
+        response, body = self.request("POST", path, {"runid": "run2"})
+        self.assertEqual(response.status, 422)
+
+        # the config file can't be loaded, so the production fails to launch
+        response, status = self.waitForState("run1", FAILED)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(status["state"], FAILED)
+        response, body = self.request("GET", path)
+        self.assertEqual([production["runid"] for production in json.loads(body)["productions"]], ["run1"])
+
+        # deleting a finished production forgets it
+        response, body = self.request("DELETE", path + "/run1")
+        self.assertEqual(response.status, 204)
+        response, body = self.request("GET", path + "/run1")
+        self.assertEqual(response.status, 404)
+        response, body = self.request("DELETE", DaemonServiceHandler.production, {"runid": "run1"})
+        self.assertEqual(response.status, 404)
+
+    def waitForState(self, runid, state):
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            response, body = self.request("GET", DaemonServiceHandler.productions + "/" + runid)
+            if response.status == 200 and json.loads(body)["state"] == state:
+                break
+            time.sleep(0.05)
+        return response, json.loads(body)
+
+    def testLaunchFailure(self):
+        # the config loads, but its workflow can't be configured
+        configFile = os.path.join(self.directory, "production.py")
+        with open(configFile, "w") as fp:
+            fp.write('config.production.shortName = "failing"\n')
+            fp.write('config.workflow["wf"].configurationClass = "lsst.ctrl.orca.NoSuchConfigurator"\n')
+        response, body = self.request("POST", DaemonServiceHandler.productions,
+                                      {"runid": "run1", "configFile": configFile})
+        self.assertEqual(response.status, 202)
+
+        response, status = self.waitForState("run1", FAILED)
+        self.assertEqual(status["state"], FAILED)
+        self.assertIn("NoSuchConfigurator", status["error"])
+        self.assertEqual(status["runid"], "run1")
+        self.assertIsNotNone(self.daemon.getProduction("run1"))
+
+
+class ProductionDaemonMemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+__all__ = "ProductionDaemonTestCase".split()
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
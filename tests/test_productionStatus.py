@@ -0,0 +1,184 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+
+"""
+Tests of the status snapshots and event stream of the service endpoint
+"""
+import http.client
+import json
+import threading
+import time
+import unittest
+from http.server import HTTPServer
+from socketserver import ThreadingMixIn
+import lsst.utils.tests
+
+from lsst.ctrl.orca import EventBus
+from lsst.ctrl.orca.ProductionStatus import ProductionStatus
+from lsst.ctrl.orca.ServiceHandler import ServiceHandler
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class FakeProduction:
+    """Stands in for a ProductionRunManager with one workflow
+    """
+
+    def __init__(self):
+        self.done = False
+        self.nodes = {"A1": "running"}
+        self.status = ProductionStatus(self)
+
+    def getRunId(self):
+        return "test"
+
+    def getStatus(self):
+        return {"runid": "test", "done": self.done, "workflows": [{"name": "wf", "nodes": len(self.nodes)}]}
+
+    def getWorkflowStatus(self, name):
+        return {"name": name, "nodes": dict(self.nodes)} if name == "wf" else None
+
+    def getProductionStatus(self):
+        return self.status
+
+    def isDone(self):
+        return self.done
+
+
+class ThreadedServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class ProductionStatusTestCase(lsst.utils.tests.TestCase):
+
+    def setUp(self):
+        self.production = FakeProduction()
+        production = self.production
+
+        class Handler(ServiceHandler):
+            def __init__(self, *args, **kwargs):
+                self.setParent(production, "test")
+                ServiceHandler.__init__(self, *args, **kwargs)
+
+            def log_message(self, *args):
+                pass
+
+        self.bus = EventBus.EventBus.getInstance()
+        self.bus.subscribe(self.production.status)
+        self.server = ThreadedServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.production.done = True
+        self.server.shutdown()
+        self.server.server_close()
+        self.bus.unsubscribe(self.production.status, 10)
+
+    def get(self, path, headers={}):
+        connection = http.client.HTTPConnection("127.0.0.1", self.server.server_port, timeout=10)
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        body = response.read()
+        connection.close()
+        return response, body
+
+    def publish(self, kind, **kwargs):
+        self.bus.publish(EventBus.StatusEvent(kind, "wf", **kwargs))
+        self.bus.flush(10)
+
+    def testSnapshot(self):
+        response, body = self.get(ServiceHandler.production)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(json.loads(body)["workflows"][0]["nodes"], 1)
+        etag = response.getheader("ETag")
+
+        # nothing changed, and the snapshot isn't built again until an event comes in
+        self.production.nodes["A2"] = "idle"
+        response, body = self.get(ServiceHandler.production, {"If-None-Match": etag})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(body, b"")
+
+        self.publish(EventBus.NODE_STARTED, node="A2")
+        response, body = self.get(ServiceHandler.production, {"If-None-Match": etag})
+        self.assertEqual(response.status, 200)
+        self.assertNotEqual(response.getheader("ETag"), etag)
+
+        response, body = self.get(ServiceHandler.workflows + "/wf")
+        self.assertEqual(json.loads(body)["nodes"], {"A1": "running", "A2": "idle"})
+        response, body = self.get(ServiceHandler.workflows + "/other")
+        self.assertEqual(response.status, 404)
+
+    def testLongPoll(self):
+        response, body = self.get(ServiceHandler.workflows + "/wf")
+        etag = response.getheader("ETag")
+
+        def change():
+            time.sleep(0.2)
+            self.production.nodes["A1"] = "done"
+            self.publish(EventBus.NODE_FINISHED, node="A1", returnValue=0)
+        threading.Thread(target=change).start()
+
+        start = time.time()
+        response, body = self.get(ServiceHandler.workflows + "/wf?wait=10", {"If-None-Match": etag})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(json.loads(body)["nodes"]["A1"], "done")
+        self.assertLess(time.time() - start, 5)
+
+        response, body = self.get(ServiceHandler.production + "?wait=soon", {"If-None-Match": etag})
+        self.assertEqual(response.status, 400)
+
+    def testEvents(self):
+        listeners = len(self.bus.metrics()["listeners"])
+        connection = http.client.HTTPConnection("127.0.0.1", self.server.server_port, timeout=10)
+        connection.request("GET", ServiceHandler.events)
+        response = connection.getresponse()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("Content-Type"), "text/event-stream")
+
+        # the handler subscribes to the bus once it has sent the headers
+        deadline = time.time() + 10
+        while len(self.bus.metrics()["listeners"]) <= listeners and time.time() < deadline:
+            time.sleep(0.01)
+        # the events of another production aren't streamed
+        self.publish(EventBus.NODE_STARTED, node="B1", runid="other")
+        self.publish(EventBus.NODE_FINISHED, node="A1", jobId="12.0", returnValue=3)
+        self.production.done = True
+
+        lines = response.read().decode().splitlines()
+        connection.close()
+        self.assertEqual(lines[:2], ["id: 1", "event: nodeFinished"])
+        data = json.loads(lines[2][len("data: "):])
+        self.assertEqual((data["node"], data["jobId"], data["returnValue"]), ("A1", "12.0", 3))
+
+
+class ProductionStatusMemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+__all__ = "ProductionStatusTestCase".split()
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,98 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+"""
+Tests of the QueuePoller class
+"""
+import unittest
+import lsst.utils.tests
+
+from lsst.ctrl.orca.JobBackend import getJobBackend
+from lsst.ctrl.orca.QueuePoller import QueuePoller
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class QueueJobs:
+    """Stands in for CondorJobs, answering queries from a dict of job states
+    """
+
+    def __init__(self, queue):
+        self.queue = queue
+        self.queries = []
+
+    def queryJobs(self, clusterIds):
+        clusterIds = sorted(clusterIds)
+        self.queries.append(clusterIds)
+        return dict((jobId, state) for jobId, state in self.queue.items()
+                    if jobId.split(".")[0] in clusterIds)
+
+
+class QueuePollerTestCase(lsst.utils.tests.TestCase):
+
+    def setUp(self):
+        self.jobs = QueueJobs({"1016.0": "R", "1017.0": "I", "1018.0": "R"})
+        self.poller = QueuePoller(self.jobs)
+
+    def tearDown(self):
+        self.poller.stop()
+
+    def testOneQueryForAllClusters(self):
+        self.assertTrue(self.poller.isJobAlive("1016"))
+        generation = self.poller.waitForPoll(timeout=0)
+        self.poller.register("1016", 0.01)
+        self.poller.register("1017", 0.01)
+        generation = self.poller.waitForPoll(generation, timeout=10)
+        generation = self.poller.waitForPoll(generation, timeout=10)
+        self.assertEqual(self.jobs.queries[-1], ["1016", "1017"])
+        self.assertEqual(self.poller.snapshot(), {"1016": {"1016.0": "R"}, "1017": {"1017.0": "I"}})
+
+        # a cluster whose jobs left the queue is no longer alive
+        del self.jobs.queue["1017.0"]
+        self.poller.waitForPoll(generation, timeout=10)
+        self.assertTrue(self.poller.isJobAlive("1016"))
+        self.assertFalse(self.poller.isJobAlive("1017"))
+
+        self.poller.unregister("1017")
+        self.assertNotIn("1017", self.poller.snapshot())
+
+    def testGetInstance(self):
+        self.assertIs(QueuePoller.getInstance(), QueuePoller.getInstance())
+
+        # monitors using different job backends are polled through their own
+        fake = QueuePoller.getInstance("fake")
+        self.assertIs(fake, QueuePoller.getInstance("fake"))
+        self.assertIsNot(fake, QueuePoller.getInstance("cli"))
+        self.assertIs(fake.condorJobs.backend, getJobBackend("fake"))
+
+
+class QueuePollerMemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+__all__ = "QueuePollerTestCase".split()
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
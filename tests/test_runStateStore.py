@@ -0,0 +1,123 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+
+"""
+Tests of the RunStateStore
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import lsst.utils.tests
+
+from lsst.ctrl.orca import EventBus
+from lsst.ctrl.orca.EventBus import StatusEvent
+from lsst.ctrl.orca.RunStateStore import RunStateStore, RunStateRecorder, PENDING, RUNNING, DONE
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class FakeMonitor:
+    """Reports fixed node counts
+    """
+
+    def __init__(self, counts):
+        self.counts = counts
+
+    def getStatus(self, nodes=False):
+        return {"progress": dict(self.counts)}
+
+
+class RunStateStoreTestCase(lsst.utils.tests.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = RunStateStore(os.path.join(self.directory, "state", "runstate.sqlite3"))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def testRecord(self):
+        self.assertIsNone(self.store.getRun("run1"))
+        self.assertTrue(self.store.recordRun("run1", "prod.py", "/repo", ["b", "a"]))
+        self.store.recordService("run1", 8123)
+        self.store.recordLaunch("run1", "a", {"launcher": "lsst.ctrl.orca.CondorWorkflowLauncher",
+                                              "condorDagId": "1234", "stagingDir": "/stage/a",
+                                              "dagFile": "a.diamond.dag", "nodeStatusFile": "a.status"})
+        self.store.recordProgress("run1", "a", {"idle": 1, "running": 2, "done": 3, "failed": 0})
+
+        run = self.store.getRun("run1")
+        self.assertEqual(run["configFile"], os.path.abspath("prod.py"))
+        self.assertEqual(run["repository"], "/repo")
+        self.assertEqual(run["port"], 8123)
+        self.assertEqual(run["state"], RUNNING)
+
+        b, a = self.store.getWorkflows("run1")
+        self.assertEqual((b["name"], b["state"], b["condorDagId"]), ("b", PENDING, None))
+        self.assertEqual((a["name"], a["state"], a["condorDagId"]), ("a", RUNNING, "1234"))
+        self.assertEqual((a["stagingDir"], a["dagFile"]), ("/stage/a", "a.diamond.dag"))
+        self.assertEqual((a["idle"], a["running"], a["done"], a["failed"]), (1, 2, 3, 0))
+
+        # running the same run id again starts afresh
+        self.store.recordRun("run1", "prod.py", "/repo", ["c"])
+        self.assertEqual([workflow["name"] for workflow in self.store.getWorkflows("run1")], ["c"])
+
+    def testRecorder(self):
+        self.store.recordRun("run1", "prod.py", "/repo", ["a"])
+        monitor = FakeMonitor({"idle": 4, "running": 0, "done": 0, "failed": 0})
+        recorder = RunStateRecorder(self.store, "run1", interval=3600)
+
+        recorder.handleEvent(StatusEvent(EventBus.NODE_STARTED, "a", source=monitor))
+        monitor.counts = {"idle": 0, "running": 0, "done": 4, "failed": 0}
+        recorder.handleEvent(StatusEvent(EventBus.NODE_FINISHED, "a", source=monitor))
+        self.assertEqual(self.store.getWorkflows("run1")[0]["idle"], 4)
+
+        # completion is always recorded
+        recorder.handleEvent(StatusEvent(EventBus.WORKFLOW_DONE, "a", source=monitor, returnValue=0))
+        workflow = self.store.getWorkflows("run1")[0]
+        self.assertEqual((workflow["state"], workflow["done"], workflow["exitStatus"]), (DONE, 4, 0))
+
+        # a launch recorded after the completion doesn't undo it
+        self.store.recordLaunch("run1", "a", {"condorDagId": "1234"})
+        workflow = self.store.getWorkflows("run1")[0]
+        self.assertEqual((workflow["state"], workflow["condorDagId"], workflow["exitStatus"]),
+                         (DONE, "1234", 0))
+
+    def testUnwritable(self):
+        store = RunStateStore(os.path.join(self.directory, "file"))
+        with open(store.fileName, "w") as fp:
+            fp.write("not a database")
+        self.assertFalse(store.recordRun("run1", "prod.py", "/repo", ["a"]))
+
+
+class RunStateStoreMemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+__all__ = "RunStateStoreTestCase".split()
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,99 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+"""
+Tests of the StagingArea class
+"""
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+import lsst.utils.tests
+
+from lsst.ctrl.orca.StagingArea import StagingArea, StagingManifest, StagedFile, writeIfChanged
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class StagingAreaTestCase(lsst.utils.tests.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.staging = StagingArea(self.dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def testMakeDirs(self):
+        self.assertEqual(self.staging.makeDirs("logs", ["0", "1", "2"]), 3)
+        self.assertEqual(sorted(os.listdir(self.staging.path("logs"))), ["0", "1", "2"])
+
+        # existing directories are skipped
+        self.assertEqual(self.staging.makeDirs("logs", ["1", "2", "3"]), 1)
+        self.assertTrue(os.path.isdir(self.staging.path("logs", "3")))
+
+    def testWriteIfChanged(self):
+        fileName = self.staging.path("job.sh")
+        manifest = self.staging.manifest
+        self.assertTrue(writeIfChanged(fileName, "echo 1\n", manifest))
+        os.chmod(fileName, stat.S_IRWXU)
+        os.utime(fileName, ns=(0, 0))
+
+        # same contents: the file is left alone
+        self.assertFalse(writeIfChanged(fileName, "echo 1\n", manifest))
+        self.assertEqual(os.stat(fileName).st_mtime_ns, 0)
+
+        # new contents replace the file, keeping its mode
+        self.assertTrue(writeIfChanged(fileName, "echo 2\n", manifest))
+        self.assertNotEqual(os.stat(fileName).st_mtime_ns, 0)
+        self.assertEqual(stat.S_IMODE(os.stat(fileName).st_mode), stat.S_IRWXU)
+        with open(fileName) as fp:
+            self.assertEqual(fp.read(), "echo 2\n")
+        self.assertEqual(os.listdir(self.dir), ["job.sh"])
+
+        manifest.save()
+        self.assertEqual(StagingManifest(manifest.fileName).files, {"job.sh": manifest.get(fileName)})
+
+    def testDiscard(self):
+        fileName = self.staging.path("job.sh")
+        writeIfChanged(fileName, "echo 1\n")
+        with self.assertRaises(RuntimeError):
+            with StagedFile(fileName) as fp:
+                fp.write("echo 2\n")
+                raise RuntimeError("failed")
+        with open(fileName) as fp:
+            self.assertEqual(fp.read(), "echo 1\n")
+        self.assertEqual(os.listdir(self.dir), ["job.sh"])
+
+
+class StagingAreaMemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+__all__ = "StagingAreaTestCase".split()
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,97 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+"""
+Tests of the TemplateWriter and CompiledTemplate classes
+"""
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+import lsst.utils.tests
+
+from lsst.ctrl.orca.TemplateWriter import CompiledTemplate, TemplateWriter
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class TemplateWriterTestCase(lsst.utils.tests.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.inputFile = os.path.join(self.dir, "job.template")
+        self.outputFile = os.path.join(self.dir, "job.out")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def writeTemplate(self, text):
+        with open(self.inputFile, "w") as fp:
+            fp.write(text)
+
+    def testRender(self):
+        template = CompiledTemplate("run $ORCA_RUNID in $ORCA_RUN/$DIRsub, args=$(var1) $UNSET\n")
+        values = {"ORCA_RUN": "short", "ORCA_RUNID": "run1", "DIR": "/tmp"}
+        self.assertEqual(template.render(values), "run run1 in short//tmpsub, args=$(var1) $UNSET\n")
+
+    def testRewrite(self):
+        self.writeTemplate("host=$ORCA_LOCAL_HOSTNAME\nrunid=$ORCA_RUNID\n")
+        writer = TemplateWriter()
+        writer.rewrite(self.inputFile, self.outputFile, {"ORCA_RUNID": "run1",
+                                                         "ORCA_LOCAL_HOSTNAME": "ignored"})
+        with open(self.outputFile) as fp:
+            self.assertEqual(fp.read(), "host=%s\nrunid=run1\n" % socket.gethostname())
+
+    def testRenderMany(self):
+        self.writeTemplate("id=$ID\n")
+        jobs = [(self.inputFile, os.path.join(self.dir, "job%d.out" % i), {"ID": i}) for i in range(10)]
+        writer = TemplateWriter()
+        self.assertEqual(writer.render_many(jobs), [job[1] for job in jobs])
+        for i in range(10):
+            with open(os.path.join(self.dir, "job%d.out" % i)) as fp:
+                self.assertEqual(fp.read(), "id=%d\n" % i)
+
+        with self.assertRaises(OSError):
+            writer.render_many([(self.inputFile, os.path.join(self.dir, "missing", "job.out"), {})])
+
+    def testCache(self):
+        self.writeTemplate("a=$A\n")
+        template = CompiledTemplate.load(self.inputFile)
+        self.assertIs(CompiledTemplate.load(self.inputFile), template)
+
+        # a changed template is compiled again
+        self.writeTemplate("a=$A, b=$B\n")
+        self.assertEqual(CompiledTemplate.load(self.inputFile).render({"A": 1, "B": 2}), "a=1, b=2\n")
+
+
+class TemplateWriterMemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+__all__ = "TemplateWriterTestCase".split()
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,135 @@
+#
+# LSST Data Management System
+# Copyright 2008, 2009, 2010 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+#
+
+
+"""
+Tests of the WorkflowScheduler
+"""
+import threading
+import unittest
+import lsst.utils.tests
+
+from lsst.ctrl.orca.StatusListener import StatusListener
+from lsst.ctrl.orca.WorkflowMonitor import WorkflowMonitor
+from lsst.ctrl.orca.WorkflowScheduler import WorkflowScheduler, checkDependencies
+from lsst.ctrl.orca.WorkflowScheduler import DONE, FAILED, SKIPPED, UNKNOWN
+from lsst.ctrl.orca.exceptions import MultiIssueConfigurationError
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class FakeManager:
+    """Launches a workflow that completes when the test says so
+    """
+
+    def __init__(self, name, launched, fail=False):
+        self.name = name
+        self.launched = launched
+        self.fail = fail
+        self.monitor = WorkflowMonitor()
+        self.started = threading.Event()
+        self.statusListener = None
+
+    def getName(self):
+        return self.name
+
+    async def runWorkflowAsync(self, statusListener):
+        if self.fail:
+            raise RuntimeError("can't submit %s" % self.name)
+        self.launched.append(self.name)
+        self.statusListener = statusListener
+        self.started.set()
+        return self.monitor
+
+
+class WorkflowSchedulerTestCase(lsst.utils.tests.TestCase):
+
+    def testCheckDependencies(self):
+        checkDependencies(["a", "b", "c"], {"b": ["a"], "c": ["a", "b"]})
+        with self.assertRaises(MultiIssueConfigurationError) as context:
+            checkDependencies(["a", "b", "c"], {"a": ["c"], "b": ["a", "d"], "c": ["b"]})
+        problems = context.exception.getProblems()
+        self.assertIn("workflow b depends on unknown workflow d", problems)
+        self.assertIn("workflow dependency cycle: a -> c -> b -> a", problems)
+
+    def testSchedule(self):
+        launched = []
+        managers = {name: FakeManager(name, launched) for name in "abcd"}
+        monitors = []
+        listener = StatusListener()
+        scheduler = WorkflowScheduler([managers[name] for name in "abcd"],
+                                      {"c": ["a"], "d": ["b", "c"]}, monitors.append, listener)
+        scheduler.start()
+        self.assertEqual(scheduler.waitForInitialLaunch(10), [])
+        self.assertEqual(sorted(launched), ["a", "b"])
+
+        # c starts as soon as a is done, while b still runs
+        managers["a"].monitor.handleCompletion(0)
+        self.assertTrue(managers["c"].started.wait(10))
+        self.assertEqual(launched, ["a", "b", "c"])
+
+        managers["c"].monitor.handleCompletion(0)
+        managers["b"].monitor.handleCompletion(1)
+        self.assertTrue(scheduler.wait(10))
+        self.assertEqual([scheduler.getState(name) for name in "abcd"], [DONE, FAILED, DONE, SKIPPED])
+        self.assertEqual(scheduler.getMonitors(), [managers[name].monitor for name in "abc"])
+        self.assertEqual(len(monitors), 3)
+
+        # the listener is added to each monitor as it is launched
+        self.assertEqual([managers[name].statusListener for name in "abcd"], [listener] * 3 + [None])
+
+    def testLaunchFailure(self):
+        launched = []
+        scheduler = WorkflowScheduler([FakeManager("a", launched, fail=True), FakeManager("b", launched)],
+                                      {"b": ["a"]})
+        scheduler.start()
+        errors = scheduler.waitForInitialLaunch(10)
+        self.assertEqual(str(errors[0]), "can't submit a")
+        self.assertTrue(scheduler.wait(10))
+        self.assertEqual(scheduler.getState("b"), SKIPPED)
+        self.assertEqual(launched, [])
+
+    def testUnknownExitStatus(self):
+        launched = []
+        managers = [FakeManager("a", launched), FakeManager("b", launched)]
+        scheduler = WorkflowScheduler(managers, {"b": ["a"]})
+        scheduler.start()
+        self.assertEqual(scheduler.waitForInitialLaunch(10), [])
+
+        # a workflow removed from the queue may leave no exit status; its dependents don't run
+        managers[0].monitor.handleCompletion(None)
+        self.assertTrue(scheduler.wait(10))
+        self.assertEqual([scheduler.getState("a"), scheduler.getState("b")], [UNKNOWN, SKIPPED])
+        self.assertEqual(launched, ["a"])
+
+
+class WorkflowSchedulerMemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+__all__ = "WorkflowSchedulerTestCase".split()
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()